@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure memory allocated while serving a typical GET through
+framework.Application with tracemalloc: the transient peak per request
+and what the Request/Response objects themselves hold on to. Each is
+reported for the current Request/Response and for a baseline standing
+in for them before they had __slots__ and lazy headers.
+
+    python benchmarks/allocations.py
+"""
+
+import io
+import tracemalloc
+
+import framework
+from framework import Application, PathExact, UrlParamArg, Request, Response
+
+NUMBER = 1000
+SESSION_ID = "0123456789abcdef" * 2
+
+
+def environ():
+    # Roughly what casket hands us for a browser GET
+    return {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": "/session",
+        "QUERY_STRING": f"session_id={SESSION_ID}",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": "localhost:30001",
+        "HTTP_USER_AGENT": "Mozilla/5.0 (X11; Linux x86_64)",
+        "HTTP_ACCEPT": "application/json",
+        "HTTP_ACCEPT_LANGUAGE": "en-GB,en;q=0.5",
+        "HTTP_ACCEPT_ENCODING": "gzip, deflate, br",
+        "HTTP_CONNECTION": "keep-alive",
+        "HTTP_TRACEPARENT": "00-" + SESSION_ID + "-" + SESSION_ID[:16] + "-00",
+        "wsgi.input": io.BytesIO(b""),
+        "wsgi.errors": io.StringIO(),
+        "casket.trace_ctx": None,
+    }
+
+
+class EagerRequest(Request):
+    # Without __slots__ of its own it has a __dict__ again, and it copies
+    # the HTTP_* headers out of the environ up front as it used to
+
+    @classmethod
+    def from_environ(cls, environ):
+        self = super().from_environ(environ)
+        self.headers
+        return self
+
+
+class DictResponse(Response):
+    # Again with a __dict__
+    pass
+
+
+def build(retained):
+    app = Application("allocations")
+
+    def session(session_id):
+        return session_id
+
+    def populate(resp, ret):
+        retained.append((resp._req, resp))
+        resp.set_header("200 Ok", [("Content-Type", "text/plain")])
+        resp.set_content_str(ret)
+
+    app.add_endpoint(PathExact("/session", methods=["GET"]),
+                     session,
+                     populate,
+                     url_param_args=[UrlParamArg("session_id", None)])
+    return app
+
+
+def start_response(status, headers):
+    pass
+
+
+def measure(app, retained):
+    # (transient peak, retained bytes, retained blocks) per request
+    environs = [environ() for _ in range(NUMBER)]
+
+    # Warm up caches (parse_qs, route table) before measuring
+    b"".join(app(environ(), start_response))
+    retained.clear()
+
+    tracemalloc.start()
+    peaks = 0
+    before = tracemalloc.take_snapshot()
+    for env in environs:
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        b"".join(app(env, start_response))
+        _, peak = tracemalloc.get_traced_memory()
+        peaks += peak - current
+
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained.clear()
+
+    stats = after.compare_to(before, "filename")
+    stats = [s for s in stats if "framework" in s.traceback[0].filename]
+    blocks = sum(s.count_diff for s in stats)
+    size = sum(s.size_diff for s in stats)
+
+    return peaks / NUMBER, size / NUMBER, blocks / NUMBER
+
+
+def main():
+    retained = []
+    app = build(retained)
+
+    # dispatch builds requests through the module's names
+    framework.Request, framework.Response = EagerRequest, DictResponse
+    try:
+        baseline = measure(app, retained)
+    finally:
+        framework.Request, framework.Response = Request, Response
+    current = measure(app, retained)
+
+    print(f"{'per request':<24}{'baseline':>10}{'current':>10}{'change':>10}")
+    rows = ("transient peak (bytes)", "retained (bytes)", "retained (blocks)")
+    for (name, old, new) in zip(rows, baseline, current):
+        print(f"{name:<24}{old:10.1f}{new:10.1f}{new - old:+10.1f}")
+
+
+if __name__ == '__main__':
+    main()
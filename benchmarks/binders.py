@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare the generated per-endpoint binders against the generic argument
+building closure they replaced, for a hot JSON endpoint (context, body
+and session_id) and for a body-only endpoint.
+
+    python benchmarks/binders.py
+"""
+
+import io
+import json as js
+from timeit import timeit
+
+from framework import (
+    Request,
+    UrlParamArg,
+    make_binder,
+    bad_request,
+    invalid_payload,
+    invalid_query_param,
+)
+
+NUMBER = 100000
+SESSION_ID = "0123456789abcdef" * 2
+
+
+def session_id_sanity(err, value):
+    if len(value) != 32:
+        raise err("invalid session id")
+
+
+def json_body(err, body):
+    return body
+
+
+def generic(pass_context=False,
+            path_parts=None,
+            req_body_transform=None,
+            pass_content_type=False,
+            url_param_args=None,
+            pass_headers=False,
+            pass_query=False):
+    # The argument building part of the old endpoint closure
+    url_param_args = url_param_args or []
+
+    def bind(req):
+        args = []
+        if pass_context:
+            args.append(req.ctx)
+        if path_parts:
+            args.extend(path_parts(req.path))
+        if req_body_transform:
+            args.append((req_body_transform(invalid_payload, req.body)))
+        if pass_content_type:
+            args.append(req.content_type)
+
+        for url_arg in url_param_args:
+            values = req.params.get(url_arg.key)
+            if not isinstance(values, list) or len(values) != 1:
+                raise bad_request(
+                    'Bad Url Query',
+                    f'expected exactly one query paramter {url_arg.key}')
+
+            value = values[0]
+            if url_arg.sanity:
+                url_arg.sanity(invalid_query_param, value)
+
+            args.append(value)
+            del req.params[url_arg.key]
+
+        if pass_headers:
+            args.extend(req.headers)
+
+        if pass_query:
+            return args, req.params
+        return args, {}
+
+    return bind
+
+
+def request():
+    body = bytes(js.dumps({"name": "tulip"}), encoding='utf8')
+    return Request.from_environ({
+        "REQUEST_METHOD": "POST",
+        "PATH_INFO": "/message",
+        "QUERY_STRING": f"session_id={SESSION_ID}",
+        "wsgi.input": io.BytesIO(body),
+        "casket.trace_ctx": object(),
+    })
+
+
+def main():
+    configs = {
+        "context+body+session_id": dict(
+            pass_context=True,
+            req_body_transform=json_body,
+            url_param_args=[UrlParamArg("session_id", session_id_sanity)],
+        ),
+        "body only": dict(req_body_transform=json_body),
+    }
+
+    for name, config in configs.items():
+        old = generic(**config)
+        new = make_binder(**config)
+        req = request()
+
+        def reset():
+            # The old binder consumes url params from req.params
+            req._params = {"session_id": [SESSION_ID]}
+            return req
+
+        base = timeit(reset, number=NUMBER)
+        old_t = timeit(lambda: old(reset()), number=NUMBER) - base
+        new_t = timeit(lambda: new(reset()), number=NUMBER) - base
+        print(f"{name:>24}: generic {old_t / NUMBER * 1e6:6.2f}us  "
+              f"binder {new_t / NUMBER * 1e6:6.2f}us")
+
+
+if __name__ == '__main__':
+    main()
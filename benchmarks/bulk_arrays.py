@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Time validate of WebSocketReq with its arrays of hex ids checked in bulk
+against the same with the element by element checks, for increasing
+numbers of ids.
+
+    python benchmarks/bulk_arrays.py
+"""
+
+from lib.doolally import Compiler
+from schemas.websocket import WebSocketReq
+
+from payloads import scaled_number, usec, websocket_req
+
+SIZES = (10, 100, 1000)
+
+
+def timing(doc):
+    check = Compiler().compile(WebSocketReq())
+    number = scaled_number(len(doc["sessionIds"]))
+    return usec(lambda: check(doc), number)
+
+
+def main():
+    arrays = list(WebSocketReq.doolally_fields.values())[:3]
+    bulk_checks = [array.bulk_check for array in arrays]
+    for size in SIZES:
+        doc = websocket_req(size)
+
+        bulk = timing(doc)
+        for array in arrays:
+            array.bulk_check = None
+        try:
+            per_element = timing(doc)
+        finally:
+            for array, bulk_check in zip(arrays, bulk_checks):
+                array.bulk_check = bulk_check
+
+        print(f"WebSocketReq x{size:<5}  validate "
+              f"{per_element:8.1f}us -> {bulk:7.1f}us")
+
+
+if __name__ == '__main__':
+    main()
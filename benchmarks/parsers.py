@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare decoding a NewEventReq and InsertKVValuesReq then parsing their
+dates, times and hex keys in the handler, as they used to be, against
+decode with coerce handing them over parsed.
+
+    python benchmarks/parsers.py
+"""
+
+import json as js
+from datetime import datetime
+
+from lib.doolally import decode
+from schemas.kvstore import InsertKVValuesReq
+from schemas.tuliptheclown import NewEventReq
+
+from payloads import kv_values, new_event, usec
+
+NUMBER = 2000
+
+EVENT = js.dumps(new_event())
+
+KV_VALUES = js.dumps(kv_values(20))
+
+
+def new_event_then_parse():
+    body = decode(EVENT, NewEventReq)
+    return (datetime.strptime(body['date'], "%Y-%m-%d"),
+            datetime.strptime(body['startTime'], "%H:%M"),
+            datetime.strptime(body['endTime'], "%H:%M"))
+
+
+def new_event_coerced():
+    body = decode(EVENT, NewEventReq, coerce=True)
+    return body['date'], body['startTime'], body['endTime']
+
+
+def insert_then_parse():
+    body = decode(KV_VALUES, InsertKVValuesReq)
+    return [(bytes.fromhex(v['key']), bytes.fromhex(v['xorKey']))
+            for v in body['values']]
+
+
+def insert_coerced():
+    body = decode(KV_VALUES, InsertKVValuesReq, coerce=True)
+    return [(v['key'], v['xorKey']) for v in body['values']]
+
+
+def main():
+    cases = [
+        ("NewEventReq", new_event_then_parse, new_event_coerced),
+        ("InsertKVValuesReq x20", insert_then_parse, insert_coerced),
+    ]
+    for name, old, new in cases:
+        old_t = usec(old, NUMBER)
+        new_t = usec(new, NUMBER)
+        print(f"{name:>22}: decode+parse {old_t:7.1f}us  "
+              f"coerce {new_t:7.1f}us  x{old_t / new_t:4.1f}")
+
+
+if __name__ == '__main__':
+    main()
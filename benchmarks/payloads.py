@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Documents and timing helpers shared by the benchmarks, which import it
+from this directory. It isn't a benchmark itself.
+"""
+
+from timeit import timeit
+
+# Timings which grow with the document run about this many elements
+SCALED_ELEMENTS = 20000
+
+
+def usec(fn, number):
+    # Mean microseconds per call of fn over number calls
+    return timeit(fn, number=number) / number * 1e6
+
+
+def scaled_number(size):
+    # Calls to time for a document of size elements
+    return max(1, SCALED_ELEMENTS // size)
+
+
+def kv_values(n):
+    # InsertKVValuesReq
+    return {
+        "values": [{
+            "key": f"{i:032x}",
+            "value": "v" * 64,
+            "xorKey": f"{i:064x}",
+            "expiryTime": 1700000000 + i,
+        } for i in range(n)]
+    }
+
+
+def kv_retrieved(n, misses=0.0):
+    # RetrieveKVValuesResp, with the misses fraction of its values null
+    def hit(i):
+        return i % 4 >= misses * 4
+
+    return {
+        "values": [{
+            "key": f"{i:032x}",
+            "value": "v" * 64 if hit(i) else None,
+            "xorKey": f"{i:064x}" if hit(i) else None,
+            "expiryTime": 1700000000 + i if hit(i) else None,
+        } for i in range(n)]
+    }
+
+
+def new_event():
+    # NewEventReq
+    return {
+        "name": "Tulip",
+        "phoneOrEmail": "tulip@example.com",
+        "date": "2024-06-01",
+        "startTime": "14:00",
+        "endTime": "16:30",
+        "description": "birthday party",
+        "totalPrice": 100,
+        "deposit": 10,
+    }
+
+
+def websocket_req(n):
+    # WebSocketReq, with n of each kind of id
+    return {
+        "sessionIds": [f"{i:032x}" for i in range(n)],
+        "userIds": [f"{i:032X}" for i in range(n)],
+        "loginIds": [f"{i:032x}" for i in range(n)],
+        "message": "hello",
+    }
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare decoding InsertKVValuesReq to dicts against decoding it to the
+records record_class generates: the time to decode and the memory the
+decoded document holds on to, measured with tracemalloc.
+
+    python benchmarks/records.py
+"""
+
+import json as js
+import tracemalloc
+
+from lib.doolally import decode, record_class
+from schemas.kvstore import InsertKVValuesReq
+
+from payloads import kv_values, scaled_number, usec
+
+SIZES = (10, 100, 1000)
+
+
+def retained(s, records):
+    tracemalloc.start()
+    doc = decode(s, InsertKVValuesReq, coerce=True, records=records)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del doc
+    return size
+
+
+def main():
+    record_class(InsertKVValuesReq)
+    for size in SIZES:
+        s = js.dumps(kv_values(size))
+        number = scaled_number(size)
+        times = [
+            usec(lambda: decode(s, InsertKVValuesReq, coerce=True,
+                                records=records),
+                 number)
+            for records in (False, True)
+        ]
+        sizes = [retained(s, records) for records in (False, True)]
+        print(f"InsertKVValuesReq x{size:<5}: "
+              f"dicts {times[0]:8.1f}us {sizes[0] / 1024:7.1f}KiB  "
+              f"records {times[1]:8.1f}us {sizes[1] / 1024:7.1f}KiB")
+
+
+if __name__ == '__main__':
+    main()
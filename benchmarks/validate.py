@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare the Tokenizer walk against the compiled validator validate now
+uses, for a valid document of every schema in schemas/. Documents are
+generated from the schemas, collections with a few elements each. Then
+time both on kvstore inserts of increasing size, per element.
+
+    python benchmarks/validate.py
+"""
+
+import importlib
+import pkgutil
+
+import schemas
+from lib.doolally import (
+    Any,
+    AnyAtomic,
+    AnyCollection,
+    Bool,
+    Null,
+    Number,
+    Schema,
+    SchemaLessObject,
+    StaticTypeArray,
+    StaticTypeObject,
+    String,
+    TagObject,
+    Union,
+    compile,
+    validate_tokens,
+)
+from schemas.kvstore import InsertKVValuesReq
+from schemas.rabbitmq import msg_type_val
+from schemas.tuliptheclown import event_date_val
+from schemas.validators import (
+    date_val,
+    email_addr_val,
+    full_url_val,
+    isotimestamp_val,
+    javascript_date_val,
+    phone_val,
+    time_val,
+)
+from schemas.websocket import websocket_type_val
+
+from payloads import kv_values, scaled_number, usec
+
+NUMBER = 2000
+ELEMENTS = 3
+INSERT_SIZES = (100, 1000, 10000)
+
+# Strings passing the custom validators
+VALIDATED = {
+    date_val: "01 Jun 2024",
+    email_addr_val: "tulip@example.com",
+    event_date_val: "Sat 01 Jun 2024",
+    full_url_val: "https://example.com/callback",
+    isotimestamp_val: "2024-06-01T14:00:00",
+    javascript_date_val: "2024-06-01",
+    msg_type_val: "email",
+    phone_val: "+441234567890",
+    time_val: "14:00",
+    websocket_type_val: "email.message",
+}
+
+
+def sample(field):
+    # A valid value for field
+    if isinstance(field, Any):
+        return {"a": [1, "b", None]}
+    if isinstance(field, Union):
+        return sample((field._atomic_fields + field._collection_fields)[0])
+    if isinstance(field, String):
+        if getattr(field, 'whitelist', None):
+            return sorted(field.whitelist)[0]
+        if field.validator in VALIDATED:
+            return VALIDATED[field.validator]
+        # Hex, to pass hexstring_val
+        length = max(field.min_length, 16)
+        if field.max_length != -1:
+            length = min(length, field.max_length)
+        return "a" * length
+    if isinstance(field, Number):
+        value = field.min_value if field.min_value is not None else 1
+        return int(value) if field.is_int else value + 0.5
+    if isinstance(field, Bool):
+        return True
+    if isinstance(field, Null):
+        return None
+    if isinstance(field, AnyAtomic):
+        return "a"
+    if isinstance(field, AnyCollection):
+        return [1, 2]
+    if isinstance(field, Schema):
+        return {k: sample(f) for k, f in field.doolally_fields.items()}
+    if isinstance(field, StaticTypeArray):
+        n = max(field.min_length, ELEMENTS)
+        if field.max_length != -1:
+            n = min(n, field.max_length)
+        return [sample(field.element_field) for _ in range(n)]
+    if isinstance(field, TagObject):
+        return {f"tag{i}": "a" for i in range(ELEMENTS)}
+    if isinstance(field, SchemaLessObject):
+        return sample(Any())
+    if isinstance(field, StaticTypeObject):
+        # One element, values needn't be unique then
+        return {"a": sample(field.element_field)}
+
+    raise TypeError(f"no sample for {field!r}")
+
+
+def all_schemas():
+    for module_info in pkgutil.iter_modules(schemas.__path__):
+        module = importlib.import_module(f"schemas.{module_info.name}")
+        for value in vars(module).values():
+            if (isinstance(value, type) and issubclass(value, Schema) and
+                    value.__module__ == module.__name__):
+                yield value
+
+
+def main():
+    for schema in all_schemas():
+        doc = sample(schema())
+        validate_tokens(doc, schema)
+        check = compile(schema)
+
+        old_t = usec(lambda: validate_tokens(doc, schema), NUMBER)
+        new_t = usec(lambda: check(doc), NUMBER)
+        print(f"{schema.__name__:>24}: tokenizer {old_t:7.1f}us  "
+              f"compiled {new_t:6.1f}us  "
+              f"x{old_t / new_t:5.1f}")
+
+    check = compile(InsertKVValuesReq)
+    for size in INSERT_SIZES:
+        doc = kv_values(size)
+        number = scaled_number(size)
+        old_t = usec(lambda: validate_tokens(doc, InsertKVValuesReq),
+                     number) / size
+        new_t = usec(lambda: check(doc), number) / size
+        print(f"{'InsertKVValuesReq x' + str(size):>24}: "
+              f"tokenizer {old_t:5.1f}us/element  "
+              f"compiled {new_t:5.1f}us/element")
+
+
+if __name__ == '__main__':
+    main()
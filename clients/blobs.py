@@ -6,8 +6,9 @@ import requests
 
 from clients.exceptions import CallFailed
 from lib import traceparent
-from lib.doolally import validate as validate_json
+from lib.metrics import timed_phase
 from lib.tokens import build_blob_token, CONTENT_TYPES
+from lib.validation import validate as validate_json
 from schemas.blobs import InsertBlobResp
 
 BLOBS_ADDR = os.environ.get('PLANTPOT_BLOBS_ADDR', 'blobs:8080')
@@ -21,7 +22,8 @@ def insert(ctx, content_type, blob):
     }
 
     try:
-        resp = requests.post(BLOBS_URL, headers=headers, data=blob)
+        with timed_phase('blobs'):
+            resp = requests.post(BLOBS_URL, headers=headers, data=blob)
         if 'X-Error' in resp.headers:
             raise Exception(resp.headers['X-Error'])
 
@@ -11,7 +11,9 @@ from base64 import b64encode, b64decode
 import requests
 
 from lib import xor_encrypt, traceparent
-from lib.doolally import validate as validate_json, ValidationError
+from lib.doolally import ValidationError
+from lib.metrics import timed_phase
+from lib.validation import validate as validate_json
 from clients.exceptions import CallFailed, BadResponsePayload
 from schemas.kvstore import RetrieveKVValuesResp
 
@@ -39,9 +41,10 @@ def insert(ctx, prefix, mapping, ttl):
 
     try:
         headers = {"Traceparent": traceparent(ctx)}
-        resp = requests.post(INSERT_URL,
-                             headers=headers,
-                             json=dict(values=payload))
+        with timed_phase('kvstore'):
+            resp = requests.post(INSERT_URL,
+                                 headers=headers,
+                                 json=dict(values=payload))
         if "X-Error" in resp.headers:
             raise Exception(resp.headers['X-Error'])
 
@@ -84,7 +87,8 @@ def retrieve_req(ctx, prefix, *keys):
 
     try:
         headers = {"Traceparent": traceparent(ctx)}
-        resp = requests.get(url, headers=headers)
+        with timed_phase('kvstore'):
+            resp = requests.get(url, headers=headers)
 
         if "X-Error" in resp.headers:
             raise Exception(resp.headers['X-Error'])
@@ -7,21 +7,54 @@ from hashlib import sha256
 import requests
 
 from clients.exceptions import CallFailed
+from lib.metrics import timed_phase
 
 
 MONSTERMAC_ADDR = os.environ.get("PLANTPOT_MONSTERMAC_ADDR", "monstermac:8081")
 URL = f"http://{MONSTERMAC_ADDR}"
+# File objects are sent in chunks of this size
+CHUNK_SIZE = 64 * 1024
+
+
+class FileBody:
+    """
+    FileBody streams the rest of a file to requests in chunks. Its length
+    is known up front, so requests sends a Content-Length without asking
+    the file for fileno(), which rolls a SpooledTemporaryFile over to disk.
+    """
+
+    def __init__(self, file):
+        self._file = file
+        start = file.tell()
+        file.seek(0, os.SEEK_END)
+        self._length = file.tell() - start
+        file.seek(start)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        read = self._file.read
+        chunk = read(CHUNK_SIZE)
+        while chunk:
+            yield chunk
+            chunk = read(CHUNK_SIZE)
 
 
 def monstermac(value):
     if isinstance(value, str):
         value = bytes(value, encoding='utf8')
 
-    if not isinstance(value, (bytes, bytearray)):
-        raise TypeError("expected str or bytes for monstermac")
+    # File objects are streamed to monstermac rather than read into memory
+    if not isinstance(value, (bytes, bytearray)) and not hasattr(value, 'read'):
+        raise TypeError("expected str, bytes or file for monstermac")
+
+    if hasattr(value, 'read'):
+        value = FileBody(value)
 
     try:
-        resp = requests.post(URL, data=value)
+        with timed_phase('monstermac'):
+            resp = requests.post(URL, data=value)
         if 'X-Error' in resp.headers:
             raise Exception(resp.headers['X-Error'])
 
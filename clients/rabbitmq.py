@@ -7,7 +7,8 @@ import os
 import pika
 
 from clients.exceptions import CallFailed
-from lib.doolally import validate as validate_json
+from lib.metrics import timed_phase
+from lib.validation import validate as validate_json
 from schemas.rabbitmq import (
     RabbitMessage,
     EmailMessage,
@@ -46,12 +47,13 @@ def send(ctx, msg_type, payload):
     validate_json(message, RabbitMessage)
 
     try:
-        conn, channel = queue('plantpot')
-        channel.basic_publish(exchange='',
-                              routing_key='plantpot',
-                              body=js.dumps(message))
+        with timed_phase('rabbitmq'):
+            conn, channel = queue('plantpot')
+            channel.basic_publish(exchange='',
+                                  routing_key='plantpot',
+                                  body=js.dumps(message))
 
-        conn.close()
+            conn.close()
 
     except pika.exceptions.AMQPError as exc:
         raise CallFailed(f'failed to send message to rabbit {exc}')
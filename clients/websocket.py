@@ -7,7 +7,9 @@ import os
 import requests
 
 from clients.exceptions import CallFailed
-from lib.doolally import validate as validate_json, ValidationError
+from lib.doolally import ValidationError
+from lib.metrics import timed_phase
+from lib.validation import validate as validate_json
 from schemas.websocket import EmailSentReq, WebSocketMessage, WebSocketReq
 
 WEBSOCKET_ADDR = os.environ.get('PLANTPOT_WEBSOCKET_MSG_ADDR', 'websocket:8081')
@@ -33,7 +35,8 @@ def send_message(ctx,
     }
 
     validate_json(payload, WebSocketReq)
-    resp = requests.post(WEBSOCKET_MSG_URL, json=payload)
+    with timed_phase('websocket'):
+        resp = requests.post(WEBSOCKET_MSG_URL, json=payload)
     if 'X-Error' in resp.headers:
         raise CallFailed(resp.headers['X-Error'])
 
@@ -1,11 +1,39 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import asyncio
+import os
 import traceback
 from collections import namedtuple
+from collections.abc import Mapping
+from time import perf_counter
+from tempfile import SpooledTemporaryFile
 from urllib.parse import parse_qs
 
-ENDPOINTS = []
+from .routing import Router, PathMatcher, PathExact, PathPrefix
+from .compression import Compression, StaticContent
+from .conditional import ETag, etag_matches
+from .cache import CachePolicy, SharedGenerations
+from .coalesce import SingleFlight
+from .admission import Admission, Limiter, Rejected, PRIORITIES
+from .timing import Timing
+from .profiling import StackSampler, RouteProfiler, ProfilerBusy
+from .background import (
+    BackgroundPool,
+    ClosingIterator,
+    defer,
+    default_pool,
+    start_request,
+    end_request,
+)
+from .asgi import receive_body, environ_from_scope, send_response, lifespan
+from .files import (
+    FILE_CHUNK_SIZE,
+    RangeNotSatisfiable,
+    parse_range,
+    file_validators,
+    mmap_chunks,
+)
 
 __all__ = [
     'Application',
@@ -18,51 +46,192 @@ __all__ = [
     'internal_server_error',
     'Request',
     'Response',
+    'Headers',
+    'Compression',
+    'StaticContent',
+    'ETag',
+    'CachePolicy',
+    'SharedGenerations',
+    'SingleFlight',
+    'BackgroundPool',
+    'defer',
+    'Admission',
+    'PRIORITIES',
+    'Limiter',
+    'Timing',
+    'StackSampler',
+    'RouteProfiler',
+    'Router',
+    'PathMatcher',
+    'PathExact',
+    'PathPrefix',
 ]
 
 UrlParamArg = namedtuple("UrlParamArg", ("key", "sanity"))
 
-
-def app(environ, start_response):
-    req = Request.from_environ(environ)
-    resp = Response(req)
-
-    try:
-        for endpoint in ENDPOINTS:
-            if endpoint(req, resp):
-                if not resp.set_header_called():
-                    err_str = "response object header not set"
-                    environ['wsgi.errors'].write(err_str)
-                    raise internal_server_error("No Header", err_str)
-
-                # request handled by endpoint handler
-                break
-        else:
-            raise not_found()
-
-    except Redirect as exc:
-        headers = [("Location", exc.location)]
-        resp.set_header(exc.args[0], headers)
-
-    except ErrorResponse as exc:
-        headers = []
-        if exc.x_error:
-            headers.append(("X-Error", exc.x_error))
-
-        resp.set_header(exc.args[0], headers)
-        resp.set_content_bytes(b"")
-
-    start_response(resp.status, resp.headers)
-    return resp.bytes_iter()
+# Size of the chunks read from wsgi.input when streaming a body
+BODY_CHUNK_SIZE = 64 * 1024
+# Streamed bodies larger than this are spooled to a temporary file
+SPOOL_THRESHOLD = 1024 * 1024
 
 
 class Application:
 
-    def __init__(self, name):
+    def __init__(self,
+                 name,
+                 compression=None,
+                 background=None,
+                 admission=None,
+                 timing=None,
+                 metrics=None,
+                 profiler=None):
         self.name = name
+        self._router = Router()
+        self._compression = compression
+        # Application wide concurrency limit shared by every endpoint
+        self._admission = admission
+        # Per phase latency, endpoints are only instrumented when set
+        self._timing = timing
+        # Request counts, latency and in flight gauges by route, see
+        # observe_request
+        self._metrics = metrics
+        # Profiles the next requests to a route on demand, see RouteProfiler
+        self._profiler = profiler
+        # Runs tasks deferred with defer() once responses are sent
+        self._background = background or default_pool()
 
     def __call__(self, environ, start_response):
-        return app(environ, start_response)
+        token = start_request()
+        try:
+            req, resp = self.dispatch(environ)
+        finally:
+            deferred = end_request(token)
+
+        if self._compression is not None:
+            self._compression.apply(req, resp)
+
+        start_response(resp.status, resp.headers)
+        if not deferred and not req.spooled:
+            return resp.bytes_iter()
+
+        return ClosingIterator(resp.bytes_iter(),
+                               lambda: self.sent(req, deferred))
+
+    def sent(self, req, deferred):
+        # Once the response has been sent
+        try:
+            req.close()
+        finally:
+            self._background.submit_all(deferred)
+
+    async def asgi(self, scope, receive, send):
+        """
+        ASGI entry point. Callbacks and the clients they use block, so each
+        request is dispatched in a worker thread as under WSGI, only the
+        body is received on the event loop.
+        """
+        if scope['type'] == 'lifespan':
+            return await lifespan(receive, send)
+
+        if scope['type'] != 'http':
+            raise RuntimeError(f"unsupported ASGI scope {scope['type']}")
+
+        environ = environ_from_scope(scope, None)
+        loop = asyncio.get_running_loop()
+
+        def read_body(req, endpoint):
+            # The body is read once the endpoint is known so its
+            # max_body_size applies before anything is buffered
+            body = asyncio.run_coroutine_threadsafe(
+                receive_body(receive, SPOOL_THRESHOLD, endpoint.max_body_size,
+                             req.content_length), loop).result()
+            if body is None:
+                raise payload_too_large(endpoint.max_body_size)
+            environ['wsgi.input'] = body
+
+        token = start_request()
+        try:
+            req, resp = await asyncio.to_thread(self.dispatch, environ,
+                                                read_body)
+        finally:
+            deferred = end_request(token)
+
+        if self._compression is not None:
+            self._compression.apply(req, resp)
+
+        try:
+            await send_response(send, resp)
+        finally:
+            if environ['wsgi.input'] is not None:
+                environ['wsgi.input'].close()
+            self.sent(req, deferred)
+
+    def dispatch(self, environ, read_body=None):
+        """
+        dispatch runs the endpoint for environ and returns the populated
+        (Request, Response), before compression. It is also used to run
+        requests in process, see plantpot's batch endpoint. read_body, when
+        given, is called with the request and endpoint once it is resolved
+        to fill in wsgi.input, see asgi.
+        """
+        req = Request.from_environ(environ)
+        resp = Response(req)
+        if self._metrics is not None:
+            self.observe_request(req, resp, read_body)
+            return req, resp
+
+        try:
+            endpoint = self.resolve(req)
+            if read_body is not None:
+                read_body(req, endpoint)
+            endpoint(req, resp)
+            self.check_header(req, resp)
+
+        except ResponseException as exc:
+            error_response(resp, exc)
+
+        return req, resp
+
+    def observe_request(self, req, resp, read_body=None):
+        """
+        Runs the request as dispatch does, telling metrics when a request
+        starts and stops on a route (None when it matched no route) and
+        observing its status and duration.
+        """
+        start = perf_counter()
+        route = None
+        try:
+            endpoint = self.resolve(req)
+            route = endpoint.route
+            if read_body is not None:
+                read_body(req, endpoint)
+            self._metrics.started(route)
+            try:
+                endpoint(req, resp)
+            finally:
+                self._metrics.stopped(route)
+            self.check_header(req, resp)
+
+        except ResponseException as exc:
+            error_response(resp, exc)
+
+        self._metrics.observe(route, req.method, resp.status,
+                              perf_counter() - start)
+
+    def resolve(self, req):
+        endpoint, allowed = self._router.resolve(req.method, req.path, req)
+        if endpoint is None:
+            if allowed:
+                raise method_not_allowed(allowed)
+            raise not_found()
+
+        return endpoint
+
+    def check_header(self, req, resp):
+        if not resp.set_header_called():
+            err_str = "response object header not set"
+            req.errors.write(err_str)
+            raise internal_server_error("No Header", err_str)
 
     def add_endpoint(self,
                      matcher,
@@ -74,92 +243,328 @@ class Application:
                      pass_headers=False,
                      url_param_args=None,
                      pass_query=False,
-                     req_body_transform=None):
+                     req_body_transform=None,
+                     max_body_size=None,
+                     stream_body=False,
+                     spool_threshold=SPOOL_THRESHOLD,
+                     etag=None,
+                     cache=None,
+                     coalesce=None,
+                     max_concurrency=None,
+                     max_queue_ms=0,
+                     priority='normal',
+                     retry_after=1):
+
+        bind = make_binder(pass_context=pass_context,
+                           path_parts=path_parts,
+                           req_body_transform=req_body_transform,
+                           pass_content_type=pass_content_type,
+                           url_param_args=url_param_args,
+                           pass_headers=pass_headers,
+                           pass_query=pass_query,
+                           max_body_size=max_body_size,
+                           stream_body=stream_body,
+                           spool_threshold=spool_threshold)
+
+        if self._timing is not None:
+            bind, clb, populate_response = self._timing.instrument(
+                bind, clb, populate_response)
+
+        route = getattr(matcher, 'path', None) or repr(matcher)
+        metrics = self._metrics
+
+        limiter = None
+        if max_concurrency is not None or self._admission is not None:
+            limiter = Limiter(max_concurrency=max_concurrency,
+                              max_queue_ms=max_queue_ms,
+                              priority=priority,
+                              shared=self._admission)
+
+        def call(resp, args, kwargs):
+            try:
+                ret = clb(*args, **kwargs)
 
-        url_param_args = url_param_args or []
+                if isinstance(ret, ResponseException):
+                    raise ret
+
+                populate_response(resp, ret)
+
+            except ResponseException:
+                # Redirect / Bad Request etc.
+                raise
+
+            except Exception as exc:
+                resp.exc_response(exc)
+
+        def handle(req, resp, key, generation):
+            args, kwargs = bind(req)
+
+            tag = None
+            if etag is not None:
+                tag, not_modified = etag.precondition(req, resp, args, kwargs)
+                if not_modified:
+                    return
+
+            if coalesce is None:
+                call(resp, args, kwargs)
+            else:
+                flight_key = coalesce.key(req.method,
+                                          flight_args(args, generation),
+                                          kwargs)
+                collapsed = coalesce.call(flight_key, resp, call, args, kwargs)
+                if collapsed and metrics is not None:
+                    metrics.collapsed(route)
+
+            finish(req, resp, tag, key, generation)
 
         def endpoint(req, resp):
-            if not matcher(req):
-                return False
+            key = generation = None
+            if cache is not None:
+                key, generation = cache.key(req), cache.generation()
+                if serve_cached(req, resp, cache.get(key)):
+                    return
+
+            if limiter is None:
+                return handle(req, resp, key, generation)
 
-            args = []
-            # Full signature
-            # (context, *path_parts, body, content_type, *url_param_args, *headers, **query)
+            try:
+                limiter.acquire()
+            except Rejected:
+                raise rejected()
 
-            # Context
+            try:
+                handle(req, resp, key, generation)
+            finally:
+                limiter.release()
+
+        def flight_args(args, generation):
+            # The trace context is per request, it mustn't split flights.
+            # Requests after an invalidate mustn't join flights started
+            # before it, or the stale response would be cached anew.
             if pass_context:
-                args.append(req.ctx)
+                args = args[1:]
+            return (generation, *args)
+
+        def rejected():
+            if metrics is not None:
+                metrics.rejected(route, priority)
+            return service_unavailable(retry_after)
+
+        def serve_cached(req, resp, snapshot):
+            if metrics is not None:
+                metrics.cache_lookup(route, snapshot is not None)
+            if snapshot is None:
+                return False
 
-            # Path Parts
-            if path_parts:
-                args.extend(path_parts(req.path))
+            snapshot.apply(resp)
+            if etag is not None:
+                etag.finish(req, resp, None)
 
-            # body
-            if req_body_transform:
-                args.append((req_body_transform(invalid_payload, req.body)))
+            return True
 
-            # Headers
-            if pass_content_type:
-                args.append(req.content_type)
+        def finish(req, resp, tag, key, generation):
+            if etag is not None:
+                etag.finish(req, resp, tag)
+            if cache is not None:
+                cache.put(key, resp, generation)
 
-            # Query Parameters
-            for url_arg in url_param_args:
-                values = req.params.get(url_arg.key)
-                if not isinstance(values, list) or len(values) != 1:
-                    raise bad_request(
-                        'Bad Url Query',
-                        f'expected exactly one query paramter {url_arg.key}')
+        routed = endpoint
+        if self._timing is not None:
+            routed = self._timing.wrap(route, routed)
+        if self._profiler is not None:
+            routed = self._profiler.wrap(route, routed)
 
-                value = values[0]
-                if url_arg.sanity:
-                    url_arg.sanity(invalid_query_param, value)
+        routed.limiter = limiter
+        routed.route = route
+        routed.max_body_size = max_body_size
+        self._router.add(matcher, routed)
 
-                args.append(value)
-                del req.params[url_arg.key]
+        return routed
 
-            if pass_headers:
-                # pass headers as *args
-                args.extend(req.headers)
 
-            try:
-                if pass_query:
-                    # Pass query as **kwargs
-                    ret = clb(*args, **req.params)
-                else:
-                    ret = clb(*args)
+def error_response(resp, exc):
+    if isinstance(exc, Redirect):
+        headers = [("Location", exc.location)]
+        resp.set_header(exc.args[0], headers)
+        return
+
+    headers = list(exc.headers)
+    if exc.x_error:
+        headers.append(("X-Error", exc.x_error))
+
+    resp.set_header(exc.args[0], headers)
+    resp.set_content_bytes(b"")
+    resp.set_bytes_iter(None)
+
+
+def make_binder(pass_context=False,
+                path_parts=None,
+                req_body_transform=None,
+                pass_content_type=False,
+                url_param_args=None,
+                pass_headers=False,
+                pass_query=False,
+                max_body_size=None,
+                stream_body=False,
+                spool_threshold=SPOOL_THRESHOLD):
+    """
+    make_binder generates a function bind(req) -> (args, kwargs) for an
+    endpoint. Only the steps the endpoint asked for are compiled in, so
+    there are no per-request branches on the endpoint configuration.
+
+    Full signature
+    (context, *path_parts, body, content_type, *url_param_args, *headers, **query)
+
+    With stream_body the body is passed to req_body_transform as a file
+    object (spooled to disk above spool_threshold bytes) rather than
+    bytes, it is closed once the response has been sent. Only endpoints
+    with a req_body_transform are passed the body, so stream_body needs
+    one. max_body_size rejects larger bodies with a 413 before they are
+    read where Content-Length allows.
+
+    >>> bind = make_binder(pass_query=True)
+    >>> bind(Request.from_environ({"QUERY_STRING": "a=1"}))
+    ((), {'a': ['1']})
+    >>> make_binder(stream_body=True)
+    Traceback (most recent call last):
+    ...
+    ValueError: stream_body needs a req_body_transform
+    """
+    if stream_body and req_body_transform is None:
+        raise ValueError("stream_body needs a req_body_transform")
+
+    url_param_args = url_param_args or []
+    namespace = {
+        'path_parts': path_parts,
+        'req_body_transform': req_body_transform,
+        'invalid_payload': invalid_payload,
+        'url_param': url_param,
+        'url_keys': frozenset(a.key for a in url_param_args),
+        'max_body_size': max_body_size,
+        'spool_threshold': spool_threshold,
+        'EMPTY': {},
+    }
+
+    if stream_body:
+        body = "req.spool_body(max_body_size, spool_threshold)"
+    elif max_body_size is not None:
+        body = "req.read_body(max_body_size)"
+    else:
+        body = "req.body"
+
+    args = []
+    if pass_context:
+        args.append("req.ctx")
+    if path_parts:
+        args.append("*path_parts(req.path)")
+    if req_body_transform:
+        args.append(f"req_body_transform(invalid_payload, {body})")
+    if pass_content_type:
+        args.append("req.content_type")
+    for n, url_arg in enumerate(url_param_args):
+        namespace[f'url_arg_{n}'] = url_arg
+        args.append(f"url_param(params, url_arg_{n})")
+    if pass_headers:
+        args.append("*req.headers")
+
+    if not pass_query:
+        kwargs = "EMPTY"
+    elif url_param_args:
+        # Url param args are consumed, they aren't passed twice
+        kwargs = "{k: v for k, v in params.items() if k not in url_keys}"
+    else:
+        kwargs = "params"
+
+    lines = ["def bind(req):"]
+    if url_param_args or pass_query:
+        lines.append("    params = req.params")
+    lines.append(f"    return ({', '.join(args)}{',' if args else ''}), {kwargs}")
+
+    exec("\n".join(lines), namespace)
+    return namespace['bind']
+
+
+def url_param(params, url_arg):
+    values = params.get(url_arg.key)
+    if not isinstance(values, list) or len(values) != 1:
+        raise bad_request(
+            'Bad Url Query',
+            f'expected exactly one query paramter {url_arg.key}')
+
+    value = values[0]
+    if url_arg.sanity:
+        url_arg.sanity(invalid_query_param, value)
+
+    return value
+
+
+class Headers(Mapping):
+    """
+    Headers is a case-insensitive, read only view of the request headers
+    in a WSGI environ. Lookups go straight to the environ, nothing is
+    copied.
+
+    >>> h = Headers({"HTTP_IF_NONE_MATCH": '"abc"', "CONTENT_TYPE": "text/html"})
+    >>> h['if-none-match'], h['If-None-Match'], h.get('Content-Type')
+    ('"abc"', '"abc"', 'text/html')
+    >>> 'range' in h, len(h)
+    (False, 2)
+    """
+
+    __slots__ = ('_environ', )
+
+    def __init__(self, environ):
+        self._environ = environ
 
-                if isinstance(ret, ResponseException):
-                    raise ret
+    @staticmethod
+    def environ_key(name):
+        key = name.upper().replace('-', '_')
+        if key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            return key
+        return 'HTTP_' + key
 
-                populate_response(resp, ret)
+    def __getitem__(self, name):
+        return self._environ[self.environ_key(name)]
 
-            except ResponseException:
-                # Redirect / Bad Request etc.
-                raise
+    def get(self, name, default=None):
+        return self._environ.get(self.environ_key(name), default)
 
-            except Exception as exc:
-                resp.exc_response(exc)
+    def __contains__(self, name):
+        return self.environ_key(name) in self._environ
 
-            return True
+    def __iter__(self):
+        for key in self._environ:
+            if key.startswith('HTTP_'):
+                yield key[len('HTTP_'):].replace('_', '-').title()
+            elif key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                yield key.replace('_', '-').title()
 
-        ENDPOINTS.append(endpoint)
+    def __len__(self):
+        return sum(1 for _ in self)
 
 
 class Request:
 
+    __slots__ = (
+        '_environ',
+        '_body',
+        '_params',
+        '_qs',
+        '_headers',
+        '_spool',
+    )
+
     @classmethod
     def from_environ(cls, environ):
         self = cls()
         self._environ = environ
         self._body = None
         self._params = None
-        self._qs = self._environ.get("QUERY_STRING", "")
-
-        self._headers = []
-        for (k, v) in environ.items():
-            if k.startswith('HTTP_'):
-                pair = (k[len('HTTP_'):], v)
-                self._headers.append(pair)
+        self._qs = environ.get("QUERY_STRING", "")
+        # Built on first use, few endpoints ever look at the headers
+        self._headers = None
+        # The spooled body of stream_body endpoints, see close
+        self._spool = None
 
         return self
 
@@ -180,12 +585,34 @@ class Request:
 
     @property
     def headers(self):
+        # (NAME, value) pairs as passed to pass_headers endpoints
+        if self._headers is None:
+            self._headers = [
+                (k[len('HTTP_'):], v)
+                for (k, v) in self._environ.items()
+                if k.startswith('HTTP_')
+            ]
+
         return self._headers
 
+    @property
+    def header_map(self):
+        return Headers(self._environ)
+
     @property
     def content_type(self):
         return self._environ.get("CONTENT_TYPE")
 
+    def get_header(self, name, default=None):
+        return self._environ.get(Headers.environ_key(name), default)
+
+    @property
+    def content_length(self):
+        try:
+            return int(self._environ.get("CONTENT_LENGTH") or "")
+        except ValueError:
+            return None
+
     @property
     def body(self):
         if self._body is None:
@@ -193,19 +620,98 @@ class Request:
 
         return self._body
 
+    def iter_body(self, chunk_size=BODY_CHUNK_SIZE, max_size=None):
+        """
+        Yields the body in chunks of at most chunk_size bytes, reading no
+        further than Content-Length. If max_size is given a 413 is raised
+        before reading when Content-Length exceeds it, or as soon as more
+        than max_size bytes have arrived otherwise.
+        """
+        remaining = self.content_length
+        if max_size is not None and remaining is not None \
+                and remaining > max_size:
+            raise payload_too_large(max_size)
+
+        stream = self._environ['wsgi.input']
+        received = 0
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            chunk = stream.read(size)
+            if not chunk:
+                break
+
+            received += len(chunk)
+            if max_size is not None and received > max_size:
+                raise payload_too_large(max_size)
+            if remaining is not None:
+                remaining -= len(chunk)
+
+            yield chunk
+
+    def read_body(self, max_size):
+        if self._body is None:
+            self._body = b"".join(self.iter_body(max_size=max_size))
+
+        return self._body
+
+    def spool_body(self, max_size=None, threshold=SPOOL_THRESHOLD):
+        """
+        Returns the body as a file object positioned at the start, the
+        body is held in memory up to threshold bytes and on disk above it.
+        """
+        spool = SpooledTemporaryFile(max_size=threshold)
+        self._spool = spool
+        for chunk in self.iter_body(max_size=max_size):
+            spool.write(chunk)
+
+        spool.seek(0)
+        return spool
+
+    @property
+    def spooled(self):
+        return self._spool is not None
+
+    def close(self):
+        # Called once the response has been sent, removing the spooled
+        # body's temporary file
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+
     @property
     def ctx(self):
         return self._environ['casket.trace_ctx']
 
+    @property
+    def errors(self):
+        return self._environ['wsgi.errors']
+
+    @property
+    def file_wrapper(self):
+        return self._environ.get('wsgi.file_wrapper')
+
 
 class Response:
 
+    __slots__ = (
+        '_req',
+        '_status',
+        '_headers',
+        '_body',
+        '_bytes_iter',
+        '_content_length',
+        '_static',
+        '_file_wrapped',
+    )
+
     def __init__(self, req):
         self._req = req
         self._status = None
         self._headers = None
         self._body = b''
         self._bytes_iter = None
+        self._static = None
+        self._file_wrapped = False
 
     def set_header(self, status, headers):
         self._status = status
@@ -216,14 +722,49 @@ class Response:
 
     def set_content_bytes(self, body):
         self._body = body
+        self._static = None
 
     def set_content_str(self, body):
         self._body = bytes(body, encoding='utf8')
+        self._static = None
+
+    def set_static_content(self, static):
+        # A StaticContent body keeps its compressed forms between requests
+        self._body = static.body
+        self._static = static
+
+    @property
+    def static_content(self):
+        return self._static
+
+    @property
+    def body(self):
+        return self._body
 
     @property
     def status(self):
         return self._status
 
+    def get_header(self, name, default=None):
+        name = name.lower()
+        for (k, v) in (self._headers or []):
+            if k.lower() == name:
+                return v
+
+        return default
+
+    def add_header(self, name, value):
+        if self._headers is None:
+            self._headers = []
+        self._headers.append((name, value))
+
+    def remove_header(self, name):
+        name = name.lower()
+        if self._headers:
+            self._headers = [
+                (k, v) for (k, v) in self._headers if k.lower() != name
+            ]
+
     def exc_response(self, exc):
         self._status = "500 Application Crashed"
         tb = traceback.TracebackException.from_exception(exc)
@@ -240,7 +781,8 @@ class Response:
     def headers(self):
         headers = self._headers or []
 
-        if self._bytes_iter is None:
+        # A 304 carries no body, and no Content-Length describing one
+        if self._bytes_iter is None and not self._status.startswith('304'):
             for (k, v) in headers:
                 if k.lower() == "content-length":
                     break
@@ -251,6 +793,65 @@ class Response:
 
     def set_bytes_iter(self, bytes_iter):
         self._bytes_iter = bytes_iter
+        self._file_wrapped = False
+
+    def is_streamed(self):
+        return self._bytes_iter is not None
+
+    def is_file_wrapped(self):
+        # The body goes through wsgi.file_wrapper, see send_file
+        return self._file_wrapped
+
+    def send_file(self, file, status="200 Ok", headers=None):
+        """
+        send_file responds with an open binary file. Content-Length comes
+        from fstat, single byte Range requests (subject to If-Range) get a
+        206, and the body goes through wsgi.file_wrapper when the server
+        has one so it can use sendfile, otherwise through mmap'd chunks.
+        """
+        stat = os.fstat(file.fileno())
+        size = stat.st_size
+        etag, last_modified = file_validators(stat)
+        headers = list(headers or []) + [
+            ("Accept-Ranges", "bytes"),
+            ("ETag", etag),
+            ("Last-Modified", last_modified),
+        ]
+
+        if_none_match = self._req.get_header('If-None-Match')
+        if if_none_match and etag_matches(if_none_match, etag):
+            file.close()
+            self.set_header("304 Not Modified", [("ETag", etag)])
+            return
+
+        offset, length = 0, size
+        range_header = self._req.get_header('Range')
+        if_range = self._req.get_header('If-Range')
+        if range_header and (if_range is None
+                             or if_range in (etag, last_modified)):
+            try:
+                requested = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                file.close()
+                raise range_not_satisfiable(size)
+
+            if requested is not None:
+                offset, length = requested
+                status = "206 Partial Content"
+                last = offset + length - 1
+                headers.append(("Content-Range", f"bytes {offset}-{last}/{size}"))
+
+        headers.append(("Content-Length", str(length)))
+        self.set_header(status, headers)
+
+        file_wrapper = self._req.file_wrapper
+        if file_wrapper is not None and offset + length == size:
+            # The wrapper sends from the current position through to EOF
+            file.seek(offset)
+            self._bytes_iter = file_wrapper(file, FILE_CHUNK_SIZE)
+            self._file_wrapped = True
+        else:
+            self._bytes_iter = mmap_chunks(file, offset, length)
 
     def bytes_iter(self):
         if self._bytes_iter:
@@ -272,9 +873,10 @@ class Redirect(ResponseException):
 
 class ErrorResponse(ResponseException):
 
-    def __init__(self, status, x_error=""):
+    def __init__(self, status, x_error="", headers=None):
         super().__init__(status)
         self.x_error = x_error
+        self.headers = headers or []
 
 
 def bad_request(status_str, x_error):
@@ -293,6 +895,32 @@ def not_found():
     return ErrorResponse("404 Not Found")
 
 
+def method_not_allowed(allowed):
+    headers = [("Allow", ", ".join(allowed))]
+    return ErrorResponse("405 Method Not Allowed", headers=headers)
+
+
+def payload_too_large(max_size):
+    return ErrorResponse("413 Payload Too Large",
+                         f"request body larger than {max_size} bytes")
+
+
+def service_unavailable(retry_after):
+    headers = [("Retry-After", str(retry_after))]
+    return ErrorResponse("503 Service Unavailable",
+                         "too many requests in flight, retry later",
+                         headers=headers)
+
+
+def conflict(x_error):
+    return ErrorResponse("409 Conflict", x_error)
+
+
+def range_not_satisfiable(size):
+    headers = [("Content-Range", f"bytes */{size}")]
+    return ErrorResponse("416 Range Not Satisfiable", headers=headers)
+
+
 def invalid_query_param(reason):
     return bad_request("Invalid Query", reason)
 
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+
+__all__ = [
+    'Admission',
+    'Limiter',
+    'PRIORITIES',
+]
+
+# Fraction of the application's capacity each priority may fill, so low
+# priority requests are shed first and high priority ones last. They only
+# apply to an application with an Admission.
+PRIORITIES = {
+    'high': 1.0,
+    'normal': 0.8,
+    'low': 0.5,
+}
+
+
+class Rejected(Exception):
+    pass
+
+
+class Admission:
+    """
+    Admission bounds the number of requests in flight across a whole
+    application. Each priority can only fill its share of the capacity,
+    a request arriving when its share is used up is rejected at once.
+
+    >>> a = Admission(10)
+    >>> for _ in range(5): a.enter('low')
+    >>> a.enter('low')
+    Traceback (most recent call last):
+    ...
+    framework.admission.Rejected: low
+    >>> a.enter('high')
+    >>> a.stats()['in_flight'], a.stats()['rejected']
+    (6, {'high': 0, 'normal': 0, 'low': 1})
+    """
+
+    def __init__(self, max_concurrency, shares=None):
+        self.max_concurrency = max_concurrency
+        self._limits = {
+            priority: max(1, int(max_concurrency * share))
+            for (priority, share) in (shares or PRIORITIES).items()
+        }
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = {priority: 0 for priority in self._limits}
+
+    def enter(self, priority):
+        with self._lock:
+            if self.in_flight >= self._limits[priority]:
+                self.rejected[priority] += 1
+                raise Rejected(priority)
+
+            self.in_flight += 1
+
+    def exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        return {
+            'max_concurrency': self.max_concurrency,
+            'in_flight': self.in_flight,
+            'rejected': dict(self.rejected),
+        }
+
+
+class Limiter:
+    """
+    Limiter admits requests to a single endpoint. At most max_concurrency
+    run at once, others wait up to max_queue_ms for a slot before being
+    rejected. When shared is an Admission the application wide limit for
+    priority is checked first.
+
+    acquire raises Rejected when the request should be shed.
+    """
+
+    def __init__(self,
+                 max_concurrency=None,
+                 max_queue_ms=0,
+                 priority='normal',
+                 shared=None):
+        if priority not in PRIORITIES:
+            raise ValueError(f"unknown priority {priority}")
+
+        self.max_concurrency = max_concurrency
+        self.timeout = max_queue_ms / 1000
+        self.priority = priority
+        self.shared = shared
+        self._sem = None
+        if max_concurrency is not None:
+            self._sem = threading.BoundedSemaphore(max_concurrency)
+
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def acquire(self):
+        self._enter_shared()
+        if self._sem is None:
+            self._admit()
+            return
+
+        with self._lock:
+            self.queued += 1
+        try:
+            if self.timeout > 0:
+                acquired = self._sem.acquire(timeout=self.timeout)
+            else:
+                acquired = self._sem.acquire(blocking=False)
+        finally:
+            with self._lock:
+                self.queued -= 1
+
+        if not acquired:
+            self._reject()
+
+        self._admit()
+
+    def release(self):
+        if self._sem is not None:
+            self._sem.release()
+        self._exit()
+
+    def _enter_shared(self):
+        if self.shared is not None:
+            self.shared.enter(self.priority)
+
+    def _admit(self):
+        with self._lock:
+            self.in_flight += 1
+            self.admitted += 1
+
+    def _reject(self):
+        with self._lock:
+            self.rejected += 1
+        if self.shared is not None:
+            self.shared.exit()
+        raise Rejected(self.priority)
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+        if self.shared is not None:
+            self.shared.exit()
+
+    def stats(self):
+        return {
+            'priority': self.priority,
+            'max_concurrency': self.max_concurrency,
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+        }
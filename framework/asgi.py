@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import sys
+from collections import namedtuple
+from tempfile import SpooledTemporaryFile
+
+TraceContext = namedtuple('TraceContext', ('trace_id', 'parent_id', 'span_id'))
+
+TRACEPARENT_REGEX = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+async def receive_body(receive, spool_threshold, max_size=None,
+                       content_length=None):
+    """
+    receive_body reads the request body into a spooled file so large
+    uploads don't sit in memory. Returns None, having read no further,
+    once the body is known to be larger than max_size, from
+    content_length before reading or from the bytes received.
+    """
+    if max_size is not None and content_length is not None \
+            and content_length > max_size:
+        return None
+
+    body = SpooledTemporaryFile(max_size=spool_threshold)
+    received = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+
+        chunk = message.get('body', b'')
+        received += len(chunk)
+        if max_size is not None and received > max_size:
+            body.close()
+            return None
+
+        body.write(chunk)
+        more_body = message.get('more_body', False)
+
+    body.seek(0)
+    return body
+
+
+def trace_context(traceparent):
+    """
+    trace_context continues the trace in a traceparent header with a new
+    span, or starts a new trace when there is no valid header, so ASGI
+    requests carry a trace context like WSGI ones.
+
+    >>> ctx = trace_context("00-" + "ab" * 16 + "-" + "cd" * 8 + "-01")
+    >>> ctx.trace_id == "ab" * 16, ctx.parent_id, len(ctx.span_id)
+    (True, 'cdcdcdcdcdcdcdcd', 16)
+    >>> ctx = trace_context(None)
+    >>> len(ctx.trace_id), ctx.parent_id, len(ctx.span_id)
+    (32, None, 16)
+    """
+    match = TRACEPARENT_REGEX.match(traceparent or "")
+    if match is None:
+        return TraceContext(os.urandom(16).hex(), None, os.urandom(8).hex())
+
+    return TraceContext(match.group(1), match.group(2), os.urandom(8).hex())
+
+
+def environ_from_scope(scope, body):
+    """
+    environ_from_scope builds a WSGI style environ from an ASGI http
+    scope so both entry points share one Request implementation.
+
+    >>> scope = {
+    ...     "type": "http",
+    ...     "method": "GET",
+    ...     "path": "/session",
+    ...     "query_string": b"session_id=ab",
+    ...     "headers": [(b"content-type", b"text/plain"), (b"x-thing", b"1")],
+    ... }
+    >>> env = environ_from_scope(scope, None)
+    >>> env['PATH_INFO'], env['QUERY_STRING'], env['CONTENT_TYPE']
+    ('/session', 'session_id=ab', 'text/plain')
+    >>> env['HTTP_X_THING']
+    '1'
+    >>> env['casket.trace_ctx'].parent_id is None
+    True
+    """
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+    }
+
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+
+        key = 'HTTP_' + name
+        if key in environ:
+            value = environ[key] + ',' + value
+        environ[key] = value
+
+    environ['casket.trace_ctx'] = trace_context(environ.get('HTTP_TRACEPARENT'))
+    return environ
+
+
+async def send_response(send, resp):
+    status = int(resp.status.split(' ', 1)[0])
+    headers = [
+        (bytes(k.lower(), 'latin-1'), bytes(v, 'latin-1'))
+        for (k, v) in resp.headers
+    ]
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': headers,
+    })
+
+    body = resp.bytes_iter()
+    try:
+        for chunk in body:
+            if chunk:
+                await send({
+                    'type': 'http.response.body',
+                    'body': bytes(chunk),
+                    'more_body': True,
+                })
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+    await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
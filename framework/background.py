@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import contextvars
+import queue
+import threading
+import traceback
+
+__all__ = [
+    'BackgroundPool',
+    'defer',
+]
+
+# Tasks deferred by the request being handled, run once it has been sent
+_deferred = contextvars.ContextVar('framework_deferred', default=None)
+
+OVERFLOW_POLICIES = ('drop', 'run')
+
+
+def defer(fn, *args, **kwargs):
+    """
+    defer schedules fn(*args, **kwargs) to run on the application's
+    background pool after the response has been handed to the server.
+    Context variables are copied so the task sees the request's context.
+    Outside of a request the task is queued immediately.
+    """
+    task = (contextvars.copy_context(), fn, args, kwargs)
+    tasks = _deferred.get()
+    if tasks is None:
+        default_pool().submit_task(task)
+    else:
+        tasks.append(task)
+
+
+def start_request():
+    return _deferred.set([])
+
+
+def end_request(token):
+    tasks = _deferred.get()
+    _deferred.reset(token)
+    return tasks
+
+
+class BackgroundPool:
+    """
+    BackgroundPool runs deferred tasks on a fixed number of daemon threads
+    fed by a bounded queue. When the queue is full the overflow policy
+    decides what happens, 'drop' discards the task and 'run' runs it in the
+    submitting thread. metrics, when given, is told what became of each
+    task with metrics.task(outcome).
+
+    >>> pool = BackgroundPool(workers=1, max_queue=1)
+    >>> pool.stats()
+    {'submitted': 0, 'completed': 0, 'failed': 0, 'dropped': 0, 'queued': 0}
+    """
+
+    def __init__(self,
+                 workers=2,
+                 max_queue=1000,
+                 overflow='drop',
+                 on_error=None,
+                 metrics=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"unknown overflow policy {overflow}")
+
+        self.workers = workers
+        self.overflow = overflow
+        self._on_error = on_error or print_error
+        self._metrics = metrics
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.submit_task((contextvars.copy_context(), fn, args, kwargs))
+
+    def submit_task(self, task):
+        if len(self._threads) < self.workers:
+            self._start()
+
+        with self._lock:
+            self.submitted += 1
+
+        try:
+            self._queue.put_nowait(task)
+            return
+
+        except queue.Full:
+            if self.overflow == 'drop':
+                with self._lock:
+                    self.dropped += 1
+                if self._metrics is not None:
+                    self._metrics.task('dropped')
+                return
+
+        self._run(task)
+
+    def submit_all(self, tasks):
+        for task in tasks:
+            self.submit_task(task)
+
+    def _start(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._work,
+                    name=f"background-{len(self._threads)}",
+                    daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            self._run(self._queue.get())
+
+    def _run(self, task):
+        ctx, fn, args, kwargs = task
+        try:
+            ctx.run(fn, *args, **kwargs)
+
+        except Exception as exc:
+            with self._lock:
+                self.failed += 1
+            if self._metrics is not None:
+                self._metrics.task('failed')
+            self._on_error(fn, exc)
+            return
+
+        with self._lock:
+            self.completed += 1
+        if self._metrics is not None:
+            self._metrics.task('completed')
+
+    def stats(self):
+        return {
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'queued': self._queue.qsize(),
+        }
+
+
+def print_error(fn, exc):
+    traceback.print_exception(type(exc), exc, exc.__traceback__)
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def default_pool():
+    global _default_pool
+
+    if _default_pool is None:
+        with _default_lock:
+            if _default_pool is None:
+                _default_pool = BackgroundPool()
+
+    return _default_pool
+
+
+class ClosingIterator:
+    """
+    ClosingIterator wraps a WSGI response iterable, calling callback once
+    the server has closed it, i.e. after the body has been sent.
+    """
+
+    __slots__ = ('_iterable', '_callback')
+
+    def __init__(self, iterable, callback):
+        self._iterable = iterable
+        self._callback = callback
+
+    def __iter__(self):
+        return iter(self._iterable)
+
+    def close(self):
+        try:
+            if hasattr(self._iterable, 'close'):
+                self._iterable.close()
+        finally:
+            self._callback()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import fcntl
+import mmap
+import os
+import struct
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+from .compression import StaticContent
+
+__all__ = [
+    'CachePolicy',
+    'ResponseSnapshot',
+    'SharedGenerations',
+]
+
+# A generation in a SharedGenerations file
+GENERATION = struct.Struct('q')
+
+
+class ResponseSnapshot:
+    """
+    ResponseSnapshot is a fully populated response which can be replayed
+    onto other Response objects. The body is kept as StaticContent so its
+    compressed forms are only computed once.
+    """
+
+    __slots__ = ('status', 'headers', 'content')
+
+    def __init__(self, status, headers, content):
+        self.status = status
+        self.headers = headers
+        self.content = content
+
+    @classmethod
+    def from_response(cls, resp):
+        content = resp.static_content
+        if content is None:
+            content = StaticContent(resp.body)
+
+        headers = tuple(
+            (k, v) for (k, v) in resp.headers
+            if k.lower() != 'content-length'
+        )
+        return cls(resp.status, headers, content)
+
+    def apply(self, resp):
+        resp.set_header(self.status, list(self.headers))
+        resp.set_static_content(self.content)
+
+
+class CachePolicy:
+    """
+    CachePolicy keeps populated responses for ttl seconds in a bounded LRU,
+    keyed by method, path and the values of the vary_on query parameters.
+    Only 200 responses with an in memory body are stored.
+
+    A cached response is served without binding the request, so any query
+    parameter the callback authorises on (login_id etc.) must be in vary_on.
+
+    With ignore_case, as for the path matchers, paths differing only in
+    case share their entries.
+
+    Every invalidate starts a new generation. A response is only stored
+    by put if no invalidate happened since the generation its handler
+    started in, so a handler racing a write can't store what it read
+    before the write. Each worker process has its own entries. Once
+    shared (see share) a policy's generations are too, and an invalidate
+    in one worker drops the entries of every worker. Unshared, the other
+    workers keep serving their entries for up to ttl.
+
+    >>> policy = CachePolicy(ttl=60, vary_on=['page'], max_entries=1)
+    >>> policy.stats()
+    {'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0}
+    """
+
+    def __init__(self, ttl, vary_on=None, max_entries=1024, ignore_case=True):
+        self.ttl = ttl
+        self.vary_on = tuple(vary_on or [])
+        self.max_entries = max_entries
+        self.ignore_case = ignore_case
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped by each invalidate, see put
+        self._generation = 0
+        # The SharedGenerations slot of a shared policy, and the value it
+        # last had
+        self._shared = None
+        self._slot = None
+        self._seen = 0
+
+    def share(self, generations):
+        """
+        Keeps this policy's generation in generations so invalidates are
+        seen by every worker process. Policies must be shared in the same
+        order in every worker.
+        """
+        if self._shared is not None:
+            return
+
+        self._slot = generations.slot()
+        self._seen = generations.get(self._slot)
+        self._shared = generations
+
+    def generation(self):
+        # The generation a handler starting now belongs to, for put
+        with self._lock:
+            self._sync()
+            return self._generation
+
+    def _sync(self):
+        # Another worker invalidated, everything cached here may be stale
+        if self._shared is None:
+            return
+
+        seen = self._shared.get(self._slot)
+        if seen != self._seen:
+            self._seen = seen
+            self._generation += 1
+            self._entries.clear()
+
+    def key(self, req):
+        path = req.path.lower() if self.ignore_case else req.path
+        if not self.vary_on:
+            return (req.method, path)
+
+        params = req.params
+        return (req.method, path) + tuple(
+            tuple(params.get(name, ())) for name in self.vary_on)
+
+    def get(self, key):
+        now = monotonic()
+        with self._lock:
+            self._sync()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires, snapshot = entry
+            if expires <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return snapshot
+
+    def put(self, key, resp, generation):
+        if not resp.status.startswith('200') or resp.is_streamed():
+            return
+
+        snapshot = ResponseSnapshot.from_response(resp)
+        with self._lock:
+            self._sync()
+            if generation != self._generation:
+                # Invalidated while the handler ran
+                return
+
+            self._entries[key] = (monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, path=None):
+        """
+        Drops every cached response, or only those for path when given.
+        Write endpoints call this (see plantpot's invalidates option) so
+        readers don't see stale data for the rest of the ttl. Shared, the
+        other workers drop all their entries.
+        """
+        with self._lock:
+            self._sync()
+            self._generation += 1
+            if self._shared is not None:
+                seen = self._shared.bump(self._slot)
+                if seen != self._seen + 1:
+                    # Another worker invalidated too
+                    path = None
+                self._seen = seen
+
+            if path is None:
+                self._entries.clear()
+                return
+
+            if self.ignore_case:
+                path = path.lower()
+            for key in [k for k in self._entries if k[1] == path]:
+                del self._entries[key]
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+        }
+
+
+class SharedGenerations:
+    """
+    SharedGenerations keeps the generations of CachePolicys in a file that
+    every worker process of a service maps. Reading a generation is one
+    unpack from the mapping. Bumping one holds a lockf lock on the file,
+    so concurrent invalidates in different workers are all counted.
+
+    >>> import tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'generations.db')
+    >>> a, b = SharedGenerations(path), SharedGenerations(path)
+    >>> slot = a.slot()
+    >>> a.bump(slot), b.bump(slot), a.get(slot)
+    (1, 2, 2)
+    """
+
+    SLOTS = 512
+
+    def __init__(self, path):
+        self.path = path
+        self._slots = 0
+        self._file = None
+        self._mmap = None
+        self._lock = Lock()
+
+    def slot(self):
+        if self._slots == self.SLOTS:
+            raise RuntimeError("too many shared cache policies")
+
+        slot = self._slots * GENERATION.size
+        self._slots += 1
+        return slot
+
+    def get(self, slot):
+        return GENERATION.unpack_from(self._map(), slot)[0]
+
+    def bump(self, slot):
+        data = self._map()
+        with self._lock:
+            fcntl.lockf(self._file, fcntl.LOCK_EX)
+            try:
+                generation = GENERATION.unpack_from(data, slot)[0] + 1
+                GENERATION.pack_into(data, slot, generation)
+            finally:
+                fcntl.lockf(self._file, fcntl.LOCK_UN)
+
+        return generation
+
+    def _map(self):
+        # Mapped on first use, a mapping made before a fork stays shared
+        # with the workers
+        if self._mmap is not None:
+            return self._mmap
+
+        with self._lock:
+            if self._mmap is None:
+                size = self.SLOTS * GENERATION.size
+                self._file = open(self.path, 'a+b')
+                if os.fstat(self._file.fileno()).st_size < size:
+                    self._file.truncate(size)
+                self._mmap = mmap.mmap(self._file.fileno(), size)
+
+        return self._mmap
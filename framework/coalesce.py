@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+
+from .cache import ResponseSnapshot
+
+__all__ = [
+    'SingleFlight',
+]
+
+
+class Flight:
+
+    __slots__ = ('done', 'snapshot', 'exc')
+
+    def __init__(self, done):
+        self.done = done
+        self.snapshot = None
+        self.exc = None
+
+
+class SingleFlight:
+    """
+    SingleFlight collapses concurrent identical calls to an endpoint. The
+    first request for a key (the leader) runs the callback, requests for
+    the same key arriving while it runs wait and are given a copy of its
+    populated response, or the ResponseException it raised.
+
+    Streamed responses can't be shared, when the leader streams its body
+    the waiters run the callback themselves. call returns True when the
+    request was given the leader's response rather than running the
+    callback.
+
+    >>> flight = SingleFlight()
+    >>> flight.stats()
+    {'leaders': 0, 'collapsed': 0, 'in_flight': 0}
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.leaders = 0
+        self.collapsed = 0
+
+    @staticmethod
+    def key(method, args, kwargs):
+        # None (don't coalesce) when the bound arguments aren't hashable.
+        # The method is part of the key, a HEAD mustn't be given a GET's
+        # response or the other way round.
+        try:
+            key = (method, args, tuple(sorted(
+                (k, tuple(v) if isinstance(v, list) else v)
+                for (k, v) in kwargs.items())))
+            hash(key)
+
+        except TypeError:
+            return None
+
+        return key
+
+    def call(self, key, resp, fn, *args):
+        if key is None:
+            fn(resp, *args)
+            return False
+
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = Flight(threading.Event())
+                self.leaders += 1
+                leader = True
+            else:
+                self.collapsed += 1
+                leader = False
+
+        if not leader:
+            flight.done.wait()
+            if self._replay(flight, resp):
+                return True
+            fn(resp, *args)
+            return False
+
+        try:
+            self._lead(flight, resp, fn, *args)
+
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+        return False
+
+    def _lead(self, flight, resp, fn, *args):
+        try:
+            fn(resp, *args)
+        except Exception as exc:
+            flight.exc = exc
+            raise
+
+        self._share(flight, resp)
+
+    @staticmethod
+    def _share(flight, resp):
+        if resp.status is None or resp.is_streamed():
+            return
+
+        flight.snapshot = ResponseSnapshot.from_response(resp)
+        # The leader serves the shared body too, so it is compressed once
+        flight.snapshot.apply(resp)
+
+    @staticmethod
+    def _replay(flight, resp):
+        if flight.exc is not None:
+            # Redirect / Bad Request etc. apply to every waiter, each
+            # raising its own copy
+            raise copy_exception(flight.exc)
+
+        if flight.snapshot is None:
+            return False
+
+        flight.snapshot.apply(resp)
+        return True
+
+    def stats(self):
+        return {
+            'leaders': self.leaders,
+            'collapsed': self.collapsed,
+            'in_flight': len(self._flights),
+        }
+
+
+def copy_exception(exc):
+    """
+    copy_exception copies a ResponseException without calling __init__,
+    whose arguments differ from its args. Raising one instance in several
+    requests would have them share its traceback and context.
+
+    >>> class Moved(Exception):
+    ...     def __init__(self, location, status="303 See Other"):
+    ...         super().__init__(status)
+    ...         self.location = location
+    >>> exc = copy_exception(Moved("/login", "302 Found"))
+    >>> exc.args, exc.location
+    (('302 Found',), '/login')
+    """
+    cls = type(exc)
+    copy = cls.__new__(cls, *exc.args)
+    copy.args = exc.args
+    copy.__dict__.update(vars(exc))
+    return copy
+
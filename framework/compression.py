@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import zlib
+from threading import Lock
+
+__all__ = [
+    'Compression',
+    'StaticContent',
+]
+
+# Encodings we can produce, in order of preference, with their zlib wbits
+WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+
+def compress(body, encoding, level):
+    # Not gzip.compress - we don't want a timestamp in the header, the
+    # same body must always compress to the same bytes.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, WBITS[encoding])
+    return compressor.compress(body) + compressor.flush()
+
+
+def compress_iter(bytes_iter, encoding, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, WBITS[encoding])
+    try:
+        for chunk in bytes_iter:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+
+        yield compressor.flush()
+
+    finally:
+        if hasattr(bytes_iter, 'close'):
+            bytes_iter.close()
+
+
+def negotiate(accept_encoding):
+    """
+    negotiate picks the encoding to use from an Accept-Encoding header,
+    or None if the body should be sent as is.
+
+    >>> negotiate("gzip, deflate, br")
+    'gzip'
+    >>> negotiate("deflate;q=0.5, gzip;q=0")
+    'deflate'
+    >>> negotiate("br") is None
+    True
+    >>> negotiate("*")
+    'gzip'
+    """
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+
+    best, best_q = None, 0.0
+    for encoding in WBITS:
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+
+    return best
+
+
+class StaticContent:
+    """
+    StaticContent is a response body which is served many times, its
+    compressed forms are computed once and kept alongside it.
+
+    >>> s = StaticContent(b"hello " * 100)
+    >>> s.encoded('gzip', 6) is s.encoded('gzip', 6)
+    True
+    """
+
+    __slots__ = ('body', '_encoded', '_lock')
+
+    def __init__(self, body):
+        self.body = body
+        self._encoded = {}
+        self._lock = Lock()
+
+    def encoded(self, encoding, level):
+        key = (encoding, level)
+        body = self._encoded.get(key)
+        if body is None:
+            with self._lock:
+                body = self._encoded.get(key)
+                if body is None:
+                    body = self._encoded[key] = compress(
+                        self.body, encoding, level)
+
+        return body
+
+
+class Compression:
+    """
+    Compression negotiates Accept-Encoding for an application. Bodies
+    below min_size and content types that don't compress are sent as is.
+    Streamed (bytes_iter) bodies are compressed as they are sent, except
+    those going through wsgi.file_wrapper which the server may send with
+    sendfile.
+    """
+
+    def __init__(self, min_size=1024, level=6, content_types=COMPRESSIBLE_TYPES):
+        self.min_size = min_size
+        self.level = level
+        self.content_types = tuple(content_types)
+
+    def compressible(self, resp):
+        content_type = resp.get_header('Content-Type')
+        if not content_type or not content_type.startswith(self.content_types):
+            return False
+
+        # Partial content and already encoded bodies are left alone
+        if resp.get_header('Content-Encoding') or resp.get_header('Content-Range'):
+            return False
+
+        # Wrapping the file wrapper would lose the server's sendfile
+        if resp.is_file_wrapped():
+            return False
+
+        return True
+
+    def apply(self, req, resp):
+        if not self.compressible(resp):
+            return
+
+        streamed = resp.is_streamed()
+        if not streamed and len(resp.body) < self.min_size:
+            return
+
+        resp.add_header('Vary', 'Accept-Encoding')
+        encoding = negotiate(req.get_header('Accept-Encoding', ''))
+        if encoding is None:
+            return
+
+        resp.remove_header('Content-Length')
+        resp.add_header('Content-Encoding', encoding)
+
+        # Byte ranges and strong validators refer to the identity body
+        resp.remove_header('Accept-Ranges')
+        etag = resp.get_header('ETag')
+        if etag and not etag.startswith('W/'):
+            resp.remove_header('ETag')
+            resp.add_header('ETag', 'W/' + etag)
+
+        if streamed:
+            resp.set_bytes_iter(
+                compress_iter(resp.bytes_iter(), encoding, self.level))
+        elif resp.static_content is not None:
+            resp.set_content_bytes(
+                resp.static_content.encoded(encoding, self.level))
+        else:
+            resp.set_content_bytes(compress(resp.body, encoding, self.level))
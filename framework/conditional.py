@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from hashlib import md5
+
+__all__ = [
+    'ETag',
+]
+
+CONDITIONAL_METHODS = ('GET', 'HEAD')
+
+
+def make_etag(data):
+    if isinstance(data, str):
+        data = bytes(data, encoding='utf8')
+
+    return '"' + md5(data).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Weak comparison of an If-None-Match header against an ETag.
+
+    >>> etag_matches('"abc", W/"def"', '"def"')
+    True
+    >>> etag_matches('W/"abc"', 'W/"abc"')
+    True
+    >>> etag_matches('*', '"abc"')
+    True
+    >>> etag_matches('"abc"', '"abd"')
+    False
+    """
+    if if_none_match.strip() == '*':
+        return True
+
+    etag = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+
+    return False
+
+
+class ETag:
+    """
+    ETag adds an entity tag to successful GET responses and answers
+    If-None-Match with 304 Not Modified.
+
+    By default the tag is a hash of the response body, so the callback
+    still runs. A version callable receives the same arguments as the
+    callback and returns a cheap version key (or None to fall back to
+    hashing), when the client is current the callback isn't run at all.
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+
+    def precondition(self, req, resp, args, kwargs):
+        """
+        Returns (etag, not_modified). When not_modified is True resp has
+        been populated with a 304 and the callback should be skipped.
+        """
+        if self.version is None or req.method not in CONDITIONAL_METHODS:
+            return None, False
+
+        version = self.version(*args, **kwargs)
+        if version is None:
+            return None, False
+
+        etag = make_etag(str(version))
+        if_none_match = req.get_header('If-None-Match')
+        if if_none_match and etag_matches(if_none_match, etag):
+            not_modified(resp, etag)
+            return etag, True
+
+        return etag, False
+
+    def finish(self, req, resp, etag):
+        if req.method not in CONDITIONAL_METHODS:
+            return
+
+        if not resp.status.startswith('200') or resp.is_streamed():
+            return
+
+        current = resp.get_header('ETag')
+        etag = etag or current or make_etag(resp.body)
+        if_none_match = req.get_header('If-None-Match')
+        if if_none_match and etag_matches(if_none_match, etag):
+            not_modified(resp, etag)
+            return
+
+        if current is None:
+            resp.add_header('ETag', etag)
+
+
+def not_modified(resp, etag):
+    resp.set_header("304 Not Modified", [("ETag", etag)])
+    resp.set_content_bytes(b"")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import mmap
+from email.utils import formatdate
+
+# Size of the chunks sent when the server has no wsgi.file_wrapper
+FILE_CHUNK_SIZE = 256 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    parse_range returns the (offset, length) requested by a Range header,
+    or None if the whole file should be sent. Only single byte ranges are
+    honoured, anything else falls back to the whole file.
+
+    >>> parse_range("bytes=0-99", 1000)
+    (0, 100)
+    >>> parse_range("bytes=900-", 1000)
+    (900, 100)
+    >>> parse_range("bytes=-50", 1000)
+    (950, 50)
+    >>> parse_range("bytes=990-2000", 1000)
+    (990, 10)
+    >>> parse_range("bytes=0-1,5-6", 1000) is None
+    True
+    >>> parse_range("bytes=1000-", 1000)
+    Traceback (most recent call last):
+    ...
+    framework.files.RangeNotSatisfiable: bytes=1000-
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+
+    start, sep, end = spec.strip().partition('-')
+    if not sep:
+        return None
+
+    try:
+        if not start:
+            # Suffix range, the last N bytes
+            suffix = int(end)
+            if suffix <= 0:
+                raise RangeNotSatisfiable(header)
+            offset = max(size - suffix, 0)
+            return offset, size - offset
+
+        offset = int(start)
+        last = int(end) if end else size - 1
+
+    except ValueError:
+        return None
+
+    if offset >= size or last < offset:
+        raise RangeNotSatisfiable(header)
+
+    last = min(last, size - 1)
+    return offset, last - offset + 1
+
+
+def file_validators(stat):
+    # ETag and Last-Modified derived from the inode, never the content
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    return etag, last_modified
+
+
+def mmap_chunks(file, offset, length, chunk_size=FILE_CHUNK_SIZE):
+    try:
+        if length == 0:
+            return
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            end = offset + length
+            while offset < end:
+                stop = min(offset + chunk_size, end)
+                yield mapped[offset:stop]
+                offset = stop
+
+    finally:
+        file.close()
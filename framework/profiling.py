@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+__all__ = [
+    'StackSampler',
+    'RouteProfiler',
+    'ProfilerBusy',
+]
+
+# Deeper stacks are cut off at the root end
+MAX_DEPTH = 128
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class StackSampler:
+    """
+    StackSampler is a sampling profiler for the whole process. While
+    running, a thread of its own snapshots the stack of every other thread
+    each interval seconds, so whatever requests are being handled are all
+    aggregated together. The result is in the collapsed stack format read
+    by flamegraph.pl and speedscope, one line per distinct stack, rooted at
+    the thread name.
+
+    Only one sample may run at a time, and it only sees the process it runs
+    in, not the other workers of a pre-forked server.
+
+    >>> s = StackSampler(interval=0.001)
+    >>> t = threading.Thread(target=time.sleep, args=(0.2, ), name='sleeper')
+    >>> t.start()
+    >>> out = s.sample(0.05)
+    >>> t.join()
+    >>> any(line.startswith('sleeper;') for line in out.splitlines())
+    True
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    def sample(self, seconds):
+        # Blocks for seconds, raising ProfilerBusy if already sampling
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("a sample is already running")
+
+        try:
+            stacks = Counter()
+            caller = threading.get_ident()
+            thread = threading.Thread(target=self._run,
+                                      args=(seconds, stacks, caller),
+                                      name='stack-sampler',
+                                      daemon=True)
+            thread.start()
+            thread.join()
+        finally:
+            self._lock.release()
+
+        return "".join(f"{stack} {count}\n"
+                       for (stack, count) in stacks.most_common())
+
+    def _run(self, seconds, stacks, caller):
+        skip = {threading.get_ident(), caller}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for (ident, frame) in sys._current_frames().items():
+                if ident not in skip:
+                    name = names.get(ident, str(ident))
+                    stacks[collapse(name, frame)] += 1
+
+            # Drop the frame references before sleeping
+            frame = None
+            time.sleep(self.interval)
+
+
+def collapse(root, frame):
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+
+    names.append(root)
+    return ";".join(reversed(names))
+
+
+def frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class Capture:
+
+    __slots__ = ('requested', 'profiled', 'stats')
+
+    def __init__(self, requested):
+        self.requested = requested
+        self.profiled = 0
+        self.stats = None
+
+    def add(self, profile):
+        if self.stats is None:
+            self.stats = pstats.Stats(profile)
+        else:
+            self.stats.add(profile)
+        self.profiled += 1
+
+
+class RouteProfiler:
+    """
+    RouteProfiler runs cProfile over the next requests to a route. arm
+    sets how many, the stats of those requests are summed and report
+    prints them.
+
+    Only one request is profiled at a time, a request arriving while
+    another is profiled runs as normal and doesn't count.
+
+    Endpoints are wrapped once registered but, until a route is armed, the
+    cost per request is a dict lookup.
+    """
+
+    def __init__(self, sort='cumulative', limit=60):
+        self.sort = sort
+        self.limit = limit
+        self.routes = set()
+        # route -> requests still to be profiled
+        self._armed = {}
+        # route -> Capture of the last arm
+        self._captures = {}
+        self._lock = threading.Lock()
+        self._active = threading.Lock()
+
+    def arm(self, route, requests):
+        if route not in self.routes:
+            raise KeyError(route)
+
+        with self._lock:
+            self._captures[route] = Capture(requests)
+            self._armed[route] = requests
+
+    def report(self, route):
+        # KeyError unless route has been armed
+        capture = self._captures[route]
+        out = io.StringIO()
+        out.write(f"# {route}: profiled {capture.profiled} of "
+                  f"{capture.requested} requests\n")
+        if capture.stats is not None:
+            with self._lock:
+                capture.stats.stream = out
+                capture.stats.sort_stats(self.sort).print_stats(self.limit)
+
+        return out.getvalue()
+
+    def wrap(self, route, endpoint):
+        self.routes.add(route)
+
+        def profiled_endpoint(req, resp):
+            if route not in self._armed or not self._claim(route):
+                return endpoint(req, resp)
+
+            profile = cProfile.Profile()
+            try:
+                profile.runcall(endpoint, req, resp)
+            finally:
+                self._collect(route, profile)
+
+        return profiled_endpoint
+
+    def _claim(self, route):
+        if not self._active.acquire(blocking=False):
+            return False
+
+        with self._lock:
+            remaining = self._armed.get(route, 0)
+            if remaining <= 1:
+                self._armed.pop(route, None)
+            else:
+                self._armed[route] = remaining - 1
+
+        if remaining == 0:
+            self._active.release()
+            return False
+
+        return True
+
+    def _collect(self, route, profile):
+        try:
+            with self._lock:
+                self._captures[route].add(profile)
+        finally:
+            self._active.release()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__all__ = [
+    'Router',
+    'PathMatcher',
+    'PathExact',
+    'PathPrefix',
+]
+
+
+class PathMatcher:
+    # Matchers are still callable so they can be used on their own, but
+    # the Router indexes them by (methods, path) rather than calling them.
+    path = None
+    methods = None
+    ignore_case = True
+    is_prefix = False
+
+
+class PathExact(PathMatcher):
+
+    def __init__(self, path, methods=None, ignore_case=True):
+        self.methods = methods
+        if ignore_case:
+            self.path = path.lower()
+        else:
+            self.path = path
+        self.ignore_case = ignore_case
+
+    def __call__(self, req):
+        if self.methods and req.method not in self.methods:
+            return False
+
+        if self.ignore_case:
+            return req.path.lower() == self.path
+        else:
+            return req.path == self.path
+
+
+class PathPrefix(PathMatcher):
+
+    is_prefix = True
+
+    def __init__(self, path_prefix, methods=None, ignore_case=True):
+        self.methods = methods
+        if ignore_case:
+            self.path = path_prefix.lower()
+        else:
+            self.path = path_prefix
+        self.ignore_case = ignore_case
+
+    def __call__(self, req):
+        if self.methods and req.method not in self.methods:
+            return False
+
+        if self.ignore_case:
+            return req.path.lower().startswith(self.path)
+        else:
+            return req.path.startswith(self.path)
+
+
+class MethodTable:
+    """
+    MethodTable maps a request method onto an endpoint for a single path.
+    The None key holds an endpoint registered for any method.
+    """
+
+    def __init__(self, depth=0):
+        # Length of the path or prefix this table is registered under
+        self.depth = depth
+        self._endpoints = {}
+
+    def add(self, methods, endpoint):
+        for method in (methods or [None]):
+            # The first registration wins, as it did with the linear scan
+            self._endpoints.setdefault(method, endpoint)
+
+    def get(self, method):
+        endpoint = self._endpoints.get(method)
+        if endpoint is None:
+            endpoint = self._endpoints.get(None)
+
+        return endpoint
+
+    def allowed(self):
+        return [m for m in self._endpoints if m is not None]
+
+
+class RadixNode:
+
+    __slots__ = ('children', 'table')
+
+    def __init__(self):
+        # first character of the edge label -> (label, RadixNode)
+        self.children = {}
+        self.table = None
+
+
+class RadixTree:
+    """
+    RadixTree stores path prefixes with compressed edges. Looking up a path
+    walks the tree once and returns every MethodTable whose prefix matches,
+    longest prefix first.
+
+    >>> t = RadixTree()
+    >>> t.insert("/blobs/").add(["GET"], "blobs")
+    >>> t.insert("/b").add(["GET"], "b")
+    >>> [m.get("GET") for m in t.matches("/blobs/ab")]
+    ['blobs', 'b']
+    >>> t.matches("/a")
+    []
+    """
+
+    def __init__(self):
+        self._root = RadixNode()
+
+    def insert(self, prefix):
+        node = self._root
+        i = 0
+        while i < len(prefix):
+            edge = node.children.get(prefix[i])
+            if edge is None:
+                child = RadixNode()
+                node.children[prefix[i]] = (prefix[i:], child)
+                node = child
+                break
+
+            label, child = edge
+            # Length of the common part of the label and the prefix
+            n = 0
+            limit = min(len(label), len(prefix) - i)
+            while n < limit and label[n] == prefix[i + n]:
+                n += 1
+
+            if n < len(label):
+                # Split the edge at the point the prefix diverges
+                split = RadixNode()
+                split.children[label[n]] = (label[n:], child)
+                node.children[prefix[i]] = (label[:n], split)
+                child = split
+
+            node = child
+            i += n
+
+        if node.table is None:
+            node.table = MethodTable(len(prefix))
+
+        return node.table
+
+    def matches(self, path):
+        found = []
+        node = self._root
+        i = 0
+        while True:
+            if node.table is not None:
+                found.append(node.table)
+
+            if i >= len(path):
+                break
+
+            edge = node.children.get(path[i])
+            if edge is None or not path.startswith(edge[0], i):
+                break
+
+            i += len(edge[0])
+            node = edge[1]
+
+        found.reverse()
+        return found
+
+
+class Router:
+    """
+    Router compiles endpoint registrations into a dispatch index keyed on
+    the (normalized) path, so resolving a request does not depend on the
+    number of registered routes.
+
+    >>> r = Router()
+    >>> r.add(PathExact("/Message", methods=["POST"]), "new_message")
+    >>> r.add(PathPrefix("/blobs/", methods=["GET"]), "read_blob")
+    >>> r.resolve("POST", "/message")
+    ('new_message', None)
+    >>> r.resolve("GET", "/message")
+    (None, ['POST'])
+    >>> r.resolve("GET", "/blobs/abcd.jpg")
+    ('read_blob', None)
+    >>> r.resolve("GET", "/missing")
+    (None, None)
+    """
+
+    def __init__(self):
+        self._exact = {}
+        self._exact_nocase = {}
+        self._prefix = RadixTree()
+        self._prefix_nocase = RadixTree()
+        # Matchers we don't know how to index are scanned in order
+        self._fallback = []
+        self._has_nocase = False
+        self._has_case = False
+
+    def add(self, matcher, endpoint):
+        if not isinstance(matcher, PathMatcher):
+            self._fallback.append((matcher, endpoint))
+            return
+
+        if matcher.ignore_case:
+            self._has_nocase = True
+        else:
+            self._has_case = True
+
+        if matcher.is_prefix:
+            tree = self._prefix_nocase if matcher.ignore_case else self._prefix
+            table = tree.insert(matcher.path)
+        else:
+            exact = self._exact_nocase if matcher.ignore_case else self._exact
+            table = exact.get(matcher.path)
+            if table is None:
+                table = exact[matcher.path] = MethodTable(len(matcher.path))
+
+        table.add(matcher.methods, endpoint)
+
+    def resolve(self, method, path, req=None):
+        """
+        Returns (endpoint, None) on a match. If the path is routed but not
+        for this method returns (None, allowed_methods), otherwise
+        (None, None).
+        """
+        allowed = None
+        lowered = path.lower() if self._has_nocase else path
+
+        tables = []
+        if self._has_case:
+            table = self._exact.get(path)
+            if table is not None:
+                tables.append(table)
+        if self._has_nocase:
+            table = self._exact_nocase.get(lowered)
+            if table is not None:
+                tables.append(table)
+
+        for table in tables:
+            endpoint = table.get(method)
+            if endpoint is not None:
+                return endpoint, None
+            allowed = (allowed or []) + table.allowed()
+
+        prefix_tables = []
+        if self._has_case:
+            prefix_tables.extend(self._prefix.matches(path))
+        if self._has_nocase:
+            prefix_tables.extend(self._prefix_nocase.matches(lowered))
+        if len(prefix_tables) > 1:
+            # Longest prefix wins across both trees
+            prefix_tables.sort(key=lambda t: -t.depth)
+
+        for table in prefix_tables:
+            endpoint = table.get(method)
+            if endpoint is not None:
+                return endpoint, None
+            allowed = (allowed or []) + table.allowed()
+
+        for matcher, endpoint in self._fallback:
+            if matcher(req):
+                return endpoint, None
+
+        if allowed:
+            return None, sorted(set(allowed))
+
+        return None, None
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+from time import perf_counter_ns
+
+from lib.metrics import Histogram, PhaseTimer
+
+__all__ = [
+    'Timing',
+]
+
+
+class Timing:
+    """
+    Timing breaks each request down into phases and keeps a latency
+    histogram per (route, phase).
+
+        request  - reading, parsing and validating the request
+        handler  - the callback, including any downstream phases below
+        response - validating and serializing the callback's return value
+        total    - the whole endpoint
+
+    Downstream calls timed with lib.metrics.timed_phase (kvstore, db etc.)
+    are reported as phases of their own. With server_timing the phases are
+    sent back in a Server-Timing header.
+
+    Endpoints are only wrapped when an Application is given a Timing, so
+    there is no cost at all when it is disabled.
+    """
+
+    def __init__(self, server_timing=False):
+        self.server_timing = server_timing
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, route, phase):
+        key = (route, phase)
+        hist = self._histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(key, Histogram())
+
+        return hist
+
+    def record(self, route, timer):
+        for (phase, duration) in timer.phases.items():
+            self.histogram(route, phase).record(duration // 1000)
+
+    def summary(self):
+        routes = {}
+        for ((route, phase), hist) in list(self._histograms.items()):
+            routes.setdefault(route, {})[phase] = hist.summary()
+
+        return routes
+
+    def instrument(self, bind, clb, populate_response):
+        # Times the steps of an endpoint into the current request's timer
+        def timed_bind(req):
+            start = perf_counter_ns()
+            try:
+                return bind(req)
+            finally:
+                add_phase('request', start)
+
+        def timed_populate_response(resp, ret):
+            start = perf_counter_ns()
+            try:
+                return populate_response(resp, ret)
+            finally:
+                add_phase('response', start)
+
+        def timed_clb(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return clb(*args, **kwargs)
+            finally:
+                add_phase('handler', start)
+
+        return timed_bind, timed_clb, timed_populate_response
+
+    def wrap(self, route, endpoint):
+        def timed_endpoint(req, resp):
+            timer = PhaseTimer()
+            token = timer.activate()
+            try:
+                endpoint(req, resp)
+            finally:
+                PhaseTimer.deactivate(token)
+                self.finish(route, timer, resp)
+
+        return timed_endpoint
+
+    def finish(self, route, timer, resp):
+        timer.add('total', perf_counter_ns() - timer.start)
+        self.record(route, timer)
+        if self.server_timing and resp.set_header_called():
+            resp.add_header('Server-Timing', timer.server_timing())
+
+
+def add_phase(phase, start):
+    timer = PhaseTimer.current()
+    if timer is not None:
+        timer.add(phase, perf_counter_ns() - start)
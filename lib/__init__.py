@@ -18,11 +18,7 @@ def is_hexstring(string):
     if len(string) % 2 != 0:
         return False
 
-    for c in string.lower():
-        if c not in HEXCHARS:
-            return False
-
-    return True
+    return HEXCHARS.issuperset(string.lower())
 
 
 def traceparent(ctx):
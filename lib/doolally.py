@@ -2,14 +2,18 @@
 doolally is a Python JSON schema validator
 """
 
+import re
 from collections import namedtuple
 from itertools import chain
 from functools import partial
 from hashlib import md5
+from json import loads
 
 
 __all__ = [
     "validate",
+    "compile",
+    "decode",
     "jsonschema",
     "Schema",
     "StaticTypeArray",
@@ -24,17 +28,27 @@ __all__ = [
     "Union",
     "union_with_null",
     "Any",
+    "bulk_charset",
+    "parser",
+    "record_class",
 ]
 
 # These are the python primatives which we support
 # see https://docs.python.org/3/library/json.html#json.JSONDecoder
 JSON_PRIMATIVES = (int, float, str, bool, type(None))
 JSON_COLLECTIONS = (list, dict)
+JSON_TYPES = JSON_PRIMATIVES + JSON_COLLECTIONS
 
 # validate/jsonschema functions
 #####################
 
 def validate(json, schema):
+    compile(schema)(json)
+
+
+def validate_tokens(json, schema):
+    # validate by walking the Tokenizer, which compiled validators fall
+    # back on to report errors
     instance = schema()
     # Create the Context
     ctx = Context()
@@ -43,6 +57,36 @@ def validate(json, schema):
     instance.validate_collection(ctx, tokenizer)
 
 
+def decode(s, schema, coerce=False, records=False):
+    """
+    decode parses the JSON document s and validates it against schema,
+    returning the document. With coerce, values of fields with a parser
+    validator are returned parsed, see parser. With records, objects of
+    Schemas are returned as instances of their record_class. Errors are
+    those of json.loads and validate.
+
+    >>> class Point(Schema):
+    ...     x = Number(required=True)
+    ...     y = Number(required=True)
+    >>> decode('{"x": 1, "y": 2.5}', Point)
+    {'x': 1, 'y': 2.5}
+    >>> decode(b'{"x": 1, "z": 2}', Point)
+    Traceback (most recent call last):
+    ...
+    doolally.ValidationValueError: [:Point(x(required,Number()), y(required,Number()))] - unrecognised key (z)
+    """
+    json = loads(s)
+    validate(json, schema)
+    if not coerce and not records:
+        return json
+
+    convert = converter(schema, coerce, records)
+    if convert is None:
+        return json
+
+    return convert(json)
+
+
 def jsonschema(schema):
     return schema().jsonschema()
 
@@ -81,6 +125,17 @@ class ValidationValueError(ValidationError, ValueError):
 
 Token = namedtuple("Token", ("ident", "value"))
 
+# Tokens are built from the (ident, value) pairs collections are iterated
+# as, the end of collection tokens are shared
+_new_token = tuple.__new__
+OBJECT_END = Token('}', None)
+ARRAY_END = Token(']', None)
+# The ident of a collection with no element being tokenized
+NO_IDENT = object()
+# No collection waiting to be opened
+NOTHING = object()
+
+
 class Tokenizer:
     """
     Tokenizer will tokenize a python list or dictionary
@@ -109,6 +164,8 @@ class Tokenizer:
     Token(ident='hello', value=[1, 2])
     >>> t.next()
     Token(ident='[', value=[1, 2])
+    >>> t.json_path
+    ['hello']
     >>> t.drain_collection()
     >>> t.next()
     Token(ident='world', value=['a', 'b'])
@@ -117,11 +174,30 @@ class Tokenizer:
     def __init__(self, json, json_path=None):
         self.json = json
         self._current = None
-        self._tokenizer = self.tokenize_top()
-        self.json_path = json_path or []
+        # The collection whose start token is next, the top level first
+        self._pending = json
+        # An explicit stack of the open collections, for each its element
+        # iterator, end token and the ident of the element being tokenized
+        self._iters = []
+        self._ends = []
+        self._idents = []
+        self._path_prefix = json_path or []
+
+    @property
+    def json_path(self):
+        # Built from the stack, only wanted for errors
+        return self._path_prefix + [
+            ident for ident in self._idents if ident is not NO_IDENT
+        ]
 
     def next(self):
-        self._current = next(self._tokenizer)
+        value = self._pending
+        if value is NOTHING:
+            self._current = self.next_element()
+        else:
+            self._pending = NOTHING
+            self._current = self.open_collection(value)
+
         return self._current
 
     def __next__(self):
@@ -135,75 +211,64 @@ class Tokenizer:
         return ValidationTypeError(error)
 
     def drain_collection(self):
-        if self._current.ident not in "{[":
+        if self._current is None or self._current.ident not in ('{', '['):
             # Only if we just issued start of
             # collection token are we able to drain
             error = "drain_collection not called on collection"
             raise RuntimeError(error)
 
-        # Classic stack to drain brackets
-        # { and [ will push to the stack
-        # } and ] will pop from the stack
-        stack = [self._current.ident]
-        while stack:
-            token = self.next()
-            if isinstance(token.ident, int):
-                continue
-            if token.ident in "{[":
-                stack.append(token.ident)
-            elif token.ident in "}]":
-                stack.pop()
-
-    def tokenize_top(self):
-        if isinstance(self.json, dict):
-            yield from self.tokenize_object(self.json)
-        elif isinstance(self.json, list):
-            yield from self.tokenize_array(self.json)
-        else:
-            actual_type = type(self.json).__name__
-            error = "json must be list or dict, not {!s}"
-            raise self.ctx_err(error, actual_type)
-
-    def tokenize_object(self, item):
-        yield Token('{', item)
+        # Tokenize until the collection's own frame is popped
+        depth = len(self._iters)
+        while len(self._iters) >= depth:
+            self.next()
 
-        for key, value in item.items():
+    def open_collection(self, value):
+        if isinstance(value, dict):
+            self._iters.append(iter(value.items()))
+            self._ends.append(OBJECT_END)
+            self._idents.append(NO_IDENT)
+            return _new_token(Token, ('{', value))
+
+        if isinstance(value, list):
+            self._iters.append(enumerate(value))
+            self._ends.append(ARRAY_END)
+            self._idents.append(NO_IDENT)
+            return _new_token(Token, ('[', value))
+
+        # Nested values are only opened if they are collections
+        actual_type = type(value).__name__
+        error = "json must be list or dict, not {!s}"
+        raise self.ctx_err(error, actual_type)
+
+    def next_element(self):
+        iters = self._iters
+        if not iters:
+            raise StopIteration
+
+        item = next(iters[-1], None)
+        if item is None:
+            iters.pop()
+            self._idents.pop()
+            return self._ends.pop()
+
+        ident, value = item
+        if self._ends[-1] is OBJECT_END and not isinstance(ident, str):
             # JSON dict keys must be strings
-            if not isinstance(key, str):
-                actual_type = type(key).__name__
-                error = "json object key must be str, not {!s}"
-                raise self.ctx_err(error, actual_type)
-
-            self.json_path.append(key)
-            yield from self.tokenize_typeswitch(key, value)
-            self.json_path.pop()
-
-        yield Token('}', None)
-
-    def tokenize_array(self, item):
-        yield Token('[', item)
-
-        for index, value in enumerate(item, 0):
-            self.json_path.append(index)
-            yield from self.tokenize_typeswitch(index, value)
-            self.json_path.pop()
-
-        yield Token(']', None)
+            self._idents[-1] = NO_IDENT
+            actual_type = type(ident).__name__
+            error = "json object key must be str, not {!s}"
+            raise self.ctx_err(error, actual_type)
 
-    def tokenize_typeswitch(self, ident, value):
-        if isinstance(value, dict):
-            yield Token(ident, value)
-            yield from self.tokenize_object(value)
-        elif isinstance(value, list):
-            yield Token(ident, value)
-            yield from self.tokenize_array(value)
-        elif isinstance(value, JSON_PRIMATIVES):
-            yield Token(ident, value)
-        else:
+        self._idents[-1] = ident
+        if isinstance(value, JSON_COLLECTIONS):
+            self._pending = value
+        elif not isinstance(value, JSON_PRIMATIVES):
             actual_type = type(value).__name__
             error = "invalid type in json collection {!s}"
             raise self.ctx_err(error, actual_type)
 
+        return _new_token(Token, item)
+
 
 # Context
 ############
@@ -213,7 +278,8 @@ class Context:
     Context is similar to Tokenizer, whereas as Tokenizer
     keeps track of ident/value pairs in a list, Context
     keeps track of ident/elem_field pairs so we know what
-    our validation element_field is.
+    our validation element_field is. The pairs are kept
+    as two lists, the path is only joined for errors.
 
     >>> ctx = Context()
     >>> ctx.push_element_field("hello", String())
@@ -224,21 +290,24 @@ class Context:
     """
 
     def __init__(self, elem_fields=None):
-        # elem_field is ident/elem_field pairs
-        self._elem_fields = elem_fields or []
+        # elem_fields is ident/elem_field pairs
+        self._idents = []
+        self._fields = []
+        for ident, elem_field in elem_fields or []:
+            self.push_element_field(ident, elem_field)
 
     def push_element_field(self, ident, elem_field):
-        self._elem_fields.append((ident, elem_field))
+        self._idents.append(ident)
+        self._fields.append(elem_field)
 
     def pop_element_field(self):
-        self._elem_fields.pop()
+        self._idents.pop()
+        self._fields.pop()
 
     def ctx_err(self, error, *args, exc=None):
         exc = exc or ValidationValueError
-        _, elem_field = self._elem_fields[-1]
-        path = "/".join(
-            map(lambda x: str(x[0]), self._elem_fields),
-        )
+        elem_field = self._fields[-1]
+        path = "/".join(map(str, self._idents))
         info = elem_field.type_info()
         msg = f"[{path}:{info}] - " + error.format(*args)
         return exc(msg)
@@ -253,12 +322,15 @@ class SchemaMeta(type):
         # base classes, we do this first so the
         # child can over-ride them.
         fields = {}
+        # The attribute name of each key, for records
+        names = {}
         for base in bases:
             if not hasattr(base, 'doolally_fields'):
                 continue
 
             for attr_name, elem in base.doolally_fields.items():
                 fields[attr_name] = elem
+            names.update(base.doolally_attrs)
 
         # Delete element_fields during class creation
         to_delete = []
@@ -270,17 +342,21 @@ class SchemaMeta(type):
                 continue
 
             to_delete.append(attr_name)
-            attr_name = to_camel_case(attr_name)
-            fields[attr_name] = item
+            key = to_camel_case(attr_name)
+            fields[key] = item
+            names[key] = attr_name
 
         # Delete the element fields from the class dictionary
         for elem_field_name in to_delete:
             del attrs[elem_field_name]
 
         attrs['doolally_fields'] = fields
+        attrs['doolally_attrs'] = names
         attrs['doolally_required_fields'] = set(
             k for k, v in fields.items() if v.required
         )
+        # How validate_collection dispatches each field
+        attrs['doolally_kinds'] = {k: field_kind(v) for k, v in fields.items()}
 
         # If the fields don't have a custom title
         # then use the name of the key from this schema
@@ -306,6 +382,7 @@ class ElementField:
                  description=""):
         self.required = required
         self.validator = validator or no_validate
+        self.parses = getattr(self.validator, 'parses', False)
         self.title = title
         self.description = description
 
@@ -362,6 +439,14 @@ class AtomicElement(ElementField):
         error = "validate_collection called on AtomicElement"
         raise RuntimeError(error)
 
+    def parse_atomic(self, ctx, value):
+        # validate_atomic, -> value as a parser validator returns it
+        parsed = self.validate_atomic(ctx, value)
+        if self.parses:
+            return parsed
+
+        return value
+
     def is_atomic(self):
         return True
 
@@ -417,7 +502,6 @@ class CollectionElement(ElementField):
             type(token.value).__name__,
         )
 
-
 class Union(ElementField):
     """
     Union may be either a CollectionField or an AtomicField
@@ -463,11 +547,40 @@ class Union(ElementField):
                 error = f"not an element field, {actual_type}"
                 raise RuntimeError(error)
 
+        # Element fields are looked up by the type of a value, only those
+        # which may accept it are tried. Values of types not in these,
+        # such as subclasses, try every element field.
+        self._atomic_candidates = {kind: [] for kind in JSON_PRIMATIVES}
+        self._collection_candidates = {kind: [] for kind in JSON_COLLECTIONS}
+        accepted_types = set()
+        for elem_field in self._atomic_fields:
+            types, accepts = element_types(elem_field)
+            if accepts:
+                accepted_types.update(types)
+            for kind in types:
+                self._atomic_candidates[kind].append(elem_field)
+
+        for elem_field in self._collection_fields:
+            types, _ = element_types(elem_field)
+            for kind in types:
+                self._collection_candidates[kind].append(elem_field)
+
+        # Values of these types pass without any element field being tried
+        self._accepted_types = frozenset(accepted_types)
+        self.parses = any(f.parses for f in self._atomic_fields)
+
     def is_union(self):
         return True
 
     def validate_atomic(self, ctx, value):
-        for elem_field in self._atomic_fields:
+        if type(value) in self._accepted_types:
+            return
+
+        elem_fields = self._atomic_candidates.get(
+            type(value),
+            self._atomic_fields,
+        )
+        for elem_field in elem_fields:
             try:
                 elem_field.validate_atomic(ctx, value)
             except ValidationError:
@@ -481,13 +594,34 @@ class Union(ElementField):
                 "no element_field in union passes validation"
             )
 
+    def parse_atomic(self, ctx, value):
+        # As validate_atomic, the value as the first element field
+        # passing it returns it
+        elem_fields = self._atomic_candidates.get(
+            type(value),
+            self._atomic_fields,
+        )
+        for elem_field in elem_fields:
+            try:
+                return elem_field.parse_atomic(ctx, value)
+            except ValidationError:
+                pass
+
+        raise ctx.ctx_err(
+            "no element_field in union passes validation"
+        )
+
     def validate_collection(self, ctx, tokenizer):
         token = tokenizer.next()
-        for elem_field in self._collection_fields:
+        elem_fields = self._collection_candidates.get(
+            type(token.value),
+            self._collection_fields,
+        )
+        for elem_field in elem_fields:
             # Creating a new tokenizer won't cause any
             # copying of the underlying data.
             tkz = Tokenizer(token.value,
-                            json_path=tokenizer.json_path[:])
+                            json_path=tokenizer.json_path)
             try:
                 elem_field.validate_collection(ctx, tkz)
             except ValidationError:
@@ -607,8 +741,10 @@ class Number(AtomicElement):
             error = "number above max {!s}"
             raise ctx.ctx_err(error, cond)
 
-        # Run any custom validator
-        self.validator(ctx.ctx_err, value)
+        # Run any custom validator, a parser returns the value parsed
+        parsed = self.validator(ctx.ctx_err, value)
+        if self.parses:
+            return parsed
 
     def type_info(self, recurse=False):
         name = self.__class__.__name__
@@ -689,8 +825,10 @@ class String(AtomicElement):
             error = "string too long {!s}"
             raise ctx.ctx_err(error, cond)
 
-        # Run any custom validator
-        self.validator(ctx.ctx_err, value)
+        # Run any custom validator, a parser returns the value parsed
+        parsed = self.validator(ctx.ctx_err, value)
+        if self.parses:
+            return parsed
 
     def type_info(self, recurse=False):
         name = self.__class__.__name__
@@ -834,7 +972,6 @@ class ObjectCollection(CollectionElement):
             ident='{',
         )
 
-
 class StaticTypeArray(ArrayCollection):
     """
     >>> s = StaticTypeArray(element_field=Number())
@@ -868,39 +1005,46 @@ class StaticTypeArray(ArrayCollection):
         self.min_length = min_length
         self.max_length = max_length
         self.element_field = element_field
+        self.element_kind = field_kind(element_field)
+        self.bulk_check = None
+        if self.element_kind is ATOMIC:
+            self.bulk_check = bulk_check(element_field)
 
     def validate_collection(self, ctx, tokenizer):
         collection = self.validate_leading_token(ctx, tokenizer)
         self.validate_length(ctx, collection)
 
+        bulk_check = self.bulk_check
+        if bulk_check is not None and bulk_check(collection):
+            tokenizer.drain_collection()
+            self.validator(ctx.ctx_err, collection)
+            return
+
         # Iterate over the array
         elem_field = self.element_field
+        kind = self.element_kind
+        idents, fields = ctx._idents, ctx._fields
         while True:
             # Break when we leave the list
             token = tokenizer.next()
-            if token.ident == ']':
+            if token is ARRAY_END:
                 break
 
-            # If the element field is a union then switch
-            # base on the value rather than the element field
-            switch_type = None
-            if elem_field.is_union():
-                if isinstance(token.value, JSON_PRIMATIVES):
-                    switch_type = "atomic"
-                elif isinstance(token.value, JSON_COLLECTIONS):
-                    switch_type = "collection"
-            elif elem_field.is_collection():
-                switch_type = "collection"
-            elif elem_field.is_atomic():
-                switch_type = "atomic"
-            else:
+            if kind is None:
                 error = "not union, collection or atomic"
                 raise RuntimeError(error)
 
-            ctx.push_element_field(token.ident, elem_field)
+            # If the element field is a union then switch
+            # base on the value rather than the element field
+            ident, value = token
+            atomic = kind is ATOMIC or (
+                kind is UNION and isinstance(value, JSON_PRIMATIVES))
+
+            idents.append(ident)
+            fields.append(elem_field)
             try:
-                if switch_type == "atomic":
-                    elem_field.validate_atomic(ctx, token.value)
+                if atomic:
+                    elem_field.validate_atomic(ctx, value)
                 else:
                     elem_field.validate_collection(ctx, tokenizer)
             finally:
@@ -908,7 +1052,8 @@ class StaticTypeArray(ArrayCollection):
                 # This is because a union might try
                 # calling this method and handling
                 # the exception gracefully.
-                ctx.pop_element_field()
+                idents.pop()
+                fields.pop()
 
         # Run any custom validator
         self.validator(ctx.ctx_err, collection)
@@ -968,10 +1113,10 @@ class TagObject(ObjectCollection):
         while True:
             token = tokenizer.next()
             # Break when we leave the object
-            if token.ident == '}':
+            if token is OBJECT_END:
                 break
 
-            ctx.push_element_field(token.ident, String())
+            ctx.push_element_field(token.ident, TAG_VALUE)
             try:
                 if not isinstance(token.value, str):
                     actual_type = type(token.value).__name__
@@ -1008,6 +1153,18 @@ class TagObject(ObjectCollection):
         return jschema
 
 
+class TagValue(String):
+    # The values of a TagObject, with TagObject's own error
+    def validate_atomic(self, ctx, value):
+        if not isinstance(value, str):
+            actual_type = type(value).__name__
+            error = "TagObject values must be str not {!s}"
+            raise ctx.ctx_err(error, actual_type)
+
+    def type_info(self, recurse=False):
+        return "String()"
+
+
 class StaticTypeObject(ObjectCollection):
     """
     StaticTypeObject puts no constraint on the keys
@@ -1047,6 +1204,7 @@ class StaticTypeObject(ObjectCollection):
             description=description,
         )
         self.element_field = element_field
+        self.element_kind = field_kind(element_field)
         if unique_items:
             # We only allow enforce-uniqueness on AtomicFields
             if not element_field.is_atomic():
@@ -1060,51 +1218,46 @@ class StaticTypeObject(ObjectCollection):
         self.validate_length(ctx, collection)
 
         seen_values = set()
+        elem_field = self.element_field
+        kind = self.element_kind
+        unique_items = self.unique_items
+        idents, fields = ctx._idents, ctx._fields
         while True:
             token = tokenizer.next()
             # Break when we leave the object
-            if token.ident == '}':
+            if token is OBJECT_END:
                 break
 
-            # Decide which function to call
-            elem_field = self.element_field
-            switch_type = None
-            if elem_field.is_union():
-                if isinstance(token.value, JSON_PRIMATIVES):
-                    switch_type = "atom"
-                elif isinstance(token.value, JSON_COLLECTIONS):
-                    switch_type = "collection"
-                else:
-                    # Something weird has come from the tokenizer
-                    error = f"invalid token value {token.value}"
-                    raise RuntimeError(error)
-            elif elem_field.is_atomic():
-                switch_type = "atom"
-            elif elem_field.is_collection():
-                switch_type = "collection"
-            else:
+            if kind is None:
                 # A programming error
                 error = f"not an element field {elem_field}"
                 raise RuntimeError(error)
 
-            ctx.push_element_field(token.ident, elem_field)
+            # Decide which function to call
+            ident, value = token
+            atomic = kind is ATOMIC or (
+                kind is UNION and isinstance(value, JSON_PRIMATIVES))
+
+            idents.append(ident)
+            fields.append(elem_field)
             try:
-                # Deal with the case of unique values
-                seen = token.value in seen_values
-                if self.unique_items and seen:
-                    # We've seen this value before
-                    error = "duplicate value in array {!s}"
-                    ctx.ctx_err(error, token.value)
-                elif self.unique_items and not seen:
-                    seen.add(token.value)
-
-                if switch_type == "atom":
-                    elem_field.validate_atomic(ctx, token.value)
+                # Deal with the case of unique values, only atomic
+                # (hashable) values can be unique_items
+                if unique_items:
+                    if value in seen_values:
+                        # We've seen this value before
+                        error = "duplicate value in array {!s}"
+                        raise ctx.ctx_err(error, value)
+                    seen_values.add(value)
+
+                if atomic:
+                    elem_field.validate_atomic(ctx, value)
                 else:
                     elem_field.validate_collection(ctx, tokenizer)
 
             finally:
-                ctx.pop_element_field()
+                idents.pop()
+                fields.pop()
 
     def type_info(self, recurse=False):
         name = self.__class__.__name__
@@ -1211,51 +1364,47 @@ class Schema(ObjectCollection, metaclass=SchemaMeta):
         self.validate_length(ctx, collection)
 
         seen_fields = set()
+        doolally_fields = self.doolally_fields
+        kinds = self.doolally_kinds
+        idents, fields = ctx._idents, ctx._fields
         while True:
             token = tokenizer.next()
             # Break when we leave the object
-            if token.ident == '}':
+            if token is OBJECT_END:
                 break
 
             # Get the element field
-            elem_field = self.doolally_fields.get(token.ident)
+            ident, value = token
+            elem_field = doolally_fields.get(ident)
             if not elem_field:
                 # This key is not used in the schema
                 error = "unrecognised key ({!s})"
-                raise ctx.ctx_err(error, token.ident)
+                raise ctx.ctx_err(error, ident)
             else:
                 # We've this key if it's required
-                seen_fields.add(token.ident)
-
-            switch_type = None
-            if elem_field.is_union():
-                # Use the token value to decide atom/collection
-                # if the element_type is a union.
-                if isinstance(token.value, JSON_PRIMATIVES):
-                    switch_type = "atom"
-                elif isinstance(token.value, JSON_COLLECTIONS):
-                    switch_type = "collection"
-                else:
-                    # Something weird has come from the tokenizer
-                    error = f"invalid token value {token.value}"
-                    raise RuntimeError(error)
-            elif elem_field.is_atomic():
-                switch_type = "atom"
-            elif elem_field.is_collection():
-                switch_type = "collection"
-            else:
+                seen_fields.add(ident)
+
+            kind = kinds[ident]
+            if kind is None:
                 # A programming error
                 error = f"not an element field {elem_field}"
                 raise RuntimeError(error)
 
-            ctx.push_element_field(token.ident, elem_field)
+            # Use the token value to decide atom/collection
+            # if the element_type is a union.
+            atomic = kind is ATOMIC or (
+                kind is UNION and isinstance(value, JSON_PRIMATIVES))
+
+            idents.append(ident)
+            fields.append(elem_field)
             try:
-                if switch_type == "atom":
-                    elem_field.validate_atomic(ctx, token.value)
+                if atomic:
+                    elem_field.validate_atomic(ctx, value)
                 else:
                     elem_field.validate_collection(ctx, tokenizer)
             finally:
-                ctx.pop_element_field()
+                idents.pop()
+                fields.pop()
 
         # Check if we have any missing required fields
         for name in self.doolally_required_fields:
@@ -1341,7 +1490,7 @@ class AnyCollection(CollectionElement):
         # from the tokenizer, beyond that it's not
         # important what comes out.
         token = tokenizer.next()
-        if token.ident not in "{[":
+        if token.ident not in ('{', '['):
             actual_type = type(token.value).__name__
             error = "expected a collection, received {!s}"
             raise ctx.ctx_err(error, actual_type)
@@ -1420,6 +1569,28 @@ def no_validate(ctx_err, value):
     pass
 
 
+def parser(validator):
+    """
+    parser marks validator as returning the value it checks parsed, a
+    date for a date string say. decode with coerce puts parsed values in
+    the document it returns, validate ignores them.
+
+    >>> @parser
+    ... def digits_val(ctx_err, value):
+    ...     if not value.isdigit():
+    ...         raise ctx_err("expected digits")
+    ...     return int(value)
+    >>> class Page(Schema):
+    ...     number = String(required=True, validator=digits_val)
+    >>> decode('{"number": "3"}', Page, coerce=True)
+    {'number': 3}
+    >>> decode('{"number": "3"}', Page)
+    {'number': '3'}
+    """
+    validator.parses = True
+    return validator
+
+
 def validate_type(ctx, value, *types):
     if isinstance(value, types):
         return
@@ -1432,6 +1603,71 @@ def validate_type(ctx, value, *types):
         exc=ValidationTypeError,
     )
 
+# Dispatch kinds of element fields
+ATOMIC = 'atomic'
+COLLECTION = 'collection'
+UNION = 'union'
+
+
+def field_kind(elem_field):
+    """
+    >>> field_kind(String()), field_kind(union_with_null()), field_kind(Any())
+    ('atomic', 'union', 'union')
+    >>> field_kind(StaticTypeArray(element_field=Number()))
+    'collection'
+    """
+    if elem_field.is_union():
+        return UNION
+    if elem_field.is_atomic():
+        return ATOMIC
+    if elem_field.is_collection():
+        return COLLECTION
+
+    return None
+
+
+def element_types(elem_field):
+    """
+    element_types gives the types of value elem_field may accept, and
+    whether it accepts every value of those types without further checks.
+
+    >>> element_types(Null()), element_types(String(max_length=3))
+    (((<class 'NoneType'>,), True), ((<class 'str'>,), False))
+    >>> element_types(StaticTypeArray(element_field=Number()))
+    ((<class 'list'>,), False)
+    """
+    if isinstance(elem_field, ArrayCollection):
+        return (list,), False
+    if isinstance(elem_field, ObjectCollection):
+        return (dict,), False
+    if elem_field.is_collection():
+        return JSON_COLLECTIONS, False
+
+    kind = type(elem_field)
+    plain = elem_field.validator is no_validate
+    if kind.validate_atomic is String.validate_atomic:
+        plain = (plain and elem_field.min_length == 0 and
+                 elem_field.max_length == -1)
+        return (str,), plain
+
+    if kind.validate_atomic is Number.validate_atomic:
+        plain = (plain and elem_field.signed and not elem_field.is_int and
+                 elem_field.min_value is None and
+                 elem_field.max_value is None)
+        # bool is an int, as isinstance has it
+        return (int, float, bool), plain
+
+    # These don't run validators
+    if kind.validate_atomic is Bool.validate_atomic:
+        return (bool,), True
+    if kind.validate_atomic is Null.validate_atomic:
+        return (type(None),), True
+    if kind.validate_atomic is AnyAtomic.validate_atomic:
+        return JSON_PRIMATIVES, True
+
+    return JSON_PRIMATIVES, False
+
+
 def to_camel_case(string):
     """
     >>> to_camel_case("hello")
@@ -1491,6 +1727,775 @@ def validate_whitelist(whitelist, ctx_err, value):
         raise ctx_err(error, value)
 
 
+# Bulk checks
+#############
+
+# Arrays of atomic values are checked all at once, by type sets, min/max
+# or a regex over the joined strings, rather than element by element. A
+# failed bulk check says nothing of which element is invalid, they are
+# then checked one by one for the error.
+
+def bulk_charset(chars, multiple=1):
+    """
+    bulk_charset declares a string validator accepts exactly the strings
+    of chars with a length a multiple of multiple, letting arrays of them
+    be checked without calling it per element.
+
+    >>> @bulk_charset("ab", multiple=2)
+    ... def ab_val(ctx_err, value):
+    ...     if set(value) - set("ab") or len(value) % 2:
+    ...         raise ctx_err("expected pairs of a or b")
+    >>> check = bulk_check(String(max_length=4, validator=ab_val))
+    >>> check(["ab", "bbaa", ""]), check(["ab", "aba"]), check(["ac"])
+    (True, False, False)
+    """
+    def decorator(validator):
+        validator.bulk_charset = (chars, multiple)
+        return validator
+    return decorator
+
+
+def string_charset(elem_field):
+    # -> (fullmatch of strings of the charset or None, length multiple),
+    # None if the validator of the String declares no bulk_charset
+    validator = elem_field.validator
+    if validator is no_validate:
+        return None, 1
+    if not hasattr(validator, 'bulk_charset'):
+        return None
+
+    chars, multiple = validator.bulk_charset
+    return re.compile(f"[{re.escape(chars)}]*").fullmatch, multiple
+
+
+def bulk_check(elem_field):
+    """
+    bulk_check returns a function checking a list of values against the
+    atomic elem_field in one pass, True when all of them are valid. It
+    returns None if elem_field can't be checked that way.
+
+    >>> check = bulk_check(String(min_length=2, max_length=2))
+    >>> check(["ab", "cd"]), check(["ab", "c"]), check(["ab", 1])
+    (True, False, False)
+    >>> check = bulk_check(Number(signed=False, is_int=True, max_value=9))
+    >>> check([0, 1, 9]), check([0, -1]), check([0, 10]), check([0, 1.5])
+    (True, False, False, False)
+    >>> bulk_check(String(validator=lambda ctx_err, value: None)) is None
+    True
+    """
+    kind = type(elem_field)
+    if kind.validate_atomic is String.validate_atomic:
+        charset = string_charset(elem_field)
+        if charset is None:
+            return None
+
+        return string_check(elem_field, *charset)
+
+    if kind.validate_atomic is Number.validate_atomic:
+        if elem_field.validator is not no_validate:
+            return None
+
+        return number_check(elem_field)
+
+    # These don't run validators
+    if kind.validate_atomic is Bool.validate_atomic:
+        return type_check(bool)
+    if kind.validate_atomic is Null.validate_atomic:
+        return type_check(type(None))
+    if kind.validate_atomic is AnyAtomic.validate_atomic:
+        return type_check(*JSON_PRIMATIVES)
+
+    return None
+
+
+def type_check(*types):
+    # Subclasses of types fail, they are left to the per element checks
+    types = frozenset(types)
+
+    def check(values):
+        return types.issuperset(map(type, values))
+    return check
+
+
+def string_check(elem_field, fullmatch, multiple):
+    min_length, max_length = elem_field.min_length, elem_field.max_length
+    if (fullmatch is None and multiple == 1 and
+            min_length == 0 and max_length == -1):
+        return type_check(str)
+
+    def check(values):
+        try:
+            joined = "".join(values)
+        except TypeError:
+            # Not a string
+            return False
+
+        lengths = set(map(len, values))
+        if not lengths:
+            return True
+        if min(lengths) < min_length:
+            return False
+        if max_length != -1 and max(lengths) > max_length:
+            return False
+        if multiple != 1 and any(n % multiple for n in lengths):
+            return False
+
+        return fullmatch is None or fullmatch(joined) is not None
+    return check
+
+
+def number_check(elem_field):
+    lo, hi = elem_field.min_value, elem_field.max_value
+    if not elem_field.signed:
+        lo = 0 if lo is None else max(lo, 0)
+
+    # bool is an int, as isinstance has it
+    types = {int, bool}
+    if not elem_field.is_int:
+        types.add(float)
+
+    def check(values):
+        found = set(map(type, values))
+        if not found <= types:
+            return False
+        if not values or (lo is None and hi is None):
+            return True
+        if float in found:
+            # min and max go wrong with nan in values
+            return False
+
+        return ((lo is None or lo <= min(values)) and
+                (hi is None or max(values) <= hi))
+    return check
+
+
+# The element field of every TagObject value
+TAG_VALUE = TagValue()
+
+
+# Compiling
+#############
+
+class Invalid(ValidationError):
+    # Raised by compiled checks, which don't say what is wrong
+    pass
+
+
+class FastContext:
+    # Stands in for the Context of element fields called from compiled
+    # checks, errors are reported by the Tokenizer walk instead
+    @staticmethod
+    def ctx_err(error, *args, exc=None):
+        return Invalid()
+
+
+FAST_CTX = FastContext()
+
+# Validators compiled by compile, keyed on schema
+_compiled = {}
+
+
+def compile(schema):
+    """
+    compile generates the validator validate uses for schema. It checks a
+    document with plain dict and list operations, constraints inlined and
+    the required fields of each Schema precomputed. A document it rejects
+    is walked again with the Tokenizer to report the error, so errors are
+    exactly those validate has always raised. Validators are cached per
+    schema.
+
+    >>> class Point(Schema):
+    ...     x = Number(required=True, min_value=0)
+    ...     tags = StaticTypeArray(element_field=String())
+    >>> check = compile(Point)
+    >>> check({"x": 1, "tags": ["a", "b"]})
+    >>> check({"x": -1})
+    Traceback (most recent call last):
+    ...
+    doolally.ValidationValueError: [/x:Number(min_value=0)] - number below min -1 < 0
+    >>> compile(Point) is check
+    True
+    """
+    try:
+        return _compiled[schema]
+    except KeyError:
+        pass
+
+    check = Compiler().compile(schema())
+
+    def validator(json):
+        try:
+            check(json)
+        except Exception:
+            validate_tokens(json, schema)
+
+    _compiled[schema] = validator
+    return validator
+
+
+def is_json(value):
+    # The Tokenizer's checks on a value no schema applies to
+    if isinstance(value, dict):
+        for key, elem in value.items():
+            if not isinstance(key, str) or not is_json(elem):
+                return False
+        return True
+
+    if isinstance(value, list):
+        for elem in value:
+            if not is_json(elem):
+                return False
+        return True
+
+    return isinstance(value, JSON_PRIMATIVES)
+
+
+class Compiler:
+    """
+    Compiler generates the source of a check function per collection and
+    union element field in a schema. A check raises on any document the
+    Tokenizer walk would reject, it may raise on some it would accept
+    since the walk runs after to decide.
+
+    >>> class Point(Schema):
+    ...     x = Number(required=True, is_int=True)
+    >>> print(Compiler().source(Point()))
+    def check_0(value):
+        if not isinstance(value, dict):
+            raise Invalid
+        keys = value.keys()
+        if not keys <= keys_1 or not keys >= required_2:
+            raise Invalid
+        v = value['x']
+        if not (isinstance(v, (int, float)) and (isinstance(v, int) or int(v) == v)):
+            raise Invalid
+    """
+
+    def __init__(self):
+        self.namespace = {
+            'Invalid': Invalid,
+            'ValidationError': ValidationError,
+            'FAST_CTX': FAST_CTX,
+            'fast_err': FAST_CTX.ctx_err,
+            'MISSING': object(),
+            'JSON_PRIMATIVES': JSON_PRIMATIVES,
+            'JSON_COLLECTIONS': JSON_COLLECTIONS,
+            'is_json': is_json,
+            'Context': Context,
+            'Tokenizer': Tokenizer,
+        }
+        self.lines = []
+        self._count = 0
+
+    def compile(self, elem_field):
+        name = self.check_function(elem_field)
+        exec(self.source_lines(), self.namespace)
+        return self.namespace[name]
+
+    def source(self, elem_field):
+        self.check_function(elem_field)
+        return self.source_lines()
+
+    def source_lines(self):
+        return "\n".join(self.lines)
+
+    def bind(self, prefix, value):
+        # Names value in the generated code
+        name = f"{prefix}_{self._count}"
+        self._count += 1
+        self.namespace[name] = value
+        return name
+
+    def check_function(self, elem_field):
+        # -> name of the function checking a value of elem_field
+        kind = type(elem_field)
+        if kind.validate_collection is Schema.validate_collection:
+            gen = self.schema_lines
+        elif kind.validate_collection is StaticTypeArray.validate_collection:
+            gen = self.array_lines
+        elif kind.validate_collection is TagObject.validate_collection:
+            gen = self.tag_object_lines
+        elif kind.validate_collection is StaticTypeObject.validate_collection:
+            gen = self.object_lines
+        elif kind.validate_collection is AnyCollection.validate_collection:
+            gen = self.any_collection_lines
+        elif (kind.validate_collection is Union.validate_collection and
+              kind.validate_atomic is Union.validate_atomic):
+            gen = self.union_lines
+        else:
+            gen = self.tokenizer_lines
+
+        name = f"check_{self._count}"
+        self._count += 1
+        lines = [f"def {name}(value):"]
+        gen(elem_field, lines)
+        self.lines.extend(lines)
+        return name
+
+    def element_lines(self, elem_field, var, indent, lines):
+        # Lines checking var against elem_field
+        pad = "    " * indent
+        if type(elem_field) is Any:
+            # Any value the Tokenizer accepts
+            lines.append(f"{pad}if not is_json({var}):")
+            lines.append(f"{pad}    raise Invalid")
+            return
+
+        if elem_field.is_atomic():
+            cond, validator = self.atomic_cond(elem_field, var)
+            if cond is None:
+                lines.append(f"{pad}if not isinstance({var}, JSON_PRIMATIVES):")
+                lines.append(f"{pad}    raise Invalid")
+                field = self.bind("field", elem_field)
+                lines.append(f"{pad}{field}.validate_atomic(FAST_CTX, {var})")
+                return
+
+            lines.append(f"{pad}if not ({cond}):")
+            lines.append(f"{pad}    raise Invalid")
+            if validator:
+                lines.append(f"{pad}{validator}(fast_err, {var})")
+            return
+
+        lines.append(f"{pad}{self.check_function(elem_field)}({var})")
+
+    def atomic_cond(self, elem_field, var):
+        # -> (condition on var, name of validator or None), the condition
+        # is None unless the element field is one of doolally's own
+        kind = type(elem_field)
+        if (kind.validate_atomic is String.validate_atomic and
+                hasattr(elem_field.validator, 'bulk_charset')):
+            # The charset stands in for the validator
+            fullmatch, multiple = string_charset(elem_field)
+            conds = [f"isinstance({var}, str)"]
+            length = self.length_cond(elem_field, f"len({var})")
+            if length:
+                conds.append(length)
+            if multiple != 1:
+                conds.append(f"len({var}) % {multiple} == 0")
+            match = self.bind("match", fullmatch)
+            conds.append(f"{match}({var})")
+            return " and ".join(conds), None
+
+        validator = None
+        if elem_field.validator is not no_validate:
+            validator = self.bind("validator", elem_field.validator)
+
+        if kind.validate_atomic is String.validate_atomic:
+            conds = [f"isinstance({var}, str)"]
+            length = self.length_cond(elem_field, f"len({var})")
+            if length:
+                conds.append(length)
+            return " and ".join(conds), validator
+
+        if kind.validate_atomic is Number.validate_atomic:
+            conds = [f"isinstance({var}, (int, float))"]
+            if not elem_field.signed:
+                conds.append(f"{var} >= 0")
+            if elem_field.is_int:
+                conds.append(f"(isinstance({var}, int) or int({var}) == {var})")
+            if elem_field.min_value is not None:
+                min_value = self.bind("min_value", elem_field.min_value)
+                conds.append(f"{min_value} <= {var}")
+            if elem_field.max_value is not None:
+                max_value = self.bind("max_value", elem_field.max_value)
+                conds.append(f"{var} <= {max_value}")
+            return " and ".join(conds), validator
+
+        # These don't run validators
+        if kind.validate_atomic is Bool.validate_atomic:
+            return f"isinstance({var}, bool)", None
+        if kind.validate_atomic is Null.validate_atomic:
+            return f"{var} is None", None
+        if kind.validate_atomic is AnyAtomic.validate_atomic:
+            return f"isinstance({var}, JSON_PRIMATIVES)", None
+
+        return None, None
+
+    def length_cond(self, elem_field, length):
+        min_length = elem_field.min_length
+        max_length = elem_field.max_length
+        if max_length == -1:
+            return f"{length} >= {min_length!r}" if min_length > 0 else None
+        if min_length == max_length:
+            return f"{length} == {max_length!r}"
+        if min_length > 0:
+            return f"{min_length!r} <= {length} <= {max_length!r}"
+
+        return f"{length} <= {max_length!r}"
+
+    def collection_lines(self, elem_field, kind, lines):
+        # Leading type and length checks
+        lines.append(f"    if not isinstance(value, {kind}):")
+        lines.append("        raise Invalid")
+        cond = self.length_cond(elem_field, "len(value)")
+        if cond:
+            lines.append(f"    if not {cond}:")
+            lines.append("        raise Invalid")
+
+    def validator_lines(self, elem_field, lines):
+        if elem_field.validator is not no_validate:
+            validator = self.bind("validator", elem_field.validator)
+            lines.append(f"    {validator}(fast_err, value)")
+
+    def schema_lines(self, elem_field, lines):
+        fields = elem_field.doolally_fields
+        required = elem_field.doolally_required_fields
+        self.collection_lines(elem_field, "dict", lines)
+
+        keys = self.bind("keys", frozenset(fields))
+        lines.append("    keys = value.keys()")
+        if required:
+            names = self.bind("required", frozenset(required))
+            lines.append(f"    if not keys <= {keys} or not keys >= {names}:")
+        else:
+            lines.append(f"    if not keys <= {keys}:")
+        lines.append("        raise Invalid")
+
+        for key, field in fields.items():
+            if key in required:
+                lines.append(f"    v = value[{key!r}]")
+                self.element_lines(field, "v", 1, lines)
+            else:
+                lines.append(f"    v = value.get({key!r}, MISSING)")
+                lines.append("    if v is not MISSING:")
+                self.element_lines(field, "v", 2, lines)
+
+        self.validator_lines(elem_field, lines)
+
+    def array_lines(self, elem_field, lines):
+        self.collection_lines(elem_field, "list", lines)
+        if elem_field.bulk_check is None:
+            lines.append("    for v in value:")
+            self.element_lines(elem_field.element_field, "v", 2, lines)
+        else:
+            # Elements failing the bulk check may still be valid, say str
+            # subclasses, check them one by one
+            bulk_check = self.bind("bulk_check", elem_field.bulk_check)
+            lines.append(f"    if not {bulk_check}(value):")
+            lines.append("        for v in value:")
+            self.element_lines(elem_field.element_field, "v", 3, lines)
+        self.validator_lines(elem_field, lines)
+
+    def object_lines(self, elem_field, lines):
+        # StaticTypeObject runs no validator
+        self.collection_lines(elem_field, "dict", lines)
+        if elem_field.unique_items:
+            lines.append("    seen_values = set()")
+        lines.append("    for k, v in value.items():")
+        lines.append("        if not isinstance(k, str):")
+        lines.append("            raise Invalid")
+        if elem_field.unique_items:
+            lines.append("        if v in seen_values:")
+            lines.append("            raise Invalid")
+            lines.append("        seen_values.add(v)")
+        self.element_lines(elem_field.element_field, "v", 2, lines)
+
+    def tag_object_lines(self, elem_field, lines):
+        self.collection_lines(elem_field, "dict", lines)
+        lines.append("    for k, v in value.items():")
+        lines.append("        if not (isinstance(k, str) and isinstance(v, str)):")
+        lines.append("            raise Invalid")
+        self.validator_lines(elem_field, lines)
+
+    def any_collection_lines(self, elem_field, lines):
+        lines.append("    if not isinstance(value, JSON_COLLECTIONS) or not is_json(value):")
+        lines.append("        raise Invalid")
+
+    def union_lines(self, elem_field, lines):
+        # Element fields are tried in order as Union does, the union's own
+        # validator isn't run
+        if elem_field._accepted_types:
+            accepted = self.bind("accepted", elem_field._accepted_types)
+            lines.append(f"    if type(value) in {accepted}:")
+            lines.append("        return")
+        lines.append("    if isinstance(value, JSON_PRIMATIVES):")
+        for field in elem_field._atomic_fields:
+            cond, validator = self.atomic_cond(field, "value")
+            if cond is None:
+                name = self.bind("field", field)
+                call = f"{name}.validate_atomic(FAST_CTX, value)"
+            elif validator:
+                lines.append(f"        if {cond}:")
+                call = f"{validator}(fast_err, value)"
+            else:
+                lines.append(f"        if {cond}:")
+                lines.append("            return")
+                continue
+
+            pad = "        " if cond is None else "            "
+            lines.append(f"{pad}try:")
+            lines.append(f"{pad}    {call}")
+            lines.append(f"{pad}except ValidationError:")
+            lines.append(f"{pad}    pass")
+            lines.append(f"{pad}else:")
+            lines.append(f"{pad}    return")
+
+        if elem_field._collection_fields:
+            lines.append("        raise Invalid")
+            lines.append("    if isinstance(value, JSON_COLLECTIONS):")
+            for field in elem_field._collection_fields:
+                name = self.check_function(field)
+                lines.append("        try:")
+                lines.append(f"            {name}(value)")
+                lines.append("        except ValidationError:")
+                lines.append("            pass")
+                lines.append("        else:")
+                lines.append("            return")
+        lines.append("    raise Invalid")
+
+    def tokenizer_lines(self, elem_field, lines):
+        # Element fields from outside doolally are checked as Union checks
+        # its collection fields
+        field = self.bind("field", elem_field)
+        lines.append("    ctx = Context()")
+        lines.append(f"    ctx.push_element_field('', {field})")
+        lines.append(f"    {field}.validate_collection(ctx, Tokenizer(value))")
+
+
+# Records
+#############
+
+class Record:
+    # Base of the classes record_class generates
+    __slots__ = ()
+
+    def __repr__(self):
+        values = ", ".join(
+            f"{name}={getattr(self, name)!r}" for name in self.__slots__
+        )
+        return f"{type(self).__name__}({values})"
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+
+        return all(
+            getattr(self, name) == getattr(other, name)
+            for name in self.__slots__
+        )
+
+
+# Record classes generated by record_class, keyed on schema
+_records = {}
+
+
+def record_class(schema):
+    """
+    record_class generates a class with __slots__ for the objects of
+    schema, an attribute per field named as it is in the schema. decode
+    with records builds them in place of dicts, from_json makes one of a
+    valid object. Optional fields missing from the object are None.
+
+    >>> class Point(Schema):
+    ...     x_pos = Number(required=True)
+    ...     label = String()
+    >>> record_class(Point).from_json({"xPos": 1})
+    Point(x_pos=1, label=None)
+    >>> p = decode('{"xPos": 1, "label": "a"}', Point, records=True)
+    >>> p.x_pos, p.label
+    (1, 'a')
+    >>> p.y_pos
+    Traceback (most recent call last):
+    ...
+    AttributeError: 'Point' object has no attribute 'y_pos'
+    """
+    try:
+        return _records[schema]
+    except KeyError:
+        pass
+
+    names = schema.doolally_attrs
+    params = ", ".join(["self"] + list(names.values()))
+    lines = [f"def __init__({params}):"]
+    for name in names.values():
+        lines.append(f"    self.{name} = {name}")
+    if not names:
+        lines.append("    pass")
+
+    # Slots are set straight from the object, skipping __init__
+    lines.append("def from_json(obj):")
+    lines.append("    self = new(record)")
+    lines.append("    get = obj.get")
+    for key, name in names.items():
+        lines.append(f"    self.{name} = get({key!r})")
+    lines.append("    return self")
+
+    namespace = {'new': object.__new__}
+    exec("\n".join(lines), namespace)
+
+    record = type(schema.__name__, (Record,), {
+        '__slots__': tuple(names.values()),
+        '__init__': namespace['__init__'],
+        '__module__': schema.__module__,
+        '__qualname__': schema.__qualname__,
+        'from_json': staticmethod(namespace['from_json']),
+    })
+    namespace['record'] = record
+    _records[schema] = record
+
+    # Nested schemas get theirs now too
+    for elem_field in schema.doolally_fields.values():
+        for nested in nested_schemas(elem_field):
+            record_class(nested)
+
+    return record
+
+
+def nested_schemas(elem_field):
+    # Schemas whose objects may be in a value of elem_field
+    if isinstance(elem_field, Schema):
+        yield type(elem_field)
+    elif isinstance(elem_field, (StaticTypeArray, StaticTypeObject)):
+        yield from nested_schemas(elem_field.element_field)
+    elif elem_field.is_union():
+        for collection_field in elem_field._collection_fields:
+            yield from nested_schemas(collection_field)
+
+
+# Converting
+#############
+
+# Converters built by converter, keyed on (schema, coerce, records)
+_converters = {}
+
+
+def converter(schema, coerce, records):
+    """
+    converter builds the function decode runs over a valid document of
+    schema, putting in parsed values with coerce and records with records.
+    Only fields which have something to convert are visited, it is None
+    when nothing in the document needs converting.
+
+    >>> class Point(Schema):
+    ...     x = Number(required=True)
+    >>> converter(Point, coerce=True, records=False) is None
+    True
+    >>> converter(Point, coerce=False, records=True)({"x": 1})
+    Point(x=1)
+    """
+    key = (schema, coerce, records)
+    try:
+        return _converters[key]
+    except KeyError:
+        pass
+
+    convert = field_converter(schema(), coerce, records)
+    _converters[key] = convert
+    return convert
+
+
+def field_converter(elem_field, coerce, records):
+    # The converter of valid values of elem_field, or None
+    if elem_field.is_atomic():
+        # The value is valid, so what its parser returns is all that is
+        # needed of validate_atomic
+        if coerce and elem_field.parses:
+            return partial(elem_field.validator, FAST_CTX.ctx_err)
+        return None
+
+    if elem_field.is_union():
+        return union_converter(elem_field, coerce, records)
+
+    if isinstance(elem_field, Schema):
+        return schema_converter(elem_field, coerce, records)
+
+    if isinstance(elem_field, (StaticTypeArray, StaticTypeObject)):
+        convert = field_converter(elem_field.element_field, coerce, records)
+        if convert is None:
+            return None
+
+        if isinstance(elem_field, StaticTypeArray):
+            return lambda value: [convert(elem) for elem in value]
+
+        return lambda value: {k: convert(v) for k, v in value.items()}
+
+    # TagObject and AnyCollection values are returned as they are
+    return None
+
+
+def schema_converter(schema, coerce, records):
+    fields = {}
+    for key, elem_field in schema.doolally_fields.items():
+        convert = field_converter(elem_field, coerce, records)
+        if convert is not None:
+            fields[key] = convert
+
+    from_json = None
+    if records:
+        from_json = record_class(type(schema)).from_json
+    elif not fields:
+        return None
+
+    def convert(obj):
+        for key, convert_field in fields.items():
+            if key in obj:
+                obj[key] = convert_field(obj[key])
+
+        if from_json is None:
+            return obj
+
+        return from_json(obj)
+
+    return convert
+
+
+def union_converter(union, coerce, records):
+    parse = None
+    if coerce and union.parses:
+        parse = partial(union.parse_atomic, FAST_CTX)
+
+    # A collection is converted as the first collection field it passes
+    converters = {}
+    for elem_field in union._collection_fields:
+        convert = field_converter(elem_field, coerce, records)
+        converters[elem_field] = (collection_check(elem_field), convert)
+
+    if not any(convert for _, convert in converters.values()):
+        if parse is None:
+            return None
+        converters = {}
+
+    candidates = {
+        kind: [converters[f] for f in elem_fields if f in converters]
+        for kind, elem_fields in union._collection_candidates.items()
+    }
+
+    def convert(value):
+        if not isinstance(value, JSON_COLLECTIONS):
+            return value if parse is None else parse(value)
+
+        for passes, convert_field in candidates[type(value)]:
+            if passes(value):
+                if convert_field is None:
+                    return value
+
+                return convert_field(value)
+
+        return value
+
+    return convert
+
+
+def collection_check(elem_field):
+    # -> whether a collection is valid for elem_field, as validate
+    # decides it
+    check = Compiler().compile(elem_field)
+
+    def passes(value):
+        try:
+            check(value)
+        except Exception:
+            ctx = Context([("", elem_field)])
+            try:
+                elem_field.validate_collection(ctx, Tokenizer(value))
+            except ValidationError:
+                return False
+
+        return True
+
+    return passes
+
+
 # Enums
 ############
 
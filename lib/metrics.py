@@ -0,0 +1,442 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import contextvars
+import glob
+import json as js
+import os
+import threading
+from contextlib import contextmanager
+from time import perf_counter_ns
+
+from lib.mmapdict import MmapDict, read_values
+
+__all__ = [
+    'Histogram',
+    'PhaseTimer',
+    'timed_phase',
+    'Registry',
+    'registry',
+]
+
+# Histograms are log-linear, every power of two is split into 2^SUB_BITS
+# buckets so values are kept to within ~6% at any magnitude.
+SUB_BITS = 4
+SUB_BUCKETS = 1 << SUB_BITS
+# Values are recorded in microseconds, this covers up to ~12 days
+MAX_SHIFT = 36
+BUCKETS = (MAX_SHIFT + 2) * SUB_BUCKETS
+
+
+def bucket_index(value):
+    """
+    >>> [bucket_index(v) for v in (0, 31, 32, 33, 34, 64, 1000)]
+    [0, 31, 32, 32, 33, 48, 111]
+    """
+    if value < 2 * SUB_BUCKETS:
+        return value
+
+    shift = value.bit_length() - SUB_BITS - 1
+    return shift * SUB_BUCKETS + (value >> shift)
+
+
+def bucket_bounds(index):
+    """
+    [lower, upper) of the values falling into bucket index
+
+    >>> bucket_bounds(32), bucket_bounds(111)
+    ((32, 34), (992, 1024))
+    """
+    if index < 2 * SUB_BUCKETS:
+        return index, index + 1
+
+    shift = index // SUB_BUCKETS - 1
+    top = index - shift * SUB_BUCKETS
+    return top << shift, (top + 1) << shift
+
+
+class Histogram:
+    """
+    Histogram is an HDR style latency histogram of microsecond values.
+
+    >>> h = Histogram()
+    >>> for v in range(1, 1001): h.record(v)
+    >>> h.count, h.max
+    (1000, 1000)
+    >>> h.percentile(50), h.percentile(99)
+    (511, 991)
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'max', '_lock')
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self._lock = threading.Lock()
+
+    def record(self, value):
+        index = min(bucket_index(value), BUCKETS - 1)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, pct):
+        # Highest value equivalent to the pct'th percentile
+        if self.count == 0:
+            return 0
+
+        target = max(1, -(-self.count * pct // 100))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(bucket_bounds(index)[1] - 1, self.max)
+
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.total // self.count if self.count else 0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'p999': self.percentile(99.9),
+            'max': self.max,
+        }
+
+
+# The PhaseTimer of the request being handled, if timing is enabled
+_current = contextvars.ContextVar('lib_metrics_timer', default=None)
+
+
+class PhaseTimer:
+    """
+    PhaseTimer accumulates the nanoseconds a single request spends in each
+    phase, in the order the phases were first entered.
+    """
+
+    __slots__ = ('phases', 'start')
+
+    def __init__(self):
+        self.phases = {}
+        self.start = perf_counter_ns()
+
+    def add(self, phase, duration):
+        self.phases[phase] = self.phases.get(phase, 0) + duration
+
+    @staticmethod
+    def current():
+        return _current.get()
+
+    def activate(self):
+        return _current.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+    def server_timing(self):
+        # Server-Timing header value, durations in milliseconds
+        return ", ".join(
+            f"{phase};dur={duration / 1e6:.3f}"
+            for (phase, duration) in self.phases.items())
+
+
+@contextmanager
+def timed_phase(phase):
+    """
+    Adds the time spent in the block to phase of the current request, and
+    to the downstream latency metric when metrics are enabled. When neither
+    is in use this is a context variable lookup and an attribute check.
+    """
+    timer = _current.get()
+    if timer is None and registry.store is None:
+        yield
+        return
+
+    start = perf_counter_ns()
+    try:
+        yield
+    finally:
+        duration = perf_counter_ns() - start
+        if timer is not None:
+            timer.add(phase, duration)
+        DOWNSTREAM_SECONDS.observe(duration / 1e9, target=phase)
+
+
+# Exposition
+###################
+
+# Prometheus histogram buckets, in seconds
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+
+class LocalStore:
+    # Values for a single process
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, amount, live=False):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def values(self):
+        return dict(self._values)
+
+
+class MmapStore:
+    """
+    MmapStore keeps each process's values in its own mmap'd file in
+    directory, reading sums over every process that has written there.
+    Files are opened per pid so a store created before a fork is safe to
+    use in the workers.
+
+    Live values, gauges, are kept in a second file per process. They only
+    describe a running process, so the files of processes which have died
+    are removed rather than summed. Counters of dead processes are still
+    summed so totals never go backwards.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._pid = None
+        self._dicts = None
+        self._lock = threading.Lock()
+
+    def add(self, key, amount, live=False):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._dicts = (
+                        MmapDict(self.path("metrics", os.getpid())),
+                        MmapDict(self.path("live", os.getpid())),
+                    )
+                    self._pid = os.getpid()
+
+        self._dicts[live].add(key, amount)
+
+    def path(self, kind, pid):
+        return os.path.join(self.directory, f"{kind}_{pid}.db")
+
+    def values(self):
+        paths = glob.glob(self.path("metrics", "*"))
+        for path in glob.glob(self.path("live", "*")):
+            if pid_alive(int(path[:-len(".db")].rpartition("_")[2])):
+                paths.append(path)
+                continue
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another process collecting got there first
+                pass
+
+        return read_values(paths)
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Someone else's process, but alive
+        return True
+
+    return True
+
+
+class Counter:
+
+    __slots__ = ('registry', 'name')
+    kind = 'counter'
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def inc(self, amount=1, **labels):
+        self.registry.add(self.name, labels, amount)
+
+
+class Gauge(Counter):
+
+    __slots__ = ()
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        self.registry.add(self.name, labels, amount, live=True)
+
+    def dec(self, amount=1, **labels):
+        self.registry.add(self.name, labels, -amount, live=True)
+
+
+class BucketHistogram:
+
+    __slots__ = ('registry', 'name', 'buckets')
+    kind = 'histogram'
+
+    def __init__(self, registry, name, buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if self.registry.store is None:
+            return
+
+        le = '+Inf'
+        for bound in self.buckets:
+            if value <= bound:
+                le = format_value(bound)
+                break
+
+        # Buckets are stored individually and made cumulative on export
+        self.registry.add(self.name + '_bucket', dict(labels, le=le), 1)
+        self.registry.add(self.name + '_sum', labels, value)
+        self.registry.add(self.name + '_count', labels, 1)
+
+
+class Registry:
+    """
+    Registry holds the metric families of a process and renders them in
+    the Prometheus text format. Until enable is called nothing is stored
+    and updating a metric is a no-op.
+
+    >>> r = Registry()
+    >>> requests = r.counter('requests_total', 'requests handled')
+    >>> requests.inc(route='/a')
+    >>> r.enable()
+    >>> requests.inc(route='/a'); requests.inc(route='/a')
+    >>> print(r.exposition(), end='')
+    # HELP requests_total requests handled
+    # TYPE requests_total counter
+    requests_total{route="/a"} 2
+    """
+
+    def __init__(self):
+        self.store = None
+        self._families = {}
+
+    def enable(self, directory=None):
+        # Values are shared between processes through directory if given
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.store = MmapStore(directory)
+        else:
+            self.store = LocalStore()
+
+    def counter(self, name, help_text):
+        return self._family(Counter(self, name), help_text)
+
+    def gauge(self, name, help_text):
+        return self._family(Gauge(self, name), help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._family(BucketHistogram(self, name, buckets), help_text)
+
+    def _family(self, metric, help_text):
+        family = self._families.setdefault(metric.name, (metric, help_text))
+        return family[0]
+
+    def add(self, name, labels, amount, live=False):
+        if self.store is None:
+            return
+
+        key = js.dumps([name, sorted(labels.items())])
+        self.store.add(key, amount, live)
+
+    def exposition(self):
+        samples = {}
+        for (key, value) in (self.store.values() if self.store else {}).items():
+            name, labels = js.loads(key)
+            samples.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in sorted(self._families):
+            metric, help_text = self._families[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            if metric.kind == 'histogram':
+                lines.extend(histogram_lines(metric, samples))
+                continue
+
+            for (labels, value) in sorted(samples.get(name, [])):
+                lines.append(sample_line(name, labels, value))
+
+        return "\n".join(lines) + "\n"
+
+
+def histogram_lines(metric, samples):
+    name = metric.name
+    buckets = {}
+    for (labels, value) in samples.get(name + '_bucket', []):
+        le = dict(labels)['le']
+        series = tuple((k, v) for (k, v) in labels if k != 'le')
+        buckets.setdefault(series, {})[le] = value
+
+    sums = series_values(samples.get(name + '_sum', []))
+    counts = series_values(samples.get(name + '_count', []))
+
+    lines = []
+    for series in sorted(buckets):
+        total = 0
+        for le in [format_value(b) for b in metric.buckets] + ['+Inf']:
+            total += buckets[series].get(le, 0)
+            lines.append(sample_line(name + '_bucket',
+                                     list(series) + [('le', le)], total))
+
+        lines.append(sample_line(name + '_sum', series, sums.get(series, 0)))
+        lines.append(
+            sample_line(name + '_count', series, counts.get(series, 0)))
+
+    return lines
+
+
+def series_values(samples):
+    # Labels come back from JSON as lists, series are keyed on tuples
+    return {
+        tuple(tuple(pair) for pair in labels): value
+        for (labels, value) in samples
+    }
+
+
+def sample_line(name, labels, value):
+    if not labels:
+        return f"{name} {format_value(value)}"
+
+    pairs = ",".join(f'{k}="{escape_label(v)}"' for (k, v) in labels)
+    return f"{name}{{{pairs}}} {format_value(value)}"
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value):
+    """
+    >>> format_value(2.0), format_value(0.25), format_value(float('inf'))
+    ('2', '0.25', '+Inf')
+    """
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+
+    return repr(float(value))
+
+
+# The process wide registry, plantpot enables it
+registry = Registry()
+
+DOWNSTREAM_SECONDS = registry.histogram(
+    'plantpot_downstream_duration_seconds',
+    'time spent in calls to other services and the database')
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import mmap
+import os
+import struct
+import threading
+
+__all__ = [
+    'MmapDict',
+    'read_values',
+]
+
+INITIAL_SIZE = 64 * 1024
+# The first 8 bytes of a file hold the number of bytes in use
+HEADER = struct.Struct('q')
+# Each entry is a length prefixed utf8 key, padded to 8 bytes, then a double
+KEY_LENGTH = struct.Struct('i')
+VALUE = struct.Struct('d')
+
+
+def entry_size(encoded):
+    size = KEY_LENGTH.size + len(encoded)
+    return size + (8 - size % 8) % 8 + VALUE.size
+
+
+class MmapDict:
+    """
+    MmapDict is a file backed mapping of str keys to float values. Each
+    process writes its own file so no cross process locking is needed,
+    readers sum the files with read_values.
+
+    >>> import tempfile
+    >>> d = tempfile.mkdtemp()
+    >>> m = MmapDict(os.path.join(d, 'a.db'))
+    >>> m.add('requests', 1); m.add('requests', 2); m.add('errors', 1)
+    >>> sorted(read_values([os.path.join(d, 'a.db')]).items())
+    [('errors', 1.0), ('requests', 3.0)]
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._file = open(path, 'a+b')
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        if size == 0:
+            self._file.truncate(INITIAL_SIZE)
+            size = INITIAL_SIZE
+
+        self._capacity = size
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self._used = HEADER.unpack_from(self._mmap, 0)[0]
+        if self._used == 0:
+            self._used = HEADER.size
+            HEADER.pack_into(self._mmap, 0, self._used)
+
+        self._positions = {
+            key: pos for (key, pos, _) in iter_entries(self._mmap, self._used)
+        }
+
+    def add(self, key, amount):
+        with self._lock:
+            pos = self._positions.get(key)
+            if pos is None:
+                pos = self._insert(key)
+
+            value = VALUE.unpack_from(self._mmap, pos)[0]
+            VALUE.pack_into(self._mmap, pos, value + amount)
+
+    def _insert(self, key):
+        encoded = key.encode('utf8')
+        size = entry_size(encoded)
+        while self._used + size > self._capacity:
+            self._grow()
+
+        offset = self._used
+        KEY_LENGTH.pack_into(self._mmap, offset, len(encoded))
+        start = offset + KEY_LENGTH.size
+        self._mmap[start:start + len(encoded)] = encoded
+        pos = offset + size - VALUE.size
+        VALUE.pack_into(self._mmap, pos, 0.0)
+
+        # Publish the entry to readers only once it is fully written
+        self._used += size
+        HEADER.pack_into(self._mmap, 0, self._used)
+        self._positions[key] = pos
+        return pos
+
+    def _grow(self):
+        self._mmap.close()
+        self._capacity *= 2
+        self._file.truncate(self._capacity)
+        self._mmap = mmap.mmap(self._file.fileno(), self._capacity)
+
+
+def iter_entries(data, used):
+    offset = HEADER.size
+    while offset < used:
+        length = KEY_LENGTH.unpack_from(data, offset)[0]
+        start = offset + KEY_LENGTH.size
+        encoded = bytes(data[start:start + length])
+        size = entry_size(encoded)
+        pos = offset + size - VALUE.size
+        yield encoded.decode('utf8'), pos, VALUE.unpack_from(data, pos)[0]
+        offset += size
+
+
+def read_values(paths):
+    # Sums the values of each key over every file in paths
+    values = {}
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        if len(data) < HEADER.size:
+            continue
+
+        used = HEADER.unpack_from(data, 0)[0]
+        for (key, _, value) in iter_entries(data, used):
+            values[key] = values.get(key, 0.0) + value
+
+    return values
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json as js
+import os
+import random
+
+from lib import doolally
+from lib.doolally import ValidationError
+from lib.metrics import registry
+
+__all__ = [
+    'ValidationPolicy',
+    'policy',
+    'validate',
+    'decode',
+    'encode',
+]
+
+# Modes
+ALWAYS = 'always'
+SAMPLED = 'sampled'
+OFF = 'off'
+
+# Directions, clients covers what they send to and receive from our own
+# services. Requests come from outside and are always validated, there
+# are no rules for them.
+REQUEST = 'request'
+RESPONSE = 'response'
+CLIENT = 'client'
+
+DIRECTIONS = (RESPONSE, CLIENT)
+
+VIOLATIONS = registry.counter(
+    'plantpot_validation_violations_total',
+    'schema violations found by sampled validation')
+
+
+class ValidationPolicy:
+    """
+    ValidationPolicy decides how documents are validated against a schema
+    in each direction. A spec is comma separated rules of the form
+    [Schema.]direction=mode, mode being always, off or sampled:rate.
+    Rules naming a schema override the default for the direction, which
+    is always. Request bodies can't be configured, they are untrusted so
+    always validated.
+
+    In sampled mode violations are counted and passed to on_violation,
+    they aren't raised, so sampling never changes what a request does.
+
+    >>> p = ValidationPolicy("response=sampled:0.01,MessagesResp.response=off")
+    >>> p.rule('EventsResp', RESPONSE), p.rule('MessagesResp', RESPONSE)
+    (('sampled', 0.01), ('off', 1.0))
+    >>> p.rule('EventsResp', CLIENT)
+    ('always', 1.0)
+    >>> ValidationPolicy("response=sometimes")
+    Traceback (most recent call last):
+    ...
+    ValueError: unrecognised validation mode sometimes
+    >>> ValidationPolicy("request=off")
+    Traceback (most recent call last):
+    ...
+    ValueError: request bodies are always validated, request=off
+    """
+
+    def __init__(self, spec="", on_violation=None):
+        self.on_violation = on_violation
+        # (schema name or None, direction) -> (mode, rate)
+        self._rules = {}
+        for rule in spec.split(','):
+            if rule.strip():
+                self._parse_rule(rule.strip())
+
+    def _parse_rule(self, rule):
+        target, _, mode = rule.partition('=')
+        schema, _, direction = target.rpartition('.')
+        if direction == REQUEST:
+            raise ValueError(f"request bodies are always validated, {rule}")
+        if direction not in DIRECTIONS:
+            raise ValueError(f"unrecognised validation direction {direction}")
+
+        mode, _, rate = mode.partition(':')
+        if mode not in (ALWAYS, SAMPLED, OFF):
+            raise ValueError(f"unrecognised validation mode {mode}")
+
+        rate = float(rate) if mode == SAMPLED else 1.0
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError(f"validation sample rate out of range {rate}")
+
+        self._rules[(schema or None, direction)] = (mode, rate)
+
+    def rule(self, name, direction):
+        rule = self._rules.get((name, direction))
+        if rule is None:
+            rule = self._rules.get((None, direction), (ALWAYS, 1.0))
+
+        return rule
+
+    def decide(self, schema, direction):
+        # The mode for this one document, sampled is decided here
+        mode, rate = self.rule(schema.__name__, direction)
+        if mode == SAMPLED and random.random() >= rate:
+            return OFF
+
+        return mode
+
+    def violation(self, schema, direction, exc):
+        VIOLATIONS.inc(schema=schema.__name__, direction=direction)
+        if self.on_violation is not None:
+            self.on_violation(schema, direction, exc)
+
+
+# The process wide policy, from PLANTPOT_VALIDATION
+policy = ValidationPolicy(os.environ.get('PLANTPOT_VALIDATION', ''))
+
+
+def validate(json, schema, direction=CLIENT):
+    mode = policy.decide(schema, direction)
+    if mode == ALWAYS:
+        doolally.validate(json, schema)
+    elif mode == SAMPLED:
+        try:
+            doolally.validate(json, schema)
+        except ValidationError as exc:
+            policy.violation(schema, direction, exc)
+
+
+def decode(s, schema, coerce=False, records=False):
+    # Request bodies, see doolally.decode. They come from outside so are
+    # always validated, whatever the policy.
+    return doolally.decode(s, schema, coerce=coerce, records=records)
+
+
+def encode(json, schema):
+    # Response bodies, validated as the policy has it then dumped
+    mode = policy.decide(schema, RESPONSE)
+    if mode == ALWAYS:
+        doolally.validate(json, schema)
+    elif mode == SAMPLED:
+        try:
+            doolally.validate(json, schema)
+        except ValidationError as exc:
+            policy.violation(schema, RESPONSE, exc)
+
+    return bytes(js.dumps(json), encoding='utf8')
@@ -3,11 +3,25 @@
 
 import os
 
-from peewee import Field
+from peewee import Field, MySQLDatabase
+
+from lib.metrics import registry, timed_phase
 
 DB_HOST = os.environ.get("PLANTPOT_DB_HOST", "db")
 DB_PORT = int(os.environ.get('PLANTPOT_DB_PORT', '3306'))
 
+DB_QUERIES = registry.counter('plantpot_db_queries_total',
+                              'queries sent to the database')
+
+
+class Database(MySQLDatabase):
+    # Queries are counted and show up as the db phase of timed requests
+
+    def execute_sql(self, sql, params=None, *args, **kwargs):
+        DB_QUERIES.inc(database=self.database)
+        with timed_phase('db'):
+            return super().execute_sql(sql, params, *args, **kwargs)
+
 
 class Binary8(Field):
     field_type = 'binary(8)'
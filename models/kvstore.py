@@ -1,12 +1,12 @@
-from peewee import Model, Field, CharField, DateTimeField, MySQLDatabase
+from peewee import Model, Field, CharField, DateTimeField
 
-from models import DB_HOST, DB_PORT, Binary16, Binary32
+from models import Database, DB_HOST, DB_PORT, Binary16, Binary32
 
-DB = MySQLDatabase('KVSTORE',
-                   user='kvstore',
-                   host=DB_HOST,
-                   port=DB_PORT,
-                   password="password")
+DB = Database('KVSTORE',
+              user='kvstore',
+              host=DB_HOST,
+              port=DB_PORT,
+              password="password")
 
 
 class Value(Model):
@@ -13,10 +13,10 @@ from peewee import (
     DateTimeField,
     SmallIntegerField,
     FloatField,
-    MySQLDatabase,
 )
 
 from models import (
+    Database,
     DB_HOST,
     DB_PORT,
     Binary8,
@@ -25,11 +25,11 @@ from models import (
     varbinary_field,
 )
 
-DB = MySQLDatabase('TULIPTHECLOWN',
-                   user='tuliptheclown',
-                   host=DB_HOST,
-                   port=DB_PORT,
-                   password="password")
+DB = Database('TULIPTHECLOWN',
+              user='tuliptheclown',
+              host=DB_HOST,
+              port=DB_PORT,
+              password="password")
 
 
 class ContactType(Field):
@@ -2,20 +2,19 @@
 # -*- coding: utf-8 -*-
 
 from peewee import (
-    MySQLDatabase,
     Model,
     Field,
     CharField,
     ForeignKeyField,
 )
 
-from models import Binary16, Binary32, Binary64
+from models import Database, DB_HOST, DB_PORT, Binary16, Binary32, Binary64
 
-DB = MySQLDatabase('USER',
-                   user='user',
-                   host=DB_HOST,
-                   port=DB_PORT,
-                   password="password")
+DB = Database('USER',
+              user='user',
+              host=DB_HOST,
+              port=DB_PORT,
+              password="password")
 
 
 class LoginFlags(Field):
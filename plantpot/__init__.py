@@ -2,7 +2,14 @@
 # -*- coding: utf-8 -*-
 
 import json as js
+import mimetypes
+import os
+import tempfile
 from collections import namedtuple
+from contextlib import contextmanager
+from functools import partial
+from inspect import iscoroutinefunction
+from pathlib import PurePath
 
 from casket import logger
 
@@ -12,15 +19,44 @@ from clients.exceptions import ClientError
 from framework import (
     Application,
     UrlParamArg,
+    PathExact,
+    PathPrefix,
+    Compression,
+    ETag,
+    CachePolicy,
+    SharedGenerations,
+    SingleFlight,
+    BackgroundPool,
+    defer,
+    Admission,
+    PRIORITIES,
+    Timing,
+    StackSampler,
+    RouteProfiler,
+    ProfilerBusy,
+    ResponseException,
+    SPOOL_THRESHOLD,
     internal_server_error,
     bad_request,
     forbidden,
+    conflict,
     Redirect,
     already_created,
+    not_found,
 )
 from lib import is_hexstring
-from lib.doolally import validate as validate_json, ValidationError
+from lib.doolally import ValidationError, record_class
+from lib.validation import (
+    policy as validation_policy,
+    decode as decode_json,
+    encode as encode_json,
+)
 from lib.tokens import TokenError
+from lib.metrics import registry
+from plantpot.batch import Batch, BATCH_PATH
+from plantpot.metrics import RequestMetrics
+from schemas.batch import BatchReq, BatchResp
+from schemas.debug import TimingsResp, ProfileRequestsReq
 
 __all__ = [
     'Plantpot',
@@ -28,10 +64,50 @@ __all__ = [
     'bad_request',
     'already_created',
     'forbidden',
+    'not_found',
     'JSONResponse',
     'HTMLResponse',
+    'FileResponse',
     'JSONRequest',
+    'CachePolicy',
+    'defer',
+]
+
+COMPRESSION_LEVEL = int(os.environ.get('PLANTPOT_COMPRESSION_LEVEL', '6'))
+COMPRESSION_MIN_SIZE = int(
+    os.environ.get('PLANTPOT_COMPRESSION_MIN_SIZE', '1024'))
+BACKGROUND_WORKERS = int(os.environ.get('PLANTPOT_BACKGROUND_WORKERS', '2'))
+BACKGROUND_QUEUE_SIZE = int(
+    os.environ.get('PLANTPOT_BACKGROUND_QUEUE_SIZE', '1000'))
+# drop - discard tasks when the queue is full, run - run them inline
+BACKGROUND_OVERFLOW = os.environ.get('PLANTPOT_BACKGROUND_OVERFLOW', 'drop')
+# CachePolicy generations are shared by the workers through a file here,
+# so an invalidate in one worker is seen by all of them
+CACHE_DIR = os.environ.get('PLANTPOT_CACHE_DIR', tempfile.gettempdir())
+# Requests in flight across the whole service, 0 for no limit. Endpoint
+# priorities only take effect with a limit, see framework.admission
+MAX_CONCURRENCY = int(os.environ.get('PLANTPOT_MAX_CONCURRENCY', '0'))
+RETRY_AFTER = int(os.environ.get('PLANTPOT_RETRY_AFTER', '1'))
+# Per phase latency histograms, and whether to send them in Server-Timing
+TIMING = os.environ.get('PLANTPOT_TIMING', '0') == '1'
+SERVER_TIMING = os.environ.get('PLANTPOT_SERVER_TIMING', '0') == '1'
+# Serve Prometheus metrics from /metrics, aggregated over every worker
+# process writing to PLANTPOT_METRICS_DIR. The directory must be emptied
+# before the service starts, as counters left by old processes are summed
+# too (gauges of dead processes are dropped)
+METRICS = os.environ.get('PLANTPOT_METRICS', '0') == '1'
+METRICS_DIR = os.environ.get('PLANTPOT_METRICS_DIR')
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Login ids allowed to use the /debug endpoints, comma separated
+DEBUG_LOGIN_IDS = [
+    login_id for login_id in
+    os.environ.get('PLANTPOT_DEBUG_LOGIN_IDS', '').split(',') if login_id
 ]
+# Limits of the /debug/profile endpoints
+PROFILE_INTERVAL_MS = int(os.environ.get('PLANTPOT_PROFILE_INTERVAL_MS', '5'))
+MAX_PROFILE_SECONDS = int(os.environ.get('PLANTPOT_MAX_PROFILE_SECONDS', '60'))
+MAX_PROFILE_REQUESTS = int(
+    os.environ.get('PLANTPOT_MAX_PROFILE_REQUESTS', '100'))
 
 DEFAULT_CONFIG = {
     'path': "/",
@@ -52,18 +128,117 @@ DEFAULT_CONFIG = {
     'resp_status': "200 Ok",
     'resp_content_type': None,
     'raw_body': False,
+    'stream_body': False,
+    'max_body_size': None,
+    'spool_threshold': SPOOL_THRESHOLD,
+    'etag': False,
+    'cache': None,
+    'invalidates': [],
+    'coalesce': False,
+    'max_concurrency': None,
+    'max_queue_ms': 0,
+    'priority': 'normal',
     'populate_response': None,
 }
 
 
 class Plantpot:
 
-    def __init__(self, name):
-        self._app = Application(name)
+    def __init__(self, name, compression=None, batch=False):
+        # Responses are compressed unless compression=False
+        if compression is None:
+            compression = Compression(min_size=COMPRESSION_MIN_SIZE,
+                                      level=COMPRESSION_LEVEL)
+        elif compression is False:
+            compression = None
+
+        metrics = None
+        if METRICS:
+            if registry.store is None:
+                registry.enable(METRICS_DIR)
+            metrics = RequestMetrics(name)
+
+        self._background = BackgroundPool(workers=BACKGROUND_WORKERS,
+                                          max_queue=BACKGROUND_QUEUE_SIZE,
+                                          overflow=BACKGROUND_OVERFLOW,
+                                          on_error=log_background_error,
+                                          metrics=metrics)
+        self._generations = SharedGenerations(
+            os.path.join(CACHE_DIR, f"plantpot_{name}_cache.db"))
+        self._admission = None
+        if MAX_CONCURRENCY:
+            self._admission = Admission(MAX_CONCURRENCY)
+
+        self._timing = None
+        if TIMING or SERVER_TIMING:
+            self._timing = Timing(server_timing=SERVER_TIMING)
+
+        # Profilers are only needed by the debug endpoints
+        self._sampler = None
+        self._profiler = None
+        if DEBUG_LOGIN_IDS:
+            self._sampler = StackSampler(interval=PROFILE_INTERVAL_MS / 1000)
+            self._profiler = RouteProfiler()
+
+        # Violations found by sampled validation, see PLANTPOT_VALIDATION
+        validation_policy.on_violation = log_validation_violation
+
+        self._app = Application(name,
+                                compression=compression,
+                                background=self._background,
+                                admission=self._admission,
+                                timing=self._timing,
+                                metrics=metrics,
+                                profiler=self._profiler)
+        # "METHODS path" -> SingleFlight for endpoints registered with
+        # coalesce=True, GET and POST on one path are separate endpoints
+        self._flights = {}
+        # "METHODS path" -> Limiter for endpoints with admission control
+        self._limiters = {}
+
+        # POST /_batch runs several requests in one round trip, services
+        # opt in with batch=True
+        if batch:
+            self.add_json_endpoint(Batch(self._app),
+                                   req_schema=BatchReq,
+                                   resp_schema=BatchResp,
+                                   path=BATCH_PATH,
+                                   methods=['POST'],
+                                   pass_context=True,
+                                   pass_headers=True)
+
+        if METRICS:
+            self.add_endpoint(metrics_exposition,
+                              DefaultResponse('200 Ok', METRICS_CONTENT_TYPE),
+                              path='/metrics',
+                              priority='high')
+
+        if self._timing is not None:
+            self.add_debug_endpoint(self.timing_summary,
+                                    path='/debug/timings',
+                                    resp_schema=TimingsResp)
+
+        # Collapsed stacks of the whole process for ?seconds=N
+        self.add_debug_endpoint(
+            self.sample_stacks,
+            path='/debug/profile',
+            param_args=[UrlParamArg("seconds", profile_seconds_sanity)])
+        # cProfile stats of the next requests to a route
+        self.add_debug_endpoint(self.profile_requests,
+                                path='/debug/profile/requests',
+                                methods=['POST'],
+                                req_schema=ProfileRequestsReq)
+        self.add_debug_endpoint(
+            self.profile_report,
+            path='/debug/profile/requests',
+            param_args=[UrlParamArg("route", None)])
 
     def __call__(self, environ, start_response):
         return self._app(environ, start_response)
 
+    async def asgi(self, scope, receive, send):
+        await self._app.asgi(scope, receive, send)
+
     def add_endpoint(self, clb, populate_response, **kwargs):
         config = DEFAULT_CONFIG.copy()
         for k, v in kwargs.items():
@@ -81,12 +256,94 @@ class Plantpot:
                                  config['methods'],
                                  config['ignore_path_case'])
 
+        for policy in [config['cache'], *config['invalidates']]:
+            if policy is not None:
+                policy.share(self._generations)
+
+        priority = config['priority']
+        if priority not in PRIORITIES:
+            raise KeyError(f"invalid priority {priority}")
+
+        # Priorities are shares of the service wide limit, without one
+        # every request is admitted whatever its priority
+        if priority != 'normal' and self._admission is None:
+            logger.error("endpoint priority has no effect", {
+                "path": matcher.path,
+                "priority": priority,
+                "reason": "PLANTPOT_MAX_CONCURRENCY is not set",
+            })
+
         clb = Endpoint(clb, config)
-        self._app.add_endpoint(matcher, clb, populate_response,
-                               **make_endpoint_kwargs(config))
+        endpoint_kwargs = make_endpoint_kwargs(config)
+        key = f"{','.join(config['methods'])} {matcher.path}"
+        if endpoint_kwargs['coalesce'] is not None:
+            self._flights[key] = endpoint_kwargs['coalesce']
+
+        endpoint = self._app.add_endpoint(matcher, clb, populate_response,
+                                          **endpoint_kwargs)
+        if endpoint.limiter is not None:
+            self._limiters[key] = endpoint.limiter
 
         return clb
 
+    def add_debug_endpoint(self, clb, **kwargs):
+        # Debug endpoints only exist for the whitelisted login ids
+        if not DEBUG_LOGIN_IDS:
+            return None
+
+        return self.add_json_endpoint(clb,
+                                      require_login_id=True,
+                                      login_id_whitelist=DEBUG_LOGIN_IDS,
+                                      priority='low',
+                                      **kwargs)
+
+    def timing_summary(self, login_id):
+        return dict(routes=self._timing.summary())
+
+    def sample_stacks(self, login_id, seconds):
+        try:
+            return self._sampler.sample(float(seconds))
+        except ProfilerBusy as exc:
+            raise conflict(str(exc))
+
+    def profile_requests(self, body, login_id):
+        if body['requests'] > MAX_PROFILE_REQUESTS:
+            raise bad_request(
+                'Too Many Requests',
+                f"at most {MAX_PROFILE_REQUESTS} requests can be profiled")
+
+        try:
+            self._profiler.arm(body['route'], body['requests'])
+        except KeyError:
+            raise not_found()
+
+    def profile_report(self, login_id, route):
+        try:
+            return self._profiler.report(route)
+        except KeyError:
+            raise not_found()
+
+    def background_stats(self):
+        # Tasks deferred with defer() and what became of them
+        return self._background.stats()
+
+    def admission_stats(self):
+        # In flight and rejected requests, service wide and per endpoint
+        return {
+            'service': self._admission.stats() if self._admission else None,
+            'endpoints': {
+                key: limiter.stats()
+                for (key, limiter) in self._limiters.items()
+            },
+        }
+
+    def coalescing_stats(self):
+        # How many requests each coalescing endpoint collapsed
+        return {
+            key: flight.stats()
+            for (key, flight) in self._flights.items()
+        }
+
     def endpoint(self, *args, **kwargs):
         if len(args) == 1 and len(kwargs) == 0 and callable(args[0]):
             self.add_endpoint(args[0], DefaultResponse('200 Ok'))
@@ -107,10 +364,14 @@ class Plantpot:
                           clb,
                           req_schema=None,
                           resp_schema=None,
+                          coerce=False,
+                          records=False,
                           **kwargs):
 
         if req_schema:
-            kwargs['req_transformer'] = JSONRequest(req_schema)
+            kwargs['req_transformer'] = JSONRequest(req_schema,
+                                                    coerce,
+                                                    records)
 
         status = kwargs.get('resp_status', DEFAULT_CONFIG['resp_status'])
         if resp_schema:
@@ -120,14 +381,25 @@ class Plantpot:
 
         return self.add_endpoint(clb, populate_response, **kwargs)
 
-    def json(self, *args, req_schema=None, resp_schema=None, **kwargs):
+    def json(self,
+             *args,
+             req_schema=None,
+             resp_schema=None,
+             coerce=False,
+             records=False,
+             **kwargs):
 
         if len(args) == 1 and callable(args[0]) and len(kwargs) == 0:
             self.add_json_endpoint(args[0])
             return args[0]
 
         def inner(clb):
-            return self.add_json_endpoint(clb, req_schema, resp_schema, **kwargs)
+            return self.add_json_endpoint(clb,
+                                          req_schema,
+                                          resp_schema,
+                                          coerce,
+                                          records,
+                                          **kwargs)
 
         return inner
 
@@ -146,43 +418,101 @@ class Plantpot:
 
         return inner
 
+    def add_file_endpoint(self, clb, **kwargs):
+        status = kwargs.get('resp_status', DEFAULT_CONFIG['resp_status'])
+        content_type = kwargs.get('resp_content_type')
+        return self.add_endpoint(clb, FileResponse(status, content_type),
+                                 **kwargs)
+
+    def file(self, *args, **kwargs):
+
+        if len(args) == 1 and callable(args[0]) and len(kwargs) == 0:
+            self.add_file_endpoint(args[0])
+            return args[0]
+
+        def inner(clb):
+            return self.add_file_endpoint(clb, **kwargs)
+
+        return inner
+
 
 class Endpoint:
 
     def __init__(self, clb, config):
+        # Under ASGI too endpoints run in a worker thread, see
+        # Application.asgi
+        if iscoroutinefunction(clb):
+            raise TypeError(f"endpoint {clb.__name__} can't be async def")
+
         self._clb = clb
         self._config = config
+        # CachePolicys purged whenever this (write) endpoint succeeds
+        self._invalidates = list(config['invalidates'] or [])
 
     def __call__(self, *args, **kwargs):
-        try:
-            return self._clb(*args, **kwargs)
+        with translate_errors():
+            ret = self._clb(*args, **kwargs)
 
-        except ValidationError as exc:
-            logger.error("inner json validation failed", {
-                "error": str(exc),
-            })
+        self._invalidate(ret)
+        return ret
 
-            raise internal_server_error(
-                "Bad JSON", "inner service producded invalid json")
+    def _invalidate(self, ret):
+        if isinstance(ret, ResponseException):
+            return
 
-        except TokenError as exc:
-            raise forbidden(f"invalid token {exc}")
+        for policy in self._invalidates:
+            policy.invalidate()
 
-        except ClientError as exc:
-            logger.error("attempted inner call to client failed", {
-                "error": str(exc),
-            })
 
-            raise internal_server_error(
-                "Call Failed", "attempted call to inner service failed")
+@contextmanager
+def translate_errors():
+    try:
+        yield
 
-        except peewee.PeeweeException as exc:
-            logger.error("DB I/O failed", {
-                "error": str(exc),
-            })
+    except ValidationError as exc:
+        logger.error("inner json validation failed", {
+            "error": str(exc),
+        })
+
+        raise internal_server_error(
+            "Bad JSON", "inner service producded invalid json")
+
+    except TokenError as exc:
+        raise forbidden(f"invalid token {exc}")
 
-            raise internal_server_error("DB I/O Failed", str(exc))
+    except ClientError as exc:
+        logger.error("attempted inner call to client failed", {
+            "error": str(exc),
+        })
 
+        raise internal_server_error(
+            "Call Failed", "attempted call to inner service failed")
+
+    except peewee.PeeweeException as exc:
+        logger.error("DB I/O failed", {
+            "error": str(exc),
+        })
+
+        raise internal_server_error("DB I/O Failed", str(exc))
+
+
+def metrics_exposition():
+    return bytes(registry.exposition(), encoding='utf8')
+
+
+def log_background_error(fn, exc):
+    logger.error("deferred task failed", {
+        "task": getattr(fn, '__qualname__', repr(fn)),
+        "error": str(exc),
+    })
+
+
+def log_validation_violation(schema, direction, exc):
+    logger.error("sampled json validation failed", {
+        "schema": schema.__name__,
+        "direction": direction,
+        "error": str(exc),
+    })
 
 
 def make_endpoint_kwargs(config):
@@ -194,7 +524,11 @@ def make_endpoint_kwargs(config):
     if config['require_user_id']:
         url_param_args.append(UrlParamArg("user_id", user_id_sanity))
     if config['require_login_id']:
-        url_param_args.append(UrlParamArg("login_id", login_id_sanity))
+        sanity = login_id_sanity
+        if config['login_id_whitelist']:
+            sanity = partial(whitelisted_login_id_sanity,
+                             frozenset(config['login_id_whitelist']))
+        url_param_args.append(UrlParamArg("login_id", sanity))
 
     for param_arg in (config['param_args'] or []):
         url_param_args.append(param_arg)
@@ -202,6 +536,15 @@ def make_endpoint_kwargs(config):
     if config['req_transformer'] is None and config['raw_body']:
         config['req_transformer'] = raw_request
 
+    # etag=True hashes the response body, a callable taking the callback's
+    # arguments returns a cheap version key instead and lets 304s skip the
+    # callback entirely.
+    etag = None
+    if callable(config['etag']):
+        etag = ETag(version=config['etag'])
+    elif config['etag']:
+        etag = ETag()
+
     return {
         'pass_context': config['pass_context'],
         'path_parts': config['path_parts'],
@@ -210,6 +553,16 @@ def make_endpoint_kwargs(config):
         'url_param_args': url_param_args,
         'pass_query': config['pass_query'],
         'req_body_transform': config['req_transformer'],
+        'max_body_size': config['max_body_size'],
+        'stream_body': config['stream_body'],
+        'spool_threshold': config['spool_threshold'],
+        'etag': etag,
+        'cache': config['cache'],
+        'coalesce': SingleFlight() if config['coalesce'] else None,
+        'max_concurrency': config['max_concurrency'],
+        'max_queue_ms': config['max_queue_ms'],
+        'priority': config['priority'],
+        'retry_after': RETRY_AFTER,
     }
 
 
@@ -235,65 +588,28 @@ class DefaultResponse:
                 'Bad Callback', 'unrecognised return type from callback')
 
 
-class PathMatcher:
-    pass
-
-
-class PathExact(PathMatcher):
-
-    def __init__(self, path, methods=None, ignore_case=True):
-        self._methods = methods
-        if ignore_case:
-            self._path = path.lower()
-        else:
-            self._path = path
-        self._ignore_case = ignore_case
-
-    def __call__(self, req):
-        if self._methods and req.method not in self._methods:
-            return False
-
-        if self._ignore_case:
-            return req.path.lower() == self._path
-        else:
-            return req.path == self._path
-
-
-def PathPrefix(PathMatcher):
-
-    def __init__(self, path_prefix, methods=None, ignore_case=True):
-        self._methods = methods
-        if ignore_case:
-            self._path_prefix = path_prefix.lower()
-        else:
-            self._path_prefix = path_prefix
-        self._ignore_case = ignore_case
-
-    def __call__(self, req):
-        if self._methods and req.method not in self._methods:
-            return False
-
-        if self._ignore_case:
-            return req.path.lower().startswith(self._path_prefix)
-        else:
-            return req.path.startswith(self._path_prefix)
-
-
 def raw_request(_, body):
     return body
 
 
 class JSONRequest:
 
-    def __init__(self, schema):
+    def __init__(self, schema, coerce=False, records=False):
         self._schema = schema
+        # Whether the handler is passed parsed values, see doolally.parser
+        self._coerce = coerce
+        # Whether the handler is passed records rather than dicts, see
+        # doolally.record_class
+        self._records = records
+        if records:
+            # Generated at startup, along with those of nested schemas,
+            # so a schema records can't be made of fails here
+            record_class(schema)
 
     def __call__(self, err, body):
+        # Always validated, see lib.validation.decode
         try:
-            body = js.loads(body)
-            validate_json(body, self._schema)
-
-            return body
+            return decode_json(body, self._schema, self._coerce, self._records)
 
         except js.JSONDecodeError as exc:
             raise err(f"couldn't deserialize JSON {exc}")
@@ -310,14 +626,14 @@ class JSONResponse(DefaultResponse):
 
     def __call__(self, resp, ret):
         try:
-            validate_json(ret, self._schema)
+            body = encode_json(ret, self._schema)
 
             headers = [
                 ("Content-Type", "application/json"),
             ]
 
             resp.set_header(self._status, headers)
-            resp.set_content_str(js.dumps(ret))
+            resp.set_content_bytes(body)
 
         except ValidationError as exc:
             raise internal_server_error("Invalid Response Payload", str(exc))
@@ -339,6 +655,29 @@ class HTMLResponse(DefaultResponse):
         resp.set_content_str(ret)
 
 
+class FileResponse(DefaultResponse):
+    """
+    FileResponse sends a file from disk without reading it into memory.
+    The callback returns a path or an open binary file, optionally paired
+    with a content type as a (file, content_type) tuple.
+    """
+
+    def __call__(self, resp, ret):
+        content_type = self._content_type
+        if isinstance(ret, tuple):
+            ret, content_type = ret
+
+        if isinstance(ret, (str, PurePath)):
+            content_type = content_type or mimetypes.guess_type(str(ret))[0]
+            try:
+                ret = open(ret, 'rb')
+            except (FileNotFoundError, IsADirectoryError):
+                raise not_found()
+
+        content_type = content_type or 'application/octet-stream'
+        resp.send_file(ret, self._status, [('Content-Type', content_type)])
+
+
 def session_id_sanity(err, value):
     if not is_hexstring(value) or len(value) != 32:
         raise err("invalid session id")
@@ -352,3 +691,19 @@ def user_id_sanity(err, value):
 def login_id_sanity(err, value):
     if not is_hexstring(value) or len(value) != 32:
         raise err("invalid login id")
+
+
+def profile_seconds_sanity(err, value):
+    try:
+        seconds = float(value)
+    except ValueError:
+        raise err("seconds must be a number")
+
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise err(f"seconds must be in (0, {MAX_PROFILE_SECONDS}]")
+
+
+def whitelisted_login_id_sanity(whitelist, err, value):
+    login_id_sanity(err, value)
+    if value not in whitelist:
+        raise forbidden("login id not allowed for this endpoint")
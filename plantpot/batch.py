@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import contextvars
+import json as js
+import os
+import sys
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from threading import Lock
+from urllib.parse import urlencode
+
+from framework import bad_request
+
+BATCH_PATH = os.environ.get('PLANTPOT_BATCH_PATH', '/_batch')
+BATCH_MAX_REQUESTS = int(os.environ.get('PLANTPOT_BATCH_MAX_REQUESTS', '20'))
+BATCH_WORKERS = int(os.environ.get('PLANTPOT_BATCH_WORKERS', '4'))
+
+# Headers which describe the batch request itself rather than the
+# requests inside it.
+EXCLUDED_HEADERS = frozenset([
+    'ACCEPT_ENCODING',
+    'IF_NONE_MATCH',
+    'IF_MATCH',
+    'IF_RANGE',
+    'RANGE',
+])
+
+
+class Batch:
+    """
+    Batch is the callback behind the /_batch endpoint. Each sub-request is
+    run through the application's endpoint table in process, with its own
+    status, headers and errors, and the responses are returned in order.
+    Sub-requests inherit the batch request's headers and trace context.
+
+    Independent sub-requests can be run concurrently on a small thread pool
+    by setting "concurrent" in the batch.
+    """
+
+    def __init__(self,
+                 app,
+                 path=BATCH_PATH,
+                 max_requests=BATCH_MAX_REQUESTS,
+                 workers=BATCH_WORKERS):
+        self._app = app
+        self._path = path.lower()
+        self._max_requests = max_requests
+        self._workers = workers
+        self._pool = None
+        self._lock = Lock()
+
+    def __call__(self, ctx, body, *headers):
+        requests = body['requests']
+        if len(requests) > self._max_requests:
+            raise bad_request(
+                "Batch Too Large",
+                f"at most {self._max_requests} requests per batch")
+
+        base = {
+            'casket.trace_ctx': ctx,
+            'wsgi.errors': sys.stderr,
+            'wsgi.url_scheme': 'http',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+        }
+        for (name, value) in headers:
+            if name not in EXCLUDED_HEADERS:
+                base['HTTP_' + name] = value
+
+        environs = [self.environ(base, sub_req) for sub_req in requests]
+        if body.get('concurrent') and len(environs) > 1:
+            # Each sub-request runs in a copy of this context, so context
+            # variables such as the deferred tasks list carry over
+            pool = self.pool()
+            futures = [
+                pool.submit(contextvars.copy_context().run, self.run, environ)
+                for environ in environs
+            ]
+            responses = [future.result() for future in futures]
+        else:
+            responses = [self.run(environ) for environ in environs]
+
+        return dict(responses=responses)
+
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self._workers,
+                        thread_name_prefix='plantpot-batch')
+
+        return self._pool
+
+    @staticmethod
+    def environ(base, sub_req):
+        environ = dict(base)
+        environ['REQUEST_METHOD'] = sub_req['method']
+        environ['PATH_INFO'] = sub_req['path']
+        environ['QUERY_STRING'] = urlencode(sub_req.get('query') or {},
+                                            doseq=True)
+
+        body = sub_req.get('body')
+        if body is None:
+            body = b''
+        elif isinstance(body, str):
+            environ['CONTENT_TYPE'] = 'text/plain; encoding=UTF-8'
+            body = bytes(body, encoding='utf8')
+        else:
+            environ['CONTENT_TYPE'] = 'application/json'
+            body = bytes(js.dumps(body), encoding='utf8')
+
+        environ['CONTENT_LENGTH'] = str(len(body))
+        environ['wsgi.input'] = BytesIO(body)
+        return environ
+
+    def run(self, environ):
+        if environ['PATH_INFO'].lower() == self._path:
+            return sub_response("400 Nested Batch", [], b'')
+
+        try:
+            req, resp = self._app.dispatch(environ)
+            body_iter = resp.bytes_iter()
+            try:
+                body = b''.join(body_iter)
+            finally:
+                if hasattr(body_iter, 'close'):
+                    body_iter.close()
+                req.close()
+
+        except Exception as exc:
+            # One broken sub-request mustn't take the rest down with it
+            headers = [("X-Error", f"{str(type(exc))} - {exc}")]
+            return sub_response("500 Application Crashed", headers, b'')
+
+        return sub_response(resp.status, resp.headers, body)
+
+
+def sub_response(status, headers, body):
+    """
+    sub_response builds the entry for one sub-request's response. Headers
+    are kept as [name, value] pairs as a name may repeat. JSON bodies are
+    decoded, other bodies are sent as text or, when they aren't UTF-8,
+    base64 encoded with bodyBase64 set.
+
+    >>> sub_response("200 Ok", [("Set-Cookie", "a=1"), ("Set-Cookie", "b=2")],
+    ...              b"\\xff\\x00")
+    ... # doctest: +NORMALIZE_WHITESPACE
+    {'status': 200, 'statusText': 'Ok',
+     'headers': [['Set-Cookie', 'a=1'], ['Set-Cookie', 'b=2']],
+     'body': '/wA=', 'bodyBase64': True}
+    """
+    code, _, status_text = status.partition(' ')
+    headers = [[name, value] for (name, value) in headers]
+
+    content_type = ''
+    for (name, value) in headers:
+        if name.lower() == 'content-type':
+            content_type = value
+
+    body_base64 = False
+    if not body:
+        body = None
+    elif content_type.startswith('application/json'):
+        body = js.loads(body)
+    else:
+        try:
+            body = str(body, encoding='utf8')
+        except UnicodeDecodeError:
+            body = str(b64encode(body), encoding='ascii')
+            body_base64 = True
+
+    return {
+        "status": int(code),
+        "statusText": status_text,
+        "headers": headers,
+        "body": body,
+        "bodyBase64": body_base64,
+    }
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from lib.metrics import registry
+
+REQUESTS = registry.counter(
+    'plantpot_requests_total', 'requests handled by route and status')
+REQUEST_SECONDS = registry.histogram(
+    'plantpot_request_duration_seconds', 'time to handle requests by route')
+IN_FLIGHT = registry.gauge(
+    'plantpot_requests_in_flight', 'requests being handled by route')
+CACHE_LOOKUPS = registry.counter(
+    'plantpot_cache_lookups_total',
+    'response cache lookups by route and result')
+COLLAPSED = registry.counter(
+    'plantpot_requests_collapsed_total',
+    'requests given the response of an identical request by route')
+REJECTED = registry.counter(
+    'plantpot_requests_rejected_total',
+    'requests turned away by admission control by route and priority')
+BACKGROUND_TASKS = registry.counter(
+    'plantpot_background_tasks_total', 'deferred tasks by outcome')
+
+# Requests which didn't match any route
+UNMATCHED = '<unmatched>'
+
+
+class RequestMetrics:
+    """
+    RequestMetrics records the requests an Application handles into the
+    process wide registry, labelled with the service name. Along with the
+    requests it records cache lookups, collapsed and rejected requests, and
+    the outcome of background tasks. The stats methods on Plantpot give
+    the same for a single process.
+    """
+
+    def __init__(self, service):
+        self.service = service
+
+    def started(self, route):
+        IN_FLIGHT.inc(service=self.service, route=route)
+
+    def stopped(self, route):
+        IN_FLIGHT.dec(service=self.service, route=route)
+
+    def observe(self, route, method, status, seconds):
+        route = route or UNMATCHED
+        REQUESTS.inc(service=self.service,
+                     route=route,
+                     method=method,
+                     status=status.split(' ', 1)[0])
+        REQUEST_SECONDS.observe(seconds, service=self.service, route=route)
+
+    def cache_lookup(self, route, hit):
+        CACHE_LOOKUPS.inc(service=self.service,
+                          route=route,
+                          result='hit' if hit else 'miss')
+
+    def collapsed(self, route):
+        COLLAPSED.inc(service=self.service, route=route)
+
+    def rejected(self, route, priority):
+        REJECTED.inc(service=self.service, route=route, priority=priority)
+
+    def task(self, outcome):
+        BACKGROUND_TASKS.inc(service=self.service, outcome=outcome)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from lib.doolally import (
+    Schema,
+    Any,
+    Bool,
+    Number,
+    String,
+    StringEnum,
+    StaticTypeArray,
+    SchemaLessObject,
+)
+
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE"}
+
+
+class SubRequest(Schema):
+    jsonschema_description = "a request dispatched within a batch"
+
+    method = StringEnum(required=True, whitelist=METHODS)
+    path = String(required=True, min_length=1, description="request path")
+    query = SchemaLessObject(
+        description="query parameters, a string or array of strings each")
+    body = Any(description="string bodies are sent as is, others as JSON")
+
+
+class SubResponse(Schema):
+    jsonschema_description = "the response to a single batched request"
+
+    status = Number(required=True, is_int=True, signed=False)
+    status_text = String(required=True)
+    headers = StaticTypeArray(
+        required=True,
+        element_field=StaticTypeArray(min_length=2,
+                                      max_length=2,
+                                      element_field=String()),
+        description="[name, value] pairs, a name may repeat")
+    body = Any(required=True,
+               description="JSON bodies are decoded, others sent as text")
+    body_base64 = Bool(required=True,
+                       description="body isn't UTF-8, it is sent base64 encoded")
+
+
+class BatchReq(Schema):
+    jsonschema_description = "requests to dispatch in one round trip"
+
+    requests = StaticTypeArray(required=True,
+                               min_length=1,
+                               element_field=SubRequest())
+    concurrent = Bool(description="run the requests concurrently")
+
+
+class BatchResp(Schema):
+    jsonschema_description = "responses in the order they were requested"
+
+    responses = StaticTypeArray(required=True, element_field=SubResponse())
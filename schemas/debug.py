@@ -0,0 +1,19 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from lib.doolally import Schema, Number, String, SchemaLessObject
+
+
+class TimingsResp(Schema):
+    jsonschema_description = "latency histograms per route and phase"
+
+    routes = SchemaLessObject(
+        required=True,
+        description="route -> phase -> count, mean and percentiles in us")
+
+
+class ProfileRequestsReq(Schema):
+    jsonschema_description = "profile the next requests to a route"
+
+    route = String(required=True, min_length=1, description="endpoint path")
+    requests = Number(required=True, is_int=True, min_value=1)
@@ -2,24 +2,47 @@
 # -*- coding: utf-8 -*-
 
 import re
-from datetime import datetime
+from datetime import date, datetime, time
 from urllib.parse import urlparse
 
-from lib import is_hexstring
+from lib.doolally import bulk_charset, parser
 
 
 DOMAIN_REGEX = re.compile('^[A-Za-z0-9-]')
 NAME_REGEX = re.compile('^[A-Za-z0-9-\.]')
 
+# The usual forms of dates and times, anything else is left to strptime
+JAVASCRIPT_DATE_REGEX = re.compile('([0-9]{4})-([0-9]{2})-([0-9]{2})')
+TIME_REGEX = re.compile('([0-9]{2}):([0-9]{2})')
 
+
+@parser
+@bulk_charset("0123456789abcdefABCDEF", multiple=2)
 def hexstring_val(ctx_err, value):
-    if not is_hexstring(value):
+    # fromhex skips whitespace, which the length catches
+    try:
+        parsed = bytes.fromhex(value)
+    except ValueError:
+        raise ctx_err("expected hexstring") from None
+
+    if len(parsed) * 2 != len(value):
         raise ctx_err("expected hexstring")
 
+    return parsed
 
+
+@parser
 def javascript_date_val(ctx_err, value):
+    match = JAVASCRIPT_DATE_REGEX.fullmatch(value)
+    if match:
+        try:
+            return date(*map(int, match.groups()))
+        except ValueError:
+            # strptime has the error
+            pass
+
     try:
-        datetime.strptime(value, "%Y-%m-%d")
+        return datetime.strptime(value, "%Y-%m-%d").date()
     except Exception as exc:
         raise ctx_err(str(exc))
 
@@ -31,9 +54,18 @@ def date_val(ctx_err, value):
         raise ctx_err(str(exc))
 
 
+@parser
 def time_val(ctx_err, value):
+    match = TIME_REGEX.fullmatch(value)
+    if match:
+        try:
+            return time(*map(int, match.groups()))
+        except ValueError:
+            # strptime has the error
+            pass
+
     try:
-        datetime.strptime(value, "%H:%M")
+        return datetime.strptime(value, "%H:%M").time()
     except Exception as exc:
         raise ctx_err(str(exc))
 
@@ -69,9 +101,10 @@ def phone_val(ctx_err, value):
             raise ctx_err("invalid character in phone number")
 
 
+@parser
 def isotimestamp_val(ctx_err, value):
     try:
-        datetime.fromisoformat(value)
+        return datetime.fromisoformat(value)
     except Exception as exc:
         raise ctx_err(str(exc))
 
@@ -2,14 +2,20 @@
 # -*- coding: utf-8 -*-
 
 import os
+import shutil
 from pathlib import Path
 
 from plantpot import Plantpot, bad_request
 from clients.monstermac import sha256_monstermac
 from schemas.blobs import InsertBlobResp
-from lib.tokens import CONTENT_TYPES
+from lib.tokens import CONTENT_TYPES, read_blob_token
 
 BLOBS_DIR = Path(os.environ.get('PLANTPOT_BLOBS_DIR', '/blobs')).absolute()
+MAX_BLOB_SIZE = int(
+    os.environ.get('PLANTPOT_BLOBS_MAX_SIZE', str(16 * 1024 * 1024)))
+BLOB_TOKEN_KEY_PATH = os.environ.get('PLANTPOT_BLOB_TOKEN_KEY_PATH',
+                                     '/run/secrets/blobtokenkey')
+BLOB_TOKEN_KEY = open(BLOB_TOKEN_KEY_PATH, 'rb').read()
 
 app = Plantpot('blobs')
 
@@ -19,6 +25,8 @@ app = Plantpot('blobs')
     pass_content_type=True,
     methods=['POST'],
     raw_body=True,
+    stream_body=True,
+    max_body_size=MAX_BLOB_SIZE,
     resp_status="202 Created",
     resp_schema=InsertBlobResp,
 )
@@ -27,8 +35,11 @@ def insert(body, content_type):
         raise bad_request('Missing Content Type',
                           'Content-Type header must be present')
 
-    if not body:
+    # body is a file object, the blob is streamed rather than held in memory
+    body.seek(0, os.SEEK_END)
+    if not body.tell():
         raise bad_request('Empty Body', 'Body may not be empty')
+    body.seek(0)
 
     extension = CONTENT_TYPES.get(content_type.lower())
     if not extension:
@@ -36,6 +47,7 @@ def insert(body, content_type):
                           f'Content-Type: {content_type} unrecognised')
 
     blob_id = sha256_monstermac(body)[:24].hex()
+    body.seek(0)
 
     write(blob_id, extension, body)
 
@@ -44,12 +56,32 @@ def insert(body, content_type):
     }
 
 
+def blob_token(path):
+    # /blobs/<blob token>, see lib.tokens.build_blob_token
+    return path[len('/blobs/'):],
+
+
+@app.file(
+    path_prefix='/blobs/',
+    methods=['GET'],
+    path_parts=blob_token,
+)
+def read(blob_tk):
+    # Blobs are only served to holders of a token for them, an invalid
+    # token is a 403
+    blob_id, content_type = read_blob_token(blob_tk, BLOB_TOKEN_KEY)
+    return blob_path(blob_id, CONTENT_TYPES[content_type]), content_type
+
+
+def blob_path(blob_id, extension):
+    return BLOBS_DIR / blob_id[:2] / (blob_id[2:] + '.' + extension)
+
+
 def write(blob_id, extension, blob):
     dir = BLOBS_DIR / blob_id[:2]
 
     if not dir.is_dir():
         dir.mkdir()
 
-    name = blob_id[2:] + '.' + extension
-    with open(dir / name, 'wb') as file:
-        file.write(blob)
+    with open(blob_path(blob_id, extension), 'wb') as file:
+        shutil.copyfileobj(blob, file)
@@ -12,21 +12,21 @@ app = Plantpot('kvstore')
 @app.json(path="/insert",
           methods=["POST"],
           req_schema=InsertKVValuesReq,
+          coerce=True,
+          records=True,
           resp_status="202 Created")
 def insert(body):
     now = datetime.now()
 
-    for v in body['values']:
-        expiry_time = datetime.fromtimestamp(v['expiryTime'])
+    for v in body.values:
+        expiry_time = datetime.fromtimestamp(v.expiry_time)
         if expiry_time < now + timedelta(seconds=5):
             raise bad_request("Bad Expiry Time", "expiry time is in the past")
 
-        xor_key = bytes.fromhex(v['xorKey'])
-        key_hash = bytes.fromhex(v['key'])
-
-        ins = Value.insert(key_hash=key_hash,
-                           xor_key=xor_key,
-                           value_str=v['value'],
+        # The keys come parsed to bytes
+        ins = Value.insert(key_hash=v.key,
+                           xor_key=v.xor_key,
+                           value_str=v.value,
                            expiry_time=expiry_time)
         ins.on_conflict_replace().execute()
 
@@ -17,8 +17,8 @@ from clients.rabbitmq import send_email as rabbitmq_send_email
 from lib import xor_encrypt
 from lib.tokens import build_user_token
 from models.tuliptheclown import Contact, Event, Message, Review
-from plantpot import (Plantpot, UrlParamArg, already_created, bad_request,
-                      forbidden)
+from plantpot import (CachePolicy, Plantpot, UrlParamArg, already_created,
+                      bad_request, defer, forbidden)
 from schemas.tuliptheclown import (ContactQueryResp, EventResp, EventsResp,
                                    MessagesResp, NewContactReq, NewContactResp,
                                    NewEventReq, NewEventResp, NewMessageReq,
@@ -26,13 +26,21 @@ from schemas.tuliptheclown import (ContactQueryResp, EventResp, EventsResp,
                                    NewReviewResponseReq)
 from schemas.validators import email_addr_val, phone_val
 
-app = Plantpot('tuliptheclown')
+# The browser fetches the session, contact and events together
+app = Plantpot('tuliptheclown', batch=True)
 
 EMAIL_FILE = os.environ.get("PLANTPOT_TULIPTHECLOWN_EMAIL_FILE",
                             "/run/secrets/tulipemail")
 TULIP_EMAIL = open(EMAIL_FILE).read()
 THROTTLE_TIMEOUT = int(
     os.environ.get('PLANTPOT_TULIPTHECLOWN_THROTTLE_TIMEOUT', "120"))
+REVIEWS_CACHE_TTL = int(
+    os.environ.get('PLANTPOT_TULIPTHECLOWN_REVIEWS_CACHE_TTL', "300"))
+# The admin listings are shed before the public endpoints
+ADMIN_MAX_CONCURRENCY = int(
+    os.environ.get('PLANTPOT_TULIPTHECLOWN_ADMIN_MAX_CONCURRENCY', "2"))
+ADMIN_MAX_QUEUE_MS = int(
+    os.environ.get('PLANTPOT_TULIPTHECLOWN_ADMIN_MAX_QUEUE_MS', "250"))
 
 MESSAGE_EMAIL_TEMPLATE = open('tuliptheclown/message-email').read()
 REVIEWS_TEMPLATE = Template(filename="tuliptheclown/reviews.html")
@@ -46,9 +54,13 @@ LOGIN_IDS = [
     "66b15f1c1f8f7b4fa0bcce9c8408cc1c",
 ]
 
+# The public reviews page only changes when review_response runs
+REVIEWS_CACHE = CachePolicy(ttl=REVIEWS_CACHE_TTL, max_entries=1)
+
 
 @app.json(
     path="/message",
+    priority='high',
     methods=['POST'],
     pass_context=True,
     req_schema=NewMessageReq,
@@ -100,8 +112,14 @@ def new_message(ctx, body, session_id):
         f"gdpr.{contact_type}": body['phoneOrEmail'],
     })
 
-    # Insert into throttle
-    mapping = {session_id: "1", body['phoneOrEmail']: "2"}
+    # The throttle and the email are best effort, they needn't hold up
+    # the response.
+    defer(insert_throttle, ctx, session_id, body['phoneOrEmail'])
+    defer(send_message_email, ctx, body, session_id)
+
+
+def insert_throttle(ctx, session_id, phone_or_email):
+    mapping = {session_id: "1", phone_or_email: "2"}
     try:
         kv_insert(ctx, 'tuliptheclown.contact', mapping, THROTTLE_TIMEOUT)
     except ClientError as exc:
@@ -110,7 +128,8 @@ def new_message(ctx, body, session_id):
                 "error": str(exc),
             })
 
-    # send email
+
+def send_message_email(ctx, body, session_id):
     try:
         rabbitmq_send_email(ctx,
                             TULIP_EMAIL,
@@ -124,6 +143,9 @@ def new_message(ctx, body, session_id):
 
 @app.json(
     path="/messages",
+    priority='low',
+    max_concurrency=ADMIN_MAX_CONCURRENCY,
+    max_queue_ms=ADMIN_MAX_QUEUE_MS,
     methods=['GET'],
     require_login_id=True,
     resp_schema=MessagesResp,
@@ -219,6 +241,7 @@ def new_contact(body, login_id):
     methods=['POST'],
     require_login_id=True,
     req_schema=NewEventReq,
+    coerce=True,
     resp_schema=NewEventResp,
     resp_status="202 Created",
 )
@@ -230,9 +253,10 @@ def new_event(body, login_id):
 
     event_id = os.urandom(16)
     contact_id = bytes.fromhex(contact_id)
-    date = datetime.strptime(body['date'], "%Y-%m-%d")
-    start_time = datetime.strptime(body['startTime'], "%H:%M")
-    end_time = datetime.strptime(body['endTime'], "%H:%M")
+    # The date and times come parsed
+    date = body['date']
+    start_time = body['startTime']
+    end_time = body['endTime']
 
     if start_time >= end_time:
         raise bad_request("Invalid Time", "end time is before start time")
@@ -322,8 +346,13 @@ def get_event(user_id, event_id):
 
 @app.json(
     path="/events",
+    priority='low',
+    max_concurrency=ADMIN_MAX_CONCURRENCY,
+    max_queue_ms=ADMIN_MAX_QUEUE_MS,
     require_login_id=True,
     resp_schema=EventsResp,
+    etag=True,
+    coalesce=True,
 )
 def get_all_events(login_id):
     if login_id not in LOGIN_IDS:
@@ -389,8 +418,12 @@ def new_review(body, user_id):
 @app.json(
     path="/review",
     methods=['GET'],
+    priority='low',
+    max_concurrency=ADMIN_MAX_CONCURRENCY,
+    max_queue_ms=ADMIN_MAX_QUEUE_MS,
     require_login_id=True,
     resp_schema=ReviewsResp,
+    etag=True,
 )
 def get_all_reviews(login_id):
     if login_id not in LOGIN_IDS:
@@ -432,12 +465,15 @@ def get_all_reviews(login_id):
     methods=['POST'],
     require_login_id=True,
     req_schema=NewReviewResponseReq,
+    coerce=True,
+    invalidates=[REVIEWS_CACHE],
 )
 def review_response(body, login_id):
     if login_id not in LOGIN_IDS:
         raise forbidden("login id not valid")
 
-    review_id = bytes.fromhex(body['reviewId'])
+    # The review id comes parsed to bytes
+    review_id = body['reviewId']
     data = {
         Review.weight: body['weight'],
     }
@@ -450,6 +486,9 @@ def review_response(body, login_id):
 
 @app.html(
     path="/reviews",
+    etag=True,
+    cache=REVIEWS_CACHE,
+    coalesce=True,
 )
 def get_reviews():
     args = (
@@ -488,6 +527,7 @@ def get_reviews():
 
 @app.html(
     path="/login",
+    priority='high',
     pass_context=True,
 )
 def login(ctx):
@@ -0,0 +1,11 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from framework import Application
+
+
+@pytest.fixture
+def app():
+    return Application("tests")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Helpers for running requests through a WSGI application in tests.
+"""
+
+import io
+import time
+
+from framework import Headers
+
+
+class Served:
+    """
+    Served is what a WSGI application responded with, the body joined up.
+    """
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def code(self):
+        return int(self.status.split(" ", 1)[0])
+
+    def header(self, name, default=None):
+        for (k, v) in self.headers:
+            if k.lower() == name.lower():
+                return v
+
+        return default
+
+
+def make_environ(method, path, query="", headers=None, body=b"", extra=None):
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": io.StringIO(),
+        "casket.trace_ctx": None,
+    }
+    for (name, value) in (headers or {}).items():
+        environ[Headers.environ_key(name)] = value
+    environ.update(extra or {})
+
+    return environ
+
+
+def serve(app, method, path, **kwargs):
+    started = []
+
+    def start_response(status, headers):
+        started.append((status, headers))
+
+    body_iter = app(make_environ(method, path, **kwargs), start_response)
+    try:
+        body = b"".join(body_iter)
+    finally:
+        if hasattr(body_iter, 'close'):
+            body_iter.close()
+
+    status, headers = started[0]
+    return Served(status, headers, body)
+
+
+def text_response(resp, ret):
+    resp.set_header("200 Ok", [("Content-Type", "text/plain")])
+    resp.set_content_bytes(ret)
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.001)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+
+import pytest
+
+from framework import Admission, Application, Limiter, PathExact
+from framework.admission import Rejected
+from helpers import serve, text_response, wait_for
+
+
+class Blocking:
+    """
+    Blocking holds requests inside the endpoint until released.
+    """
+
+    def __init__(self):
+        self.entered = threading.Semaphore(0)
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.entered.release()
+        self.release.wait(5)
+        return b"done"
+
+    def hold(self, app, path, count=1):
+        threads = [threading.Thread(target=serve, args=(app, "GET", path))
+                   for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for _ in threads:
+            assert self.entered.acquire(timeout=5)
+        return threads
+
+    def finish(self, threads):
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+
+
+def test_endpoint_limit_rejects_with_retry_after(app):
+    blocking = Blocking()
+    endpoint = app.add_endpoint(PathExact("/slow"), blocking, text_response,
+                                max_concurrency=1, retry_after=7)
+
+    threads = blocking.hold(app, "/slow")
+    rejected = serve(app, "GET", "/slow")
+    blocking.finish(threads)
+
+    assert rejected.code == 503
+    assert rejected.header("Retry-After") == "7"
+    assert serve(app, "GET", "/slow").code == 200
+    assert endpoint.limiter.stats()['rejected'] == 1
+    assert endpoint.limiter.stats()['in_flight'] == 0
+
+
+def test_queued_request_is_admitted_when_a_slot_frees(app):
+    blocking = Blocking()
+    endpoint = app.add_endpoint(PathExact("/slow"), blocking, text_response,
+                                max_concurrency=1, max_queue_ms=5000)
+
+    threads = blocking.hold(app, "/slow")
+    queued = []
+    waiter = threading.Thread(
+        target=lambda: queued.append(serve(app, "GET", "/slow")))
+    waiter.start()
+    wait_for(lambda: endpoint.limiter.stats()['queued'] == 1)
+    blocking.finish(threads)
+    waiter.join(5)
+
+    assert [s.code for s in queued] == [200]
+
+
+def test_queued_request_is_rejected_after_max_queue_ms():
+    limiter = Limiter(max_concurrency=1, max_queue_ms=10)
+    limiter.acquire()
+
+    with pytest.raises(Rejected):
+        limiter.acquire()
+
+    limiter.release()
+    assert limiter.stats()['queued'] == 0
+
+
+def test_low_priority_is_shed_first():
+    admission = Admission(4)
+    app = Application("tests", admission=admission)
+    blocking = Blocking()
+    for (path, priority) in (("/low", "low"), ("/high", "high")):
+        app.add_endpoint(PathExact(path), blocking, text_response,
+                         priority=priority)
+
+    # low may fill half the capacity
+    threads = blocking.hold(app, "/low", 2)
+    low = serve(app, "GET", "/low")
+    threads += blocking.hold(app, "/high")
+    blocking.finish(threads)
+
+    assert low.code == 503
+    assert admission.stats()['rejected'] == {'high': 0, 'normal': 0, 'low': 1}
+    assert admission.stats()['in_flight'] == 0
+
+
+def test_crashing_endpoint_frees_its_slot(app):
+    def crash():
+        raise RuntimeError("boom")
+
+    endpoint = app.add_endpoint(PathExact("/crash"), crash, text_response,
+                                max_concurrency=1)
+
+    assert serve(app, "GET", "/crash").code == 500
+    assert serve(app, "GET", "/crash").code == 500
+    assert endpoint.limiter.stats()['in_flight'] == 0
+
+
+def test_unknown_priority():
+    with pytest.raises(ValueError):
+        Limiter(priority='urgent')
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import contextvars
+import threading
+
+import pytest
+
+from framework import Application, BackgroundPool, PathExact, defer
+from helpers import make_environ, text_response, wait_for
+
+request_id = contextvars.ContextVar('request_id', default=None)
+
+
+def wait_until_idle(pool):
+    def idle():
+        stats = pool.stats()
+        return stats['submitted'] == \
+            stats['completed'] + stats['failed'] + stats['dropped']
+
+    wait_for(idle)
+
+
+@pytest.fixture
+def pool():
+    return BackgroundPool(workers=1, on_error=lambda fn, exc: None)
+
+
+@pytest.fixture
+def ran():
+    return []
+
+
+@pytest.fixture
+def deferring_app(pool, ran):
+    app = Application("tests", background=pool)
+
+    def clb():
+        request_id.set("abc")
+        defer(lambda: ran.append(request_id.get()))
+        return b"sent"
+
+    app.add_endpoint(PathExact("/defer"), clb, text_response)
+    return app
+
+
+def test_deferred_tasks_run_after_the_response_is_sent(
+        deferring_app, pool, ran):
+    body_iter = deferring_app(make_environ("GET", "/defer"),
+                              lambda status, headers: None)
+
+    assert b"".join(body_iter) == b"sent"
+    wait_until_idle(pool)
+    assert ran == []
+
+    body_iter.close()
+    wait_until_idle(pool)
+    assert ran == ["abc"]
+
+
+def test_failed_task_is_counted():
+    errors = []
+    pool = BackgroundPool(workers=1,
+                          on_error=lambda fn, exc: errors.append(exc))
+
+    def fail():
+        raise RuntimeError("boom")
+
+    pool.submit(fail)
+    wait_until_idle(pool)
+
+    assert [str(e) for e in errors] == ["boom"]
+    assert pool.stats()['failed'] == 1
+
+
+@pytest.mark.parametrize("overflow, ran_inline, dropped", [
+    ("drop", False, 1),
+    ("run", True, 0),
+])
+def test_overflow(overflow, ran_inline, dropped):
+    pool = BackgroundPool(workers=1, max_queue=1, overflow=overflow)
+    busy, release = threading.Event(), threading.Event()
+    inline = []
+
+    def block():
+        busy.set()
+        release.wait(5)
+
+    pool.submit(block)
+    assert busy.wait(5)
+    # Fills the queue, the next task overflows
+    pool.submit(lambda: None)
+    pool.submit(lambda: inline.append(threading.current_thread()))
+    release.set()
+    wait_until_idle(pool)
+
+    assert (inline == [threading.current_thread()]) is ran_inline
+    assert pool.stats()['dropped'] == dropped
+
+
+def test_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        BackgroundPool(overflow='block')
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from framework import ErrorResponse, PathExact, PathPrefix, bad_request, defer
+from framework.background import start_request, end_request
+from plantpot.batch import Batch
+from helpers import text_response
+
+
+def crash(invalid_payload, body):
+    raise RuntimeError("transform blew up")
+
+
+@pytest.fixture
+def batch(app):
+    def hello(**query):
+        return bytes(f"hello {query['name'][0]}", encoding='utf8')
+
+    def refuse():
+        raise bad_request("Refused", "not today")
+
+    def echo(body):
+        return body
+
+    def later():
+        defer(lambda: None)
+        return b"later"
+
+    app.add_endpoint(PathExact("/hello", methods=["GET"]), hello,
+                     text_response, pass_query=True)
+    app.add_endpoint(PathExact("/refuse"), refuse, text_response)
+    app.add_endpoint(PathExact("/echo", methods=["POST"]), echo,
+                     text_response, req_body_transform=lambda inv, b: b)
+    app.add_endpoint(PathExact("/crash", methods=["POST"]), echo,
+                     text_response, req_body_transform=crash)
+    app.add_endpoint(PathPrefix("/later"), later, text_response)
+    return Batch(app)
+
+
+def run(batch, requests, concurrent=False, headers=()):
+    body = {"requests": requests, "concurrent": concurrent}
+    return [(r["status"], r["body"])
+            for r in batch(None, body, *headers)["responses"]]
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_failures_stay_with_their_sub_request(batch, concurrent):
+    responses = run(batch, [
+        {"method": "GET", "path": "/hello", "query": {"name": "a"}},
+        {"method": "GET", "path": "/refuse"},
+        {"method": "GET", "path": "/missing"},
+        {"method": "POST", "path": "/crash", "body": "x"},
+        {"method": "DELETE", "path": "/hello"},
+        {"method": "GET", "path": "/hello", "query": {"name": "b"}},
+    ], concurrent=concurrent)
+
+    assert responses == [
+        (200, "hello a"),
+        (400, None),
+        (404, None),
+        (500, None),
+        (405, None),
+        (200, "hello b"),
+    ]
+
+
+def test_failed_sub_request_reports_its_error(batch):
+    body = {"requests": [
+        {"method": "GET", "path": "/refuse"},
+        {"method": "POST", "path": "/crash", "body": "x"},
+    ]}
+
+    refused, crashed = batch(None, body)["responses"]
+
+    assert ["X-Error", "not today"] in refused["headers"]
+    assert crashed["statusText"] == "Application Crashed"
+    assert "transform blew up" in dict(crashed["headers"])["X-Error"]
+
+
+def test_bodies_are_passed_through(batch):
+    assert run(batch, [
+        {"method": "POST", "path": "/echo", "body": "text"},
+        {"method": "POST", "path": "/echo", "body": {"a": 1}},
+    ]) == [(200, "text"), (200, '{"a": 1}')]
+
+
+def test_nested_batch_is_refused(batch):
+    assert run(batch, [{"method": "POST", "path": "/_BATCH"}]) == \
+        [(400, None)]
+
+
+def test_too_many_requests_are_refused(app):
+    batch = Batch(app, max_requests=1)
+    requests = [{"method": "GET", "path": "/missing"}] * 2
+
+    with pytest.raises(ErrorResponse) as info:
+        run(batch, requests)
+
+    assert info.value.args == ("400 Batch Too Large", )
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_deferred_tasks_join_the_batch_request(batch, concurrent):
+    token = start_request()
+    try:
+        run(batch, [{"method": "GET", "path": "/later"}] * 3,
+            concurrent=concurrent)
+    finally:
+        deferred = end_request(token)
+
+    assert len(deferred) == 3
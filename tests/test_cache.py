@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from framework import (
+    CachePolicy,
+    PathExact,
+    Request,
+    Response,
+    SharedGenerations,
+    bad_request,
+)
+from framework import cache as cache_module
+from helpers import make_environ, serve, text_response
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module, "monotonic", lambda: now[0])
+    return now
+
+
+def cached_app(app, policy, body=b"hello"):
+    calls = []
+
+    def clb(**query):
+        calls.append(query)
+        return body
+
+    app.add_endpoint(PathExact("/hello"), clb, text_response,
+                     pass_query=True, cache=policy)
+    return calls
+
+
+def populated(method="GET", path="/hello", status="200 Ok", body=b"hi"):
+    req = Request.from_environ(make_environ(method, path))
+    resp = Response(req)
+    resp.set_header(status, [])
+    resp.set_content_bytes(body)
+    return req, resp
+
+
+def test_hit_skips_the_callback(app):
+    policy = CachePolicy(ttl=60)
+    calls = cached_app(app, policy)
+
+    first = serve(app, "GET", "/hello")
+    second = serve(app, "GET", "/hello")
+
+    assert first.body == second.body == b"hello"
+    assert len(calls) == 1
+    assert policy.stats()["hits"] == 1
+
+
+def test_vary_on_splits_entries(app):
+    policy = CachePolicy(ttl=60, vary_on=["page"])
+    calls = cached_app(app, policy)
+
+    serve(app, "GET", "/hello", query="page=1")
+    serve(app, "GET", "/hello", query="page=2")
+    serve(app, "GET", "/hello", query="page=1&other=x")
+
+    assert [c["page"] for c in calls] == [["1"], ["2"]]
+
+
+def test_entries_expire(app, clock):
+    calls = cached_app(app, CachePolicy(ttl=60))
+
+    serve(app, "GET", "/hello")
+    clock[0] += 59
+    serve(app, "GET", "/hello")
+    clock[0] += 1
+    serve(app, "GET", "/hello")
+
+    assert len(calls) == 2
+
+
+def test_invalidate_drops_entries(app):
+    policy = CachePolicy(ttl=60)
+    calls = cached_app(app, policy)
+
+    serve(app, "GET", "/hello")
+    policy.invalidate()
+    serve(app, "GET", "/hello")
+
+    assert len(calls) == 2
+
+
+def test_invalidate_path_keeps_other_paths():
+    policy = CachePolicy(ttl=60)
+    for path in ("/a", "/b"):
+        req, resp = populated(path=path)
+        policy.put(policy.key(req), resp, policy.generation())
+
+    policy.invalidate("/A")
+
+    assert policy.get(("GET", "/a")) is None
+    assert policy.get(("GET", "/b")) is not None
+
+
+def test_put_after_invalidate_is_dropped():
+    policy = CachePolicy(ttl=60)
+    req, resp = populated()
+    key = policy.key(req)
+
+    # The handler read before a write invalidated the policy
+    generation = policy.generation()
+    policy.invalidate()
+    policy.put(key, resp, generation)
+
+    assert policy.get(key) is None
+    policy.put(key, resp, policy.generation())
+    assert policy.get(key) is not None
+
+
+def test_only_ok_responses_are_cached(app):
+    def clb():
+        raise bad_request("Bad", "no")
+
+    policy = CachePolicy(ttl=60)
+    app.add_endpoint(PathExact("/bad"), clb, text_response, cache=policy)
+
+    serve(app, "GET", "/bad")
+
+    assert policy.stats()["entries"] == 0
+
+
+def test_least_recently_used_is_evicted():
+    policy = CachePolicy(ttl=60, max_entries=2)
+    for path in ("/a", "/b"):
+        req, resp = populated(path=path)
+        policy.put(policy.key(req), resp, policy.generation())
+    policy.get(("GET", "/a"))
+
+    req, resp = populated(path="/c")
+    policy.put(policy.key(req), resp, policy.generation())
+
+    assert policy.get(("GET", "/b")) is None
+    assert policy.get(("GET", "/a")) is not None
+    assert policy.stats()["evictions"] == 1
+
+
+def test_shared_invalidate_reaches_other_workers(tmp_path):
+    # Two policies mapping one file stand in for two worker processes
+    path = str(tmp_path / "generations.db")
+    workers = [CachePolicy(ttl=60), CachePolicy(ttl=60)]
+    for policy in workers:
+        policy.share(SharedGenerations(path))
+
+    req, resp = populated()
+    key = workers[1].key(req)
+    generation = workers[1].generation()
+    workers[1].put(key, resp, generation)
+
+    workers[0].invalidate()
+
+    assert workers[1].get(key) is None
+    # Its handler started before the invalidate, it mustn't store either
+    workers[1].put(key, resp, generation)
+    assert workers[1].get(key) is None
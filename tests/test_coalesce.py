@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+
+import pytest
+
+from framework import PathExact, SingleFlight, bad_request
+from framework.coalesce import copy_exception
+from helpers import serve, text_response, wait_for
+
+WAITERS = 3
+
+
+class Gate:
+    """
+    Gate holds the leader's callback until the waiters have joined its
+    flight.
+    """
+
+    def __init__(self, result):
+        self.result = result
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def run_collapsed(app, flight, gate, methods=("GET", ) * (WAITERS + 1)):
+    served = [None] * len(methods)
+
+    def run(i):
+        served[i] = serve(app, methods[i], "/hello")
+
+    threads = [threading.Thread(target=run, args=(i, ))
+               for i in range(len(methods))]
+    threads[0].start()
+    assert gate.started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+
+    wait_for(lambda: flight.collapsed == methods.count(methods[0]) - 1)
+    gate.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    return served
+
+
+@pytest.fixture
+def flight():
+    return SingleFlight()
+
+
+def test_waiters_share_the_leaders_response(app, flight):
+    gate = Gate(b"hello")
+    app.add_endpoint(PathExact("/hello"), gate, text_response,
+                     coalesce=flight)
+
+    served = run_collapsed(app, flight, gate)
+
+    assert [s.body for s in served] == [b"hello"] * (WAITERS + 1)
+    assert gate.calls == 1
+    assert flight.stats() == {
+        'leaders': 1,
+        'collapsed': WAITERS,
+        'in_flight': 0,
+    }
+
+
+def test_waiters_get_the_leaders_error(app, flight):
+    gate = Gate(bad_request("Bad Thing", "it went wrong"))
+    app.add_endpoint(PathExact("/hello"), gate, text_response,
+                     coalesce=flight)
+
+    served = run_collapsed(app, flight, gate)
+
+    assert [s.code for s in served] == [400] * (WAITERS + 1)
+    assert {s.header("X-Error") for s in served} == {"it went wrong"}
+    assert gate.calls == 1
+
+
+def test_waiters_get_the_leaders_crash(app, flight):
+    gate = Gate(RuntimeError("boom"))
+    app.add_endpoint(PathExact("/hello"), gate, text_response,
+                     coalesce=flight)
+
+    served = run_collapsed(app, flight, gate)
+
+    assert [s.code for s in served] == [500] * (WAITERS + 1)
+    assert gate.calls == 1
+
+
+def test_methods_do_not_share_flights(app, flight):
+    gate = Gate(b"hello")
+    app.add_endpoint(PathExact("/hello"), gate, text_response,
+                     coalesce=flight)
+
+    served = run_collapsed(app, flight, gate,
+                           methods=("GET", "GET", "HEAD"))
+
+    assert [s.code for s in served] == [200] * 3
+    assert gate.calls == 2
+
+
+def test_error_copies_are_distinct():
+    exc = bad_request("Bad Thing", "it went wrong")
+
+    copy = copy_exception(exc)
+
+    assert copy is not exc
+    assert type(copy) is type(exc)
+    assert (copy.args, copy.x_error, copy.headers) == \
+        (exc.args, exc.x_error, exc.headers)
+
+
+def test_unhashable_arguments_are_not_coalesced():
+    assert SingleFlight.key("GET", ([1], ), {}) is None
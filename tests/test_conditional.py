@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from framework import ETag, PathExact, bad_request
+from helpers import serve, text_response
+
+
+def counted(body):
+    calls = []
+
+    def clb(**query):
+        calls.append(query)
+        return body
+
+    return clb, calls
+
+
+def test_etag_hashes_the_body(app):
+    clb, calls = counted(b"hello")
+    app.add_endpoint(PathExact("/hello"), clb, text_response, etag=ETag())
+
+    first = serve(app, "GET", "/hello")
+    etag = first.header("ETag")
+    again = serve(app, "GET", "/hello", headers={"If-None-Match": etag})
+
+    assert first.code == 200 and etag
+    assert again.code == 304
+    assert again.body == b""
+    assert again.header("ETag") == etag
+    assert again.header("Content-Length") is None
+    # The body has to be built to hash it
+    assert len(calls) == 2
+
+
+def test_weak_and_listed_tags_match(app):
+    clb, _ = counted(b"hello")
+    app.add_endpoint(PathExact("/hello"), clb, text_response, etag=ETag())
+    etag = serve(app, "GET", "/hello").header("ETag")
+
+    served = serve(app, "GET", "/hello",
+                   headers={"If-None-Match": f'"other", W/{etag}'})
+
+    assert served.code == 304
+
+
+def test_changed_body_is_sent(app):
+    clb, _ = counted(b"hello")
+    app.add_endpoint(PathExact("/hello"), clb, text_response, etag=ETag())
+
+    served = serve(app, "GET", "/hello", headers={"If-None-Match": '"old"'})
+
+    assert served.code == 200
+    assert served.body == b"hello"
+
+
+def test_version_skips_the_callback(app):
+    clb, calls = counted(b"hello")
+    etag = ETag(version=lambda **query: query["v"][0])
+    app.add_endpoint(PathExact("/hello"), clb, text_response,
+                     pass_query=True, etag=etag)
+
+    first = serve(app, "GET", "/hello", query="v=1")
+    current = serve(app, "GET", "/hello", query="v=1",
+                    headers={"If-None-Match": first.header("ETag")})
+    changed = serve(app, "GET", "/hello", query="v=2",
+                    headers={"If-None-Match": first.header("ETag")})
+
+    assert current.code == 304
+    assert changed.code == 200
+    assert len(calls) == 2
+
+
+def test_no_version_falls_back_to_the_body(app):
+    clb, calls = counted(b"hello")
+    app.add_endpoint(PathExact("/hello"), clb, text_response,
+                     etag=ETag(version=lambda: None))
+
+    etag = serve(app, "GET", "/hello").header("ETag")
+    served = serve(app, "GET", "/hello", headers={"If-None-Match": etag})
+
+    assert served.code == 304
+    assert len(calls) == 2
+
+
+def test_only_get_and_head_are_conditional(app):
+    clb, _ = counted(b"hello")
+    app.add_endpoint(PathExact("/hello"), clb, text_response, etag=ETag())
+
+    served = serve(app, "POST", "/hello", headers={"If-None-Match": "*"})
+
+    assert served.code == 200
+    assert served.header("ETag") is None
+
+
+def test_errors_are_not_tagged(app):
+    def clb():
+        raise bad_request("Bad", "no")
+
+    app.add_endpoint(PathExact("/hello"), clb, text_response, etag=ETag())
+
+    served = serve(app, "GET", "/hello", headers={"If-None-Match": "*"})
+
+    assert served.code == 400
+    assert served.header("ETag") is None
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from datetime import date, time
+
+import pytest
+
+from lib.doolally import (
+    Number,
+    Schema,
+    StaticTypeArray,
+    StaticTypeObject,
+    String,
+    ValidationError,
+    decode,
+    record_class,
+    union_with_null,
+)
+from schemas.validators import hexstring_val, javascript_date_val, time_val
+
+
+class Slot(Schema):
+    start_time = String(required=True, validator=time_val)
+    end_time = String(validator=time_val)
+
+
+class Booking(Schema):
+    date = String(required=True, validator=javascript_date_val)
+    key = String(validator=hexstring_val)
+    note = String()
+    slots = StaticTypeArray(required=False, element_field=Slot())
+    deposit = union_with_null(
+        element_fields=[String(validator=hexstring_val)])
+    by_day = StaticTypeObject(
+        required=False,
+        element_field=String(validator=javascript_date_val))
+
+
+BOOKING = """{
+    "date": "2024-06-01",
+    "key": "00ff",
+    "note": "party",
+    "slots": [
+        {"startTime": "14:00", "endTime": "16:30"},
+        {"startTime": "18:00"}
+    ],
+    "deposit": "0a",
+    "byDay": {"sat": "2024-06-01"}
+}"""
+
+
+def test_coerce_parses_fields():
+    booking = decode(BOOKING, Booking, coerce=True)
+
+    assert booking == {
+        "date": date(2024, 6, 1),
+        "key": b"\x00\xff",
+        "note": "party",
+        "slots": [
+            {"startTime": time(14, 0), "endTime": time(16, 30)},
+            {"startTime": time(18, 0)},
+        ],
+        "deposit": b"\n",
+        "byDay": {"sat": date(2024, 6, 1)},
+    }
+
+
+def test_coerce_leaves_null_in_a_union():
+    booking = decode('{"date": "2024-06-01", "deposit": null}', Booking,
+                     coerce=True)
+
+    assert booking["deposit"] is None
+
+
+def test_without_coerce_values_are_as_sent():
+    booking = decode(BOOKING, Booking)
+
+    assert booking["date"] == "2024-06-01"
+    assert booking["slots"][0]["startTime"] == "14:00"
+
+
+@pytest.mark.parametrize("body", [
+    '{"date": "2024-13-01"}',
+    '{"date": "2024-06-01", "key": "0g"}',
+    '{"date": "2024-06-01", "slots": [{"startTime": "25:00"}]}',
+])
+def test_invalid_values_are_rejected_before_coercing(body):
+    with pytest.raises(ValidationError):
+        decode(body, Booking, coerce=True)
+
+
+class Guest(Schema):
+    name = String(required=True)
+    plus_one = union_with_null(element_fields=[Slot()])
+
+
+class Party(Schema):
+    guests = StaticTypeArray(required=True, element_field=Guest())
+    host = Guest(required=False)
+
+
+PARTY = """{
+    "guests": [
+        {"name": "a", "plusOne": {"startTime": "14:00"}},
+        {"name": "b", "plusOne": null}
+    ],
+    "host": {"name": "c"}
+}"""
+
+
+def test_records_replace_objects():
+    party = decode(PARTY, Party, records=True)
+    guest, slot = record_class(Guest), record_class(Slot)
+
+    assert party == record_class(Party)(
+        guests=[
+            guest("a", plus_one=slot(start_time="14:00", end_time=None)),
+            guest("b", plus_one=None),
+        ],
+        host=guest("c", plus_one=None),
+    )
+
+
+def test_records_with_coerce():
+    party = decode(PARTY, Party, coerce=True, records=True)
+
+    assert party.guests[0].plus_one.start_time == time(14, 0)
+    assert party.host.plus_one is None
+
+
+def test_records_have_slots_only():
+    guest = decode('{"name": "a"}', Guest, records=True)
+
+    assert not hasattr(guest, "__dict__")
+    with pytest.raises(AttributeError):
+        guest.nickname = "x"
+
+
+def test_record_class_is_made_once():
+    assert record_class(Party) is record_class(Party)
+    assert type(decode(PARTY, Party, records=True)) is record_class(Party)
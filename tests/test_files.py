@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from framework import PathExact
+from helpers import serve
+
+CONTENT = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def file_app(app, tmp_path):
+    path = tmp_path / "blob.bin"
+    path.write_bytes(CONTENT)
+
+    def send_file(resp, file):
+        resp.send_file(file, headers=[("Content-Type", "image/jpeg")])
+
+    app.add_endpoint(PathExact("/blob", methods=["GET"]),
+                     lambda: open(path, "rb"), send_file)
+    return app
+
+
+def validators(app):
+    served = serve(app, "GET", "/blob")
+    return served.header("ETag"), served.header("Last-Modified")
+
+
+def test_whole_file(file_app):
+    served = serve(file_app, "GET", "/blob")
+
+    assert served.code == 200
+    assert served.body == CONTENT
+    assert served.header("Content-Length") == str(len(CONTENT))
+    assert served.header("Accept-Ranges") == "bytes"
+
+
+@pytest.mark.parametrize("header, first, last", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=-24", 1000, 1023),
+    ("bytes=1000-5000", 1000, 1023),
+])
+def test_range(file_app, header, first, last):
+    served = serve(file_app, "GET", "/blob", headers={"Range": header})
+
+    assert served.code == 206
+    assert served.body == CONTENT[first:last + 1]
+    assert served.header("Content-Range") == f"bytes {first}-{last}/1024"
+    assert served.header("Content-Length") == str(last - first + 1)
+
+
+def test_multiple_ranges_send_the_whole_file(file_app):
+    served = serve(file_app, "GET", "/blob",
+                   headers={"Range": "bytes=0-1,5-6"})
+
+    assert served.code == 200
+    assert served.body == CONTENT
+
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=-0", "bytes=9-3"])
+def test_unsatisfiable_range(file_app, header):
+    served = serve(file_app, "GET", "/blob", headers={"Range": header})
+
+    assert served.code == 416
+    assert served.header("Content-Range") == "bytes */1024"
+    assert served.body == b""
+
+
+@pytest.mark.parametrize("validator", [0, 1])
+def test_if_range_matching_validator_honours_range(file_app, validator):
+    if_range = validators(file_app)[validator]
+    served = serve(file_app, "GET", "/blob",
+                   headers={"Range": "bytes=0-9", "If-Range": if_range})
+
+    assert served.code == 206
+    assert served.body == CONTENT[:10]
+
+
+def test_if_range_stale_validator_sends_whole_file(file_app):
+    served = serve(file_app, "GET", "/blob",
+                   headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+
+    assert served.code == 200
+    assert served.body == CONTENT
+
+
+def test_if_none_match_is_not_modified(file_app):
+    etag, _ = validators(file_app)
+    served = serve(file_app, "GET", "/blob", headers={"If-None-Match": etag})
+
+    assert served.code == 304
+    assert served.body == b""
+
+
+def test_file_wrapper_sends_from_the_range_offset(file_app):
+    wrapped = []
+
+    def file_wrapper(file, block_size):
+        wrapped.append(file.tell())
+        return iter(lambda: file.read(block_size), b"")
+
+    served = serve(file_app, "GET", "/blob",
+                   headers={"Range": "bytes=1000-"},
+                   extra={"wsgi.file_wrapper": file_wrapper})
+
+    assert wrapped == [1000]
+    assert served.body == CONTENT[1000:]
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from framework import PathExact, PathPrefix, Router
+from helpers import serve, text_response
+
+
+def returning(value):
+    return lambda: value
+
+
+def test_method_not_allowed_lists_allowed_methods(app):
+    app.add_endpoint(PathExact("/message", methods=["POST"]),
+                     returning(b"new"), text_response)
+    app.add_endpoint(PathExact("/message", methods=["PUT"]),
+                     returning(b"put"), text_response)
+
+    served = serve(app, "GET", "/message")
+
+    assert served.code == 405
+    assert served.header("Allow") == "POST, PUT"
+
+
+def test_unrouted_path_is_not_found(app):
+    app.add_endpoint(PathExact("/message", methods=["POST"]),
+                     returning(b"new"), text_response)
+
+    assert serve(app, "GET", "/missing").code == 404
+
+
+def test_exact_path_beats_prefix(app):
+    app.add_endpoint(PathPrefix("/blobs/"), returning(b"prefix"),
+                     text_response)
+    app.add_endpoint(PathExact("/blobs/new"), returning(b"exact"),
+                     text_response)
+
+    assert serve(app, "GET", "/blobs/new").body == b"exact"
+    assert serve(app, "GET", "/blobs/other").body == b"prefix"
+
+
+def test_longest_prefix_wins(app):
+    app.add_endpoint(PathPrefix("/b"), returning(b"short"), text_response)
+    app.add_endpoint(PathPrefix("/blobs/"), returning(b"long"),
+                     text_response)
+
+    assert serve(app, "GET", "/blobs/ab").body == b"long"
+    assert serve(app, "GET", "/bar").body == b"short"
+
+
+def test_prefix_falls_back_when_longer_one_lacks_the_method(app):
+    app.add_endpoint(PathPrefix("/b", methods=["GET"]), returning(b"short"),
+                     text_response)
+    app.add_endpoint(PathPrefix("/blobs/", methods=["POST"]),
+                     returning(b"long"), text_response)
+
+    assert serve(app, "GET", "/blobs/ab").body == b"short"
+
+
+def test_first_registration_wins():
+    router = Router()
+    router.add(PathExact("/message", methods=["GET"]), "first")
+    router.add(PathExact("/message", methods=["GET"]), "second")
+
+    assert router.resolve("GET", "/message") == ("first", None)
+
+
+def test_specific_method_beats_any_method():
+    router = Router()
+    router.add(PathExact("/message"), "any")
+    router.add(PathExact("/message", methods=["POST"]), "post")
+
+    assert router.resolve("POST", "/message") == ("post", None)
+    assert router.resolve("DELETE", "/message") == ("any", None)
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("/Message", ("nocase", None)),
+    ("/message", ("nocase", None)),
+    ("/Exact", ("case", None)),
+    ("/exact", (None, None)),
+])
+def test_case_sensitivity(path, expected):
+    router = Router()
+    router.add(PathExact("/message"), "nocase")
+    router.add(PathExact("/Exact", ignore_case=False), "case")
+
+    assert router.resolve("GET", path) == expected
+
+
+def test_unindexed_matchers_are_scanned():
+    router = Router()
+    router.add(lambda req: req.path.endswith(".txt"), "text")
+
+    class Req:
+        path = "/notes.txt"
+
+    assert router.resolve("GET", "/notes.txt", Req()) == ("text", None)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from lib import validation
+from lib.doolally import Schema, String, Number, ValidationError
+from lib.validation import ValidationPolicy, CLIENT, RESPONSE
+
+
+class GreetingResp(Schema):
+    name = String(required=True)
+    count = Number(is_int=True)
+
+
+class OtherResp(Schema):
+    name = String(required=True)
+
+
+GOOD = {"name": "tulip", "count": 1}
+BAD = {"count": "one"}
+
+
+@pytest.fixture
+def violations():
+    return []
+
+
+@pytest.fixture
+def use_policy(monkeypatch, violations):
+    def use(spec, sample=0.0):
+        policy = ValidationPolicy(
+            spec, on_violation=lambda *args: violations.append(args))
+        monkeypatch.setattr(validation, "policy", policy)
+        monkeypatch.setattr(validation.random, "random", lambda: sample)
+        return policy
+
+    return use
+
+
+def test_default_is_always(use_policy):
+    use_policy("")
+
+    with pytest.raises(ValidationError):
+        validation.validate(BAD, GreetingResp)
+    with pytest.raises(ValidationError):
+        validation.encode(BAD, GreetingResp)
+
+
+def test_off_skips_validation(use_policy, violations):
+    use_policy("response=off,client=off")
+
+    validation.validate(BAD, GreetingResp)
+
+    assert validation.encode(BAD, GreetingResp) == b'{"count": "one"}'
+    assert violations == []
+
+
+def test_sampled_document_reports_and_carries_on(use_policy, violations):
+    use_policy("response=sampled:0.25", sample=0.1)
+
+    assert validation.encode(BAD, GreetingResp) == b'{"count": "one"}'
+
+    [(schema, direction, exc)] = violations
+    assert (schema, direction) == (GreetingResp, RESPONSE)
+    assert isinstance(exc, ValidationError)
+
+
+def test_unsampled_document_is_not_validated(use_policy, violations):
+    use_policy("client=sampled:0.25", sample=0.25)
+
+    validation.validate(BAD, GreetingResp)
+
+    assert violations == []
+
+
+def test_valid_sampled_document_reports_nothing(use_policy, violations):
+    use_policy("response=sampled:1", sample=0.5)
+
+    validation.encode(GOOD, GreetingResp)
+
+    assert violations == []
+
+
+def test_schema_rule_overrides_direction(use_policy, violations):
+    use_policy("client=off,GreetingResp.client=always")
+
+    with pytest.raises(ValidationError):
+        validation.validate(BAD, GreetingResp, CLIENT)
+    validation.validate({}, OtherResp, CLIENT)
+
+
+def test_request_bodies_are_always_validated(use_policy):
+    use_policy("response=off,client=off")
+
+    with pytest.raises(ValidationError):
+        validation.decode('{"count": "one"}', GreetingResp)
+
+
+@pytest.mark.parametrize("spec, message", [
+    ("response=sampled:2", "validation sample rate out of range 2.0"),
+    ("replies=off", "unrecognised validation direction replies"),
+    ("GreetingResp.request=off",
+     "request bodies are always validated, GreetingResp.request=off"),
+])
+def test_bad_specs(spec, message):
+    with pytest.raises(ValueError) as info:
+        ValidationPolicy(spec)
+
+    assert str(info.value) == message